@@ -0,0 +1,69 @@
+"""
+API endpoints لأدوات الإدارة والتشخيص (للمدراء العامين فقط)
+"""
+import asyncio
+from typing import Any, Dict, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_current_read_superuser, get_current_superuser
+from app.config import settings
+from app.core.permissions import TokenPrincipal
+from app.core.profiler import ProfilerBusy, SamplingProfiler, profiling_slot
+from app.core.slow_queries import slow_query_log
+from app.core.tracing import TracedRoute
+from app.core.cache import PrincipalSnapshot
+from app.models.user import User
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500, description="عدد الاستعلامات المراد جلبها"),
+    current_user: Union[TokenPrincipal, User] = Depends(get_current_read_superuser)
+) -> Dict[str, Any]:
+    """أبطأ الاستعلامات المسجلة في هذا العامل"""
+    return {
+        **slow_query_log.stats(),
+        "queries": slow_query_log.slowest(limit)
+    }
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries(
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
+) -> Dict[str, Any]:
+    """مسح سجل الاستعلامات البطيئة"""
+    slow_query_log.clear()
+    return {"message": "تم مسح سجل الاستعلامات البطيئة"}
+
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, description="مدة المعاينة بالثواني"),
+    interval_ms: float = Query(None, ge=1, le=100, description="الفاصل بين العينات بالملي ثانية"),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$", description="speedscope أو collapsed"),
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
+):
+    """تحليل أداء العامل الحالي بالمعاينة لعدد من الثواني (جميع الخيوط)"""
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى للمدة {settings.profiler_max_seconds} ثانية")
+
+    interval = (interval_ms or settings.profiler_interval_ms) / 1000
+    try:
+        with profiling_slot():
+            profiler = SamplingProfiler(interval=interval)
+            profiler.start()
+            try:
+                # الانتظار دون حجز خيط: حلقة الأحداث تستمر في خدمة الطلبات أثناء المعاينة
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.speedscope(name=f"worker {seconds:g}s")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.database import get_db
+from app.core.cache import PrincipalSnapshot
 from app.models.user import User
 from app.schemas.auth import (
     LoginRequest, LoginResponse, RefreshTokenRequest, RefreshTokenResponse,
@@ -10,23 +11,22 @@ from app.schemas.auth import (
     LogoutResponse
 )
 from app.core.security import decode_access_token
-from app.api.deps import get_current_user, get_current_active_user
+from app.api.deps import get_current_user, get_current_active_user, get_auth_service
 from app.services.auth_service import AuthService
 from app.config import settings
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.post("/login", response_model=LoginResponse)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """تسجيل الدخول"""
-    auth_service = AuthService(db)
-    
     # المصادقة
-    user = auth_service.authenticate_user(login_data.username, login_data.password)
+    user = await auth_service.authenticate_user(login_data.username, login_data.password)
     
     if not user:
         raise HTTPException(
@@ -35,10 +35,10 @@ async def login(
         )
     
     # إنشاء رموز الوصول
-    token_data = auth_service.create_access_refresh_tokens(user)
+    token_data = await auth_service.create_access_refresh_tokens(user)
     
     # تحديث آخر تسجيل دخول
-    auth_service.update_last_login(user.id)
+    await auth_service.update_last_login(user.id)
     
     return LoginResponse(
         access_token=token_data["access_token"],
@@ -58,12 +58,10 @@ async def login(
 @router.post("/refresh", response_model=RefreshTokenResponse)
 async def refresh_token(
     refresh_data: RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """تحديث رمز الوصول"""
-    auth_service = AuthService(db)
-    
-    token_data = auth_service.refresh_user_token(refresh_data.refresh_token)
+    token_data = await auth_service.refresh_user_token(refresh_data.refresh_token)
     
     if not token_data:
         raise HTTPException(
@@ -89,14 +87,12 @@ async def logout():
 @router.post("/change-password")
 async def change_password(
     password_data: ChangePasswordRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: PrincipalSnapshot = Depends(get_current_active_user),
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """تغيير كلمة المرور"""
-    auth_service = AuthService(db)
-    
     try:
-        auth_service.change_password(
+        await auth_service.change_password(
             user_id=current_user.id,
             current_password=password_data.current_password,
             new_password=password_data.new_password
@@ -112,13 +108,11 @@ async def change_password(
 @router.post("/register", response_model=RegistrationResponse)
 async def register(
     user_data: RegistrationRequest,
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """تسجيل مستخدم جديد"""
-    auth_service = AuthService(db)
-    
     # تحقق من قوة كلمة المرور
-    is_strong, errors = auth_service.validate_password_strength(user_data.password)
+    is_strong, errors = await auth_service.validate_password_strength(user_data.password)
     if not is_strong:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -126,7 +120,7 @@ async def register(
         )
     
     try:
-        user = auth_service.create_user(user_data.dict())
+        user = await auth_service.create_user(user_data.dict())
         
         return RegistrationResponse(
             message="تم إنشاء الحساب بنجاح",
@@ -144,13 +138,11 @@ async def register(
 @router.post("/forgot-password", response_model=PasswordResetResponse)
 async def forgot_password(
     reset_data: PasswordResetRequest,
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """طلب إعادة تعيين كلمة المرور"""
-    auth_service = AuthService(db)
-    
     # إنشاء رمز إعادة التعيين
-    reset_token = auth_service.generate_reset_token(reset_data.email)
+    reset_token = await auth_service.generate_reset_token(reset_data.email)
     
     # في التطبيق الحقيقي، يجب إرسال البريد الإلكتروني هنا
     # للتبسيط، سنعيد الرمز في الاستجابة (ليس آمن في الإنتاج)
@@ -163,13 +155,11 @@ async def forgot_password(
 @router.post("/reset-password")
 async def reset_password(
     reset_data: PasswordResetConfirm,
-    db: Session = Depends(get_db)
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """إعادة تعيين كلمة المرور باستخدام الرمز"""
-    auth_service = AuthService(db)
-    
     try:
-        auth_service.reset_password(reset_data.token, reset_data.new_password)
+        await auth_service.reset_password(reset_data.token, reset_data.new_password)
         return {"message": "تم إعادة تعيين كلمة المرور بنجاح"}
     except ValueError as e:
         raise HTTPException(
@@ -180,7 +170,7 @@ async def reset_password(
 
 @router.post("/logout", response_model=LogoutResponse)
 async def logout(
-    current_user: User = Depends(get_current_active_user),
+    current_user: PrincipalSnapshot = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """تسجيل الخروج"""
@@ -189,7 +179,9 @@ async def logout(
     
     # تحديث آخر نشاط للمستخدم
     from datetime import datetime
-    current_user.last_login = datetime.utcnow()
+    db.query(User).filter(User.id == current_user.id).update(
+        {User.last_login: datetime.utcnow()}, synchronize_session=False
+    )
     db.commit()
     
     return LogoutResponse(
@@ -1,26 +1,52 @@
-from typing import Generator, Optional
+from typing import Generator, Optional, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.config import settings
 from app.core.security import decode_access_token
+from app.core.cache import PrincipalSnapshot, get_cached_principal, cache_principal
+from app.core.multi_tenant import resolve_tenant, tenant_from_snapshot
+from app.core.request_context import set_request_principal
+from app.core.singleflight import SingleFlight
+from app.core.tracing import traced
+from app.core.permissions import (
+    PERMISSION_BITS, TokenPrincipal, check_user_permission, get_user_permissions,
+    principal_from_claims
+)
+from app.models.associations import tenant_user
 from app.models.user import User
 from app.models.tenant import Tenant
 
 
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+principal_flight = SingleFlight("principal")
 
 
+def _snapshot_user(db: Session, user: User) -> PrincipalSnapshot:
+    """إنشاء لقطة للقراءة فقط من المستخدم (حقول التفويض فقط)"""
+    company_ids = db.query(tenant_user.c.tenant_id).filter(tenant_user.c.user_id == user.id)
+    return PrincipalSnapshot(
+        user_id=user.id,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+        tenant_id=user.tenant_id,
+        permissions=frozenset(get_user_permissions(user)),
+        company_ids=frozenset(row[0] for row in company_ids)
+    )
+
+
+@traced()
 def get_current_user(
     db: Session = Depends(get_db),
     token: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
-    """Get current authenticated user"""
+) -> PrincipalSnapshot:
+    """
+    Get current authenticated principal (read-only snapshot, not attached to the session).
+    Routes that need the full user row load it by principal.id.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="لم يتم التحقق من صحة بيانات الاعتماد",
@@ -29,27 +55,50 @@ def get_current_user(
     
     try:
         payload = decode_access_token(token.credentials)
+        if payload is None:
+            raise credentials_exception
         user_id: int = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
+    set_request_principal(user_id=user_id, tenant_id=payload.get("tenant_id"))
+    issued_at = payload.get("iat")
+    snapshot = get_cached_principal(user_id, issued_at)
+    if snapshot is None:
+        def load() -> Optional[PrincipalSnapshot]:
+            user = db.query(User).filter(User.id == user_id).first()
+            if user is None:
+                return None
+            snapshot = _snapshot_user(db, user)
+            cache_principal(issued_at, snapshot)
+            return snapshot
+        
+        # الطلبات المتزامنة لنفس المستخدم تنتظر تحميلاً واحداً
+        snapshot = principal_flight.do((int(user_id), issued_at), load)
+        if snapshot is None:
+            raise credentials_exception
     
-    return user
+    set_request_principal(is_superuser=snapshot.is_superuser)
+    return snapshot
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+@traced()
+def get_current_active_user(current_user: PrincipalSnapshot = Depends(get_current_user)) -> PrincipalSnapshot:
     """Get current active user"""
     if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="تم إيقاف حساب المستخدم")
+        # الرمز لم يعد يخول صاحبه بعد إيقاف الحساب
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="تم إيقاف حساب المستخدم",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return current_user
 
 
-def get_current_superuser(current_user: User = Depends(get_current_user)) -> User:
+@traced()
+def get_current_superuser(current_user: PrincipalSnapshot = Depends(get_current_user)) -> PrincipalSnapshot:
     """Get current superuser"""
     if not current_user.is_superuser:
         raise HTTPException(
@@ -59,6 +108,92 @@ def get_current_superuser(current_user: User = Depends(get_current_user)) -> Use
     return current_user
 
 
+@traced()
+def get_current_principal(
+    db: Session = Depends(get_db),
+    token: HTTPAuthorizationCredentials = Depends(security)
+) -> Union[TokenPrincipal, PrincipalSnapshot]:
+    """
+    Get current principal for read endpoints.
+    Uses the verified permission claim when present and current, otherwise loads the user.
+    """
+    payload = decode_access_token(token.credentials)
+    if payload:
+        principal = principal_from_claims(payload)
+        if principal is not None:
+            set_request_principal(
+                user_id=principal.id, tenant_id=principal.tenant_id, is_superuser=principal.is_superuser
+            )
+            return principal
+    
+    return get_current_user(db=db, token=token)
+
+
+def is_superuser_token(authorization: str) -> bool:
+    """
+    Check an Authorization header outside dependency injection (used by middleware).
+    Same rules as get_current_principal; any failure counts as not a superuser.
+    """
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        return False
+    
+    payload = decode_access_token(credentials)
+    if not payload:
+        return False
+    principal = principal_from_claims(payload)
+    if principal is None:
+        db = SessionLocal()
+        try:
+            principal = get_current_user(
+                db=db, token=HTTPAuthorizationCredentials(scheme=scheme, credentials=credentials)
+            )
+        except HTTPException:
+            return False
+        finally:
+            db.close()
+    return bool(principal.is_active and principal.is_superuser)
+
+
+@traced()
+def get_current_read_superuser(
+    principal: Union[TokenPrincipal, PrincipalSnapshot] = Depends(get_current_principal)
+) -> Union[TokenPrincipal, PrincipalSnapshot]:
+    """Get current superuser for read endpoints (no DB access with permission claims)"""
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="تم إيقاف حساب المستخدم")
+    if not principal.is_superuser:
+        raise HTTPException(
+            status_code=403, 
+            detail="ليس لديك صلاحيات للوصول لهذا المورد"
+        )
+    return principal
+
+
+def require_permission(required_permission: str):
+    """Dependency factory: authorize from token claims, falling back to the database"""
+    @traced(f"require_permission:{required_permission}")
+    def dependency(
+        db: Session = Depends(get_db),
+        token: HTTPAuthorizationCredentials = Depends(security),
+        principal: Union[TokenPrincipal, PrincipalSnapshot] = Depends(get_current_principal)
+    ) -> Union[TokenPrincipal, PrincipalSnapshot]:
+        # الصلاحيات المخصصة ليس لها بت ثابت في الرمز
+        if isinstance(principal, TokenPrincipal) and required_permission not in PERMISSION_BITS:
+            principal = get_current_user(db=db, token=token)
+        
+        if not principal.is_active:
+            raise HTTPException(status_code=400, detail="تم إيقاف حساب المستخدم")
+        if not check_user_permission(principal, required_permission):
+            raise HTTPException(
+                status_code=403,
+                detail="ليس لديك صلاحيات للوصول لهذا المورد"
+            )
+        return principal
+    return dependency
+
+
+@traced()
 def get_current_tenant(db: Session = Depends(get_db), token: HTTPAuthorizationCredentials = Depends(security)) -> Tenant:
     """Get current tenant from token"""
     try:
@@ -69,8 +204,63 @@ def get_current_tenant(db: Session = Depends(get_db), token: HTTPAuthorizationCr
     except JWTError:
         raise HTTPException(status_code=403, detail="رمز غير صالح")
     
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
-    if tenant is None:
+    set_request_principal(user_id=payload.get("sub"), tenant_id=tenant_id)
+    snapshot = resolve_tenant(db, tenant_id)
+    if snapshot is None:
         raise HTTPException(status_code=403, detail="المستأجر غير موجود")
     
-    return tenant
+    return tenant_from_snapshot(db, snapshot)
+
+
+# Service providers: awaitable services for both DATABASE_MODE values
+if settings.use_async_database:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.database_async import get_async_db
+    from app.services.async_services import (
+        AsyncTenantService, AsyncBranchService, AsyncUserService,
+        AsyncAuthService, AsyncSubscriptionService, AsyncSearchService
+    )
+
+    def get_tenant_service(db: AsyncSession = Depends(get_async_db)) -> AsyncTenantService:
+        return AsyncTenantService(db)
+
+    def get_branch_service(db: AsyncSession = Depends(get_async_db)) -> AsyncBranchService:
+        return AsyncBranchService(db)
+
+    def get_user_service(db: AsyncSession = Depends(get_async_db)) -> AsyncUserService:
+        return AsyncUserService(db)
+
+    def get_auth_service(db: AsyncSession = Depends(get_async_db)) -> AsyncAuthService:
+        return AsyncAuthService(db)
+
+    def get_subscription_service(db: AsyncSession = Depends(get_async_db)) -> AsyncSubscriptionService:
+        return AsyncSubscriptionService(db)
+
+    def get_search_service(db: AsyncSession = Depends(get_async_db)) -> AsyncSearchService:
+        return AsyncSearchService(db)
+else:
+    from app.services.async_services import ThreadPoolService
+    from app.services.tenant_service import TenantService
+    from app.services.branch_service import BranchService
+    from app.services.user_service import UserService
+    from app.services.auth_service import AuthService
+    from app.services.subscription_service import SubscriptionService
+    from app.services.search_service import SearchService
+
+    def get_tenant_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(TenantService(db))
+
+    def get_branch_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(BranchService(db))
+
+    def get_user_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(UserService(db))
+
+    def get_auth_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(AuthService(db))
+
+    def get_subscription_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(SubscriptionService(), db)
+
+    def get_search_service(db: Session = Depends(get_db)) -> ThreadPoolService:
+        return ThreadPoolService(SearchService(db))
@@ -10,10 +10,12 @@ from app.schemas.role_permission import (
     UserRoleAssignment
 )
 from app.api.deps import get_current_superuser
+from app.core.permissions import invalidate_role, invalidate_user_permissions
 from app.services.auth_service import AuthService
 from app.services.user_service import UserService
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 # Roles endpoints
@@ -60,7 +62,9 @@ async def update_role(
 ):
     """تحديث دور"""
     auth_service = AuthService(db)
-    return auth_service.update_role(role_id=role_id, role_data=role_data)
+    role = auth_service.update_role(role_id=role_id, role_data=role_data)
+    invalidate_role(role_id)
+    return role
 
 
 @router.delete("/roles/{role_id}")
@@ -72,6 +76,7 @@ async def delete_role(
     """حذف دور"""
     auth_service = AuthService(db)
     auth_service.delete_role(role_id=role_id)
+    invalidate_role(role_id)
     return {"message": "تم حذف الدور بنجاح"}
 
 
@@ -108,6 +113,7 @@ async def assign_roles_to_user(
     """تعيين أدوار لمستخدم"""
     auth_service = AuthService(db)
     auth_service.assign_roles_to_user(user_id=user_id, role_ids=role_assignment.role_ids)
+    invalidate_user_permissions(user_id)
     return {"message": "تم تعيين الأدوار للمستخدم بنجاح"}
 
 
@@ -1,94 +1,139 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-
-from app.database import get_db
-from app.models.user import User
-from app.schemas.user import UserResponse, UserCreate, UserUpdate, UserList
-from app.api.deps import get_current_active_user, get_current_superuser
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional, Union
+
+from app.core.cache import PrincipalSnapshot
+from app.schemas.user import UserResponse, UserCreate, UserUpdate
+from app.api.deps import get_current_active_user, get_current_superuser, get_user_service
+from app.core.pagination import CursorPage, InvalidCursor
 from app.services.user_service import UserService
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=Union[List[UserResponse], CursorPage[UserResponse]])
 async def get_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="نمط التصفح: offset أو cursor"),
+    cursor: Optional[str] = Query(None, description="مؤشر الصفحة التالية (next_cursor)"),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_active_user)
 ):
-    """الحصول على قائمة المستخدمين"""
-    user_service = UserService(db)
-    return user_service.get_users(db, skip=skip, limit=limit, search=search)
+    """الحصول على قائمة المستخدمين (جميعهم للمدير العام، ومستخدمو شركته لغيره)"""
+    if not current_user.is_superuser and current_user.tenant_id is None:
+        raise HTTPException(status_code=403, detail="المستخدم غير مرتبط بشركة")
+    tenant_id = None if current_user.is_superuser else current_user.tenant_id
+    
+    if search:
+        return await user_service.search_users(search, tenant_id=tenant_id, limit=limit)
+    
+    if pagination == "cursor" or cursor:
+        try:
+            if tenant_id is None:
+                return await user_service.get_all_users_page(limit=limit, cursor=cursor)
+            return await user_service.get_users_by_tenant_page(tenant_id, limit=limit, cursor=cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if tenant_id is None:
+        return await user_service.get_all_users(skip=skip, limit=limit)
+    return await user_service.get_users_by_tenant(tenant_id, skip=skip, limit=limit)
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_active_user)
+):
     """الحصول على معلومات المستخدم الحالي"""
-    return current_user
+    # اللقطة تحمل حقول التفويض فقط، فالاستجابة الكاملة تُقرأ من قاعدة البيانات
+    user = await user_service.get_user_by_id(current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    return user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_active_user)
 ):
-    """الحصول على مستخدم محدد"""
-    return user_service.get_user(db, user_id=user_id)
+    """الحصول على مستخدم محدد (المستخدم العادي يرى مستخدمي شركته فقط)"""
+    user = await user_service.get_user_by_id(user_id)
+    if user is None or not (
+        current_user.is_superuser or user.id == current_user.id
+        or (current_user.tenant_id is not None and user.tenant_id == current_user.tenant_id)
+    ):
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    return user
 
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_superuser)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
 ):
     """إنشاء مستخدم جديد"""
-    return user_service.create_user(db, user_data=user_data)
+    try:
+        return await user_service.create_user(user_data, tenant_id=user_data.tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_active_user)
 ):
-    """تحديث مستخدم"""
-    return user_service.update_user(db, user_id=user_id, user_data=user_data)
+    """تحديث مستخدم (المستخدم العادي يحدث بياناته فقط دون حالة التفعيل)"""
+    if not current_user.is_superuser:
+        if user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="ليس لديك صلاحيات للوصول لهذا المورد")
+        if user_data.is_active is not None:
+            raise HTTPException(status_code=403, detail="لا يمكنك تغيير حالة تفعيل حسابك")
+    user = await user_service.update_user(user_id, user_data)
+    if user is None:
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    return user
 
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_superuser)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
 ):
     """حذف مستخدم"""
-    user_service.delete_user(db, user_id=user_id)
+    if not await user_service.delete_user(user_id):
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
     return {"message": "تم حذف المستخدم بنجاح"}
 
 
 @router.post("/{user_id}/activate")
 async def activate_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_superuser)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
 ):
     """تفعيل مستخدم"""
-    user_service.activate_user(db, user_id=user_id)
+    if not await user_service.activate_user(user_id):
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
     return {"message": "تم تفعيل المستخدم بنجاح"}
 
 
 @router.post("/{user_id}/deactivate")
 async def deactivate_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_superuser)
+    user_service: UserService = Depends(get_user_service),
+    current_user: PrincipalSnapshot = Depends(get_current_superuser)
 ):
     """إلغاء تفعيل مستخدم"""
-    user_service.deactivate_user(db, user_id=user_id)
+    if not await user_service.deactivate_user(user_id):
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
     return {"message": "تم إلغاء تفعيل المستخدم بنجاح"}
@@ -0,0 +1,48 @@
+"""
+سجل الوصول المُعايَن (Access log)
+- تُسجل نسبة من الطلبات فقط (access_log_sample_rate)، مع تسجيل الأخطاء والطلبات البطيئة دائماً
+- السجل يمر عبر خط السجلات غير الحاجب (app.core.logging_pipeline)، فالتنسيق والكتابة خارج مسار الطلب
+"""
+import logging
+import random
+from typing import Any, Dict
+
+from app.config import settings
+
+access_logger = logging.getLogger("app.access")
+
+
+class AccessLog:
+    """سجل الوصول مع المعاينة حسب الحالة والزمن"""
+
+    def __init__(self, sample_rate: float, slow_ms: float):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.sampled_out = 0
+
+    def should_log(self, status: int, duration_ms: float) -> bool:
+        if status >= 500 or duration_ms >= self.slow_ms:
+            return True
+        if self.sample_rate >= 1.0:
+            return True
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def log(self, method: str, path: str, status: int, duration_ms: float) -> None:
+        """تسجيل الطلب (التنسيق يتم لاحقاً في خيط الكتابة، وسياق الطلب يُضاف تلقائياً)"""
+        if self.should_log(status, duration_ms):
+            access_logger.info(
+                "%s %s - Status: %s - Time: %.3fms", method, path, status, duration_ms,
+                extra={"http_method": method, "path": path, "status": status, "duration_ms": round(duration_ms, 3)}
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sample_rate": self.sample_rate, "sampled_out": self.sampled_out}
+
+
+access_log = AccessLog(
+    sample_rate=settings.access_log_sample_rate,
+    slow_ms=settings.access_log_slow_ms
+)
@@ -0,0 +1,279 @@
+"""
+ذاكرة تخزين مؤقت داخل العملية (In-process cache)
+تخزين محدود الحجم مع انتهاء صلاحية (TTL) وإخراج الأقدم استخداماً (LRU)،
+وتُشارك عبر Redis بين العمال عند ضبط REDIS_URL (انظر app.core.redis_cache)
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Mapping, Optional, Tuple
+
+from app.config import settings
+from app.core.redis_cache import redis_tier, two_level
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """ذاكرة مؤقتة محدودة الحجم مع TTL وإخراج LRU وعدادات إصابة/إخفاق"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """قراءة قيمة من الذاكرة المؤقتة مع تحديث ترتيب الاستخدام"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """تخزين قيمة مع إخراج الأقدم استخداماً عند امتلاء الذاكرة"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """حذف مفتاح محدد"""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """حذف جميع المفاتيح المطابقة للشرط"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def delete_prefix(self, prefix: Tuple[Any, ...]) -> int:
+        """حذف جميع المفاتيح (الثنائية) التي تبدأ بالبادئة"""
+        size = len(prefix)
+        return self.delete_where(lambda key: isinstance(key, tuple) and key[:size] == prefix)
+
+    def clear(self) -> None:
+        """مسح الذاكرة المؤقتة بالكامل"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """إحصائيات الذاكرة المؤقتة"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0
+        }
+
+
+@dataclass(frozen=True)
+class PrincipalSnapshot:
+    """
+    المستخدم المصادق عليه للقراءة فقط (غير مرتبط بجلسة): حقول التفويض فقط،
+    بدون أعمدة المستخدم الأخرى (ولا hashed_password)؛ المسارات التي تحتاج المستخدم كاملاً تحمّله
+    """
+    user_id: int
+    is_active: bool
+    is_superuser: bool
+    tenant_id: Optional[int]
+    permissions: FrozenSet[str]
+    company_ids: FrozenSet[int] = frozenset()
+
+    @property
+    def id(self) -> int:
+        return self.user_id
+
+    def is_member_of_company(self, company_id: int) -> bool:
+        """فحص العضوية في شركة (نفس واجهة User.is_member_of_company)"""
+        return company_id in self.company_ids
+
+
+# عدادات إصدار الصلاحيات: تزداد عند كل تعديل على المستخدم أو الأدوار
+# وتُستخدم لرفض مطالبات الصلاحيات القديمة داخل رموز الوصول
+# تُحفظ في Redis فقط (HINCRBY/HMGET) ولا تُنسخ في ذاكرة العامل، فيرى جميع العمال نفس الإصدار
+# بدون Redis لا يمكن إبطال المطالبات بين العمال، لذلك لا تُصدر (principal_claims_enabled)
+
+
+def _shared_versions_key() -> str:
+    return redis_tier.key("principal_versions", "all")
+
+
+def principal_claims_enabled() -> bool:
+    """مطالبات الصلاحيات مفعلة ولها مخزن إصدارات مشترك"""
+    return settings.token_permission_claims and redis_tier is not None
+
+
+def _bump_shared_version(field: str) -> None:
+    if redis_tier is not None:
+        redis_tier.call(redis_tier.client.hincrby, _shared_versions_key(), field, 1)
+
+
+def _encode_principal(snapshot: PrincipalSnapshot) -> Dict[str, Any]:
+    return {
+        "user_id": snapshot.user_id,
+        "is_active": snapshot.is_active,
+        "is_superuser": snapshot.is_superuser,
+        "tenant_id": snapshot.tenant_id,
+        "permissions": sorted(snapshot.permissions),
+        "company_ids": sorted(snapshot.company_ids)
+    }
+
+
+def _decode_principal(value: Dict[str, Any]) -> PrincipalSnapshot:
+    return PrincipalSnapshot(
+        user_id=int(value["user_id"]),
+        is_active=bool(value["is_active"]),
+        is_superuser=bool(value["is_superuser"]),
+        tenant_id=value["tenant_id"],
+        permissions=frozenset(value["permissions"]),
+        company_ids=frozenset(int(company_id) for company_id in value["company_ids"])
+    )
+
+
+principal_cache = two_level(
+    TTLCache(
+        maxsize=settings.principal_cache_size,
+        ttl=settings.principal_cache_ttl_seconds,
+        name="principal"
+    ),
+    encode=_encode_principal,
+    decode=_decode_principal
+)
+
+
+def get_cached_principal(user_id: int, issued_at: Any) -> Optional[PrincipalSnapshot]:
+    """الحصول على لقطة المستخدم من الذاكرة المؤقتة"""
+    return principal_cache.get((int(user_id), issued_at))
+
+
+def cache_principal(issued_at: Any, snapshot: PrincipalSnapshot) -> None:
+    """تخزين لقطة المستخدم مع مفتاح (معرف المستخدم، وقت إصدار الرمز)"""
+    principal_cache.set((snapshot.user_id, issued_at), snapshot)
+
+
+def principal_version(user_id: int) -> Optional[Tuple[int, int]]:
+    """الإصدار الحالي لصلاحيات المستخدم (الحقبة العامة، إصدار المستخدم)، أو None عند تعذر قراءته"""
+    if redis_tier is None:
+        return None
+    values = redis_tier.call(
+        redis_tier.client.hmget, _shared_versions_key(), "epoch", str(int(user_id)), default=None
+    )
+    if values is None:
+        return None
+    epoch, version = (int(value) if value is not None else 0 for value in values)
+    return epoch, version
+
+
+def invalidate_principal(user_id: int) -> int:
+    """إبطال جميع لقطات المستخدم ومطالبات صلاحياته بغض النظر عن وقت إصدار الرمز"""
+    user_id = int(user_id)
+    _bump_shared_version(str(user_id))
+    return principal_cache.delete_prefix((user_id,))
+
+
+def invalidate_all_principals() -> None:
+    """إبطال جميع اللقطات ومطالبات الصلاحيات (بعد تعديل الأدوار)"""
+    _bump_shared_version("epoch")
+    principal_cache.clear()
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    """لقطة للقراءة فقط من بيانات الشركة (الحالة وحدود الخطة والإعدادات المحللة)"""
+    tenant_id: int
+    status: str
+    is_active: bool
+    plan_type: str
+    max_users: int
+    max_branches: int
+    max_storage_gb: int
+    settings: Mapping[str, Any] = field(hash=False, compare=False)
+    columns: Tuple[Tuple[str, Any], ...] = field(hash=False, compare=False)
+
+    @property
+    def is_usable(self) -> bool:
+        """الشركة مفعلة واشتراكها نشط أو تجريبي"""
+        return bool(self.is_active) and self.status in ("active", "trial")
+
+
+# علامة "الشركة غير موجودة" في التخزين السلبي
+TENANT_NOT_FOUND = object()
+
+def _encode_tenant(value: Any) -> Any:
+    """تحويل لقطة الشركة إلى JSON (MappingProxyType والعلامة لا تُسلسل)"""
+    if value is TENANT_NOT_FOUND:
+        return None
+    encoded = {name: getattr(value, name) for name in TenantSnapshot.__dataclass_fields__}
+    encoded["settings"] = dict(value.settings)
+    encoded["columns"] = dict(value.columns)
+    return encoded
+
+
+def _decode_tenant(value: Any) -> Any:
+    if value is None:
+        return TENANT_NOT_FOUND
+    value["settings"] = MappingProxyType(value["settings"])
+    value["columns"] = tuple(value["columns"].items())
+    return TenantSnapshot(**value)
+
+
+tenant_cache = two_level(
+    TTLCache(
+        maxsize=settings.tenant_cache_size,
+        ttl=settings.tenant_cache_ttl_seconds,
+        name="tenant"
+    ),
+    encode=_encode_tenant,
+    decode=_decode_tenant
+)
+
+
+def get_cached_tenant(tenant_id: int) -> Any:
+    """لقطة الشركة، أو TENANT_NOT_FOUND إذا خُزّن عدم وجودها، أو None إذا لم تُخزن"""
+    return tenant_cache.get(int(tenant_id))
+
+
+def cache_tenant(tenant_id: int, snapshot: Optional[TenantSnapshot]) -> None:
+    """تخزين لقطة الشركة، أو تخزين عدم وجودها لمدة قصيرة"""
+    if snapshot is None:
+        tenant_cache.set(int(tenant_id), TENANT_NOT_FOUND, ttl=settings.tenant_negative_cache_ttl_seconds)
+    else:
+        tenant_cache.set(int(tenant_id), snapshot)
+
+
+def invalidate_tenant(tenant_id: int) -> bool:
+    """إبطال لقطة الشركة بعد أي تعديل عليها"""
+    return tenant_cache.delete(int(tenant_id))
@@ -0,0 +1,246 @@
+"""
+سياسة ومنفذ تشفير كلمات المرور (Password hashing policy & executor)
+سياسة واحدة مشتركة (الخوارزمية وتكلفة التشفير) قابلة للضبط لكل بيئة نشر،
+والتشفير ينفذ في مجمع عمليات أو خيوط محدود مع طابور محدود الطول
+ويرفض الطلبات الزائدة (HTTP 429) بدلاً من زيادة زمن الانتظار بلا حدود
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashPolicy:
+    """
+    سياسة تشفير كلمات المرور المشتركة
+    أي كلمة مرور مشفرة بخوارزمية أو تكلفة مختلفة عن السياسة الحالية تحتاج إعادة تشفير
+    """
+
+    def __init__(
+        self,
+        scheme: str = "bcrypt",
+        bcrypt_rounds: int = 12,
+        argon2_time_cost: int = 3,
+        argon2_memory_cost: int = 65536,
+        argon2_parallelism: int = 2
+    ):
+        if scheme == "argon2" and not self._argon2_available():
+            logger.warning("argon2-cffi غير مثبت، سيتم استخدام bcrypt")
+            scheme = "bcrypt"
+        
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        
+        options = {
+            # تثبيت عدد الجولات يجعل أي تغيير في التكلفة (زيادة أو نقصاناً) يتطلب إعادة تشفير
+            "bcrypt__default_rounds": bcrypt_rounds,
+            "bcrypt__min_rounds": bcrypt_rounds,
+            "bcrypt__max_rounds": bcrypt_rounds,
+        }
+        if scheme == "argon2":
+            options.update(
+                argon2__rounds=argon2_time_cost,
+                argon2__memory_cost=argon2_memory_cost,
+                argon2__parallelism=argon2_parallelism
+            )
+            schemes = ["argon2", "bcrypt"]
+        else:
+            schemes = ["bcrypt"]
+        
+        self.context = CryptContext(schemes=schemes, deprecated="auto", **options)
+
+    @staticmethod
+    def _argon2_available() -> bool:
+        try:
+            from passlib.hash import argon2
+            return argon2.has_backend()
+        except ImportError:
+            return False
+
+    @classmethod
+    def from_settings(cls) -> "PasswordHashPolicy":
+        return cls(
+            scheme=settings.password_hash_scheme,
+            bcrypt_rounds=settings.password_bcrypt_rounds,
+            argon2_time_cost=settings.password_argon2_time_cost,
+            argon2_memory_cost=settings.password_argon2_memory_cost,
+            argon2_parallelism=settings.password_argon2_parallelism
+        )
+
+    def hash(self, password: str) -> str:
+        """تشفير كلمة المرور حسب السياسة الحالية"""
+        return self.context.hash(password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """التحقق من كلمة المرور بأي خوارزمية مدعومة"""
+        return self.context.verify(plain_password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """هل التشفير المخزن لا يطابق السياسة الحالية (خوارزمية أو تكلفة)"""
+        return self.context.needs_update(hashed_password)
+
+
+password_policy = PasswordHashPolicy.from_settings()
+
+
+class PasswordHashingBusy(Exception):
+    """طابور التشفير ممتلئ - يجب إعادة المحاولة لاحقاً"""
+
+    def __init__(self, queue_depth: int, retry_after: int = 1):
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        super().__init__("الخادم مشغول بمعالجة طلبات تسجيل الدخول، يرجى المحاولة لاحقاً")
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """تنفيذ الدالة داخل العامل وقياس زمن التشفير فقط (دون الانتظار في الطابور)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _verify(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    return _timed(password_policy.verify, plain_password, hashed_password)
+
+
+def _hash(password: str) -> Tuple[str, float]:
+    return _timed(password_policy.hash, password)
+
+
+class HashingExecutor:
+    """مجمع محدود لعمليات التشفير مع التحكم في القبول ومقاييس الطابور والزمن"""
+
+    def __init__(self, mode: str = "thread", workers: int = 4, max_queue: int = 64):
+        self.mode = mode
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._hash_seconds = deque(maxlen=1024)
+        self._total_seconds = deque(maxlen=1024)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.mode == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="password-hash"
+                        )
+        return self._executor
+
+    def _submit(self, func: Callable[..., Tuple[Any, float]], *args: Any) -> Future:
+        """إرسال مهمة مع رفضها إذا تجاوز الطابور الحد المسموح"""
+        with self._lock:
+            queue_depth = max(0, self._pending - self.workers)
+            if queue_depth >= self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy(queue_depth)
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+        future = self._get_executor().submit(func, *args)
+        future.add_done_callback(lambda done: self._record(done, submitted_at))
+        return future
+
+    def _record(self, future: Future, submitted_at: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.exception() is None:
+                self.completed += 1
+                self._hash_seconds.append(future.result()[1])
+                self._total_seconds.append(time.perf_counter() - submitted_at)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """التحقق من كلمة المرور (يحجب الخيط المستدعي فقط)"""
+        return self._submit(_verify, plain_password, hashed_password).result()[0]
+
+    def hash(self, password: str) -> str:
+        """تشفير كلمة المرور (يحجب الخيط المستدعي فقط)"""
+        return self._submit(_hash, password).result()[0]
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        """التحقق من كلمة المرور دون حجب حلقة الأحداث"""
+        future = self._submit(_verify, plain_password, hashed_password)
+        return (await asyncio.wrap_future(future))[0]
+
+    async def hash_async(self, password: str) -> str:
+        """تشفير كلمة المرور دون حجب حلقة الأحداث"""
+        future = self._submit(_hash, password)
+        return (await asyncio.wrap_future(future))[0]
+
+    def rehash_in_background(self, password: str, on_done: Callable[[str], None]) -> bool:
+        """
+        إعادة تشفير كلمة المرور في الخلفية ثم استدعاء on_done بالتشفير الجديد
+        فرصة فقط: إذا كان الطابور ممتلئاً تُتجاهل وتُعاد المحاولة في تسجيل الدخول التالي
+        """
+        try:
+            future = self._submit(_hash, password)
+        except PasswordHashingBusy:
+            return False
+
+        def _done(done: Future) -> None:
+            if done.exception() is not None:
+                logger.error(f"فشل في إعادة تشفير كلمة المرور: {done.exception()}")
+                return
+            try:
+                on_done(done.result()[0])
+            except Exception as e:
+                logger.error(f"فشل في حفظ كلمة المرور المعاد تشفيرها: {e}")
+
+        future.add_done_callback(_done)
+        return True
+
+    def shutdown(self) -> None:
+        """إيقاف المجمع عند إغلاق التطبيق"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _percentile(samples, fraction: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def stats(self) -> Dict[str, Any]:
+        """مقاييس طابور التشفير وزمن التنفيذ (بالثواني)"""
+        with self._lock:
+            hash_seconds = list(self._hash_seconds)
+            total_seconds = list(self._total_seconds)
+            pending = self._pending
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(pending, self.workers),
+            "queue_depth": max(0, pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_seconds_p50": self._percentile(hash_seconds, 0.5),
+            "hash_seconds_p95": self._percentile(hash_seconds, 0.95),
+            "total_seconds_p95": self._percentile(total_seconds, 0.95)
+        }
+
+
+hashing_executor = HashingExecutor(
+    mode=settings.password_hash_executor,
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue
+)
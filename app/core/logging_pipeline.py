@@ -0,0 +1,234 @@
+"""
+خط السجلات غير الحاجب (Logging pipeline)
+- جميع السجلات تمر عبر QueueHandler إلى طابور محدود، ويكتبها QueueListener في خيط مستقل
+- في خيط الطلب: إضافة سياق الطلب (request_id / tenant_id / user_id) وكبت التكرار والمعاينة فقط
+- التنسيق (JSON أو نص) والكتابة يتمان في خيط الكتابة
+- عند امتلاء الطابور تُسقط السجلات وتُعد بدلاً من حجب حلقة الأحداث
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.request_context import current_request, current_service
+
+# حقول LogRecord القياسية (ما عداها يُعتبر حقولاً إضافية من extra=)
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler يُسقط السجل عند امتلاء الطابور ويؤجل التنسيق إلى خيط الكتابة"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # دمج المعاملات في الرسالة الآن: المعاملات قد تكون كائنات تتغير (أو جلسات تُغلق) قبل خيط الكتابة
+        # (المرشحات، ومنها كبت التكرار حسب القالب، تعمل قبل prepare)
+        # التنسيق الكامل (JSON والوقت) يبقى في خيط الكتابة
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestContextFilter(logging.Filter):
+    """إضافة سياق الطلب الحالي إلى السجل (في خيط الطلب قبل الطابور)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = current_request()
+        if context is not None:
+            record.request_id = context.request_id
+            record.tenant_id = context.tenant_id
+            record.user_id = context.user_id
+            record.route = context.route
+        service = current_service()
+        if service is not None:
+            record.service = service
+        return True
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    كبت السجلات المكررة: نفس (المسجل، المستوى، القالب) أكثر من burst مرة خلال window ثانية يُكبت،
+    وأول سجل بعد انتهاء النافذة يحمل عدد المكبوت (suppressed)
+    """
+
+    def __init__(self, window_seconds: float = 10.0, burst: int = 5, max_keys: int = 10000):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.burst = burst
+        self.max_keys = max_keys
+        self._seen: Dict[Tuple[str, int, Any], list] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window_seconds:
+                if entry is None and len(self._seen) >= self.max_keys:
+                    self._seen.clear()
+                suppressed = entry[2] if entry is not None else 0
+                self._seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class SamplingFilter(logging.Filter):
+    """معاينة السجلات كثيرة التكرار: نسبة لكل مسجل للمستويات الأقل من WARNING"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self._rate(record.name)
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """سطر JSON لكل سجل مع سياق الطلب والحقول الإضافية"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS and value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """تنسيق نصي مع معرف الطلب (للتطوير)"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        return super().format(record)
+
+
+class LoggingPipeline:
+    """إعداد المسجل الجذر: QueueHandler مع المرشحات، وQueueListener يكتب إلى stderr"""
+
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.duplicates: Optional[DuplicateFilter] = None
+        self.sampling: Optional[SamplingFilter] = None
+        self._output: Optional[logging.Handler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def configure(
+        self,
+        level: str = "INFO",
+        fmt: str = "json",
+        queue_size: int = 10000,
+        dedup_window_seconds: float = 10.0,
+        dedup_burst: int = 5,
+        sample_rates: Optional[Dict[str, float]] = None,
+        output: Optional[logging.Handler] = None
+    ) -> None:
+        """
+        استبدال معالجات المسجل الجذر بالطابور (يُستدعى مرة واحدة عند الاستيراد)
+        output: وجهة الكتابة في خيط المستمع (stderr افتراضياً)
+        """
+        if self.handler is not None:
+            return
+
+        output = output or logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.duplicates = DuplicateFilter(dedup_window_seconds, dedup_burst)
+        self.sampling = SamplingFilter(sample_rates or {})
+        for log_filter in (self.sampling, self.duplicates, RequestContextFilter()):
+            self.handler.addFilter(log_filter)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(level.upper())
+
+        self._output = output
+        self.start()
+
+    def start(self) -> None:
+        """تشغيل خيط الكتابة (يُعاد تشغيله إن أُوقف في دورة حياة سابقة)"""
+        if self.handler is None or self._listener is not None:
+            return
+        self._listener = QueueListener(self.handler.queue, self._output, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """تفريغ الطابور وإيقاف خيط الكتابة عند إغلاق التطبيق"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        if self.handler is None:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "running": self._listener is not None,
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "duplicates_suppressed": self.duplicates.suppressed,
+            "sampled_out": self.sampling.sampled_out
+        }
+
+
+logging_pipeline = LoggingPipeline()
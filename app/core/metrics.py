@@ -0,0 +1,136 @@
+"""
+مقاييس Prometheus (/metrics)
+- زمن الطلبات لكل قالب مسار (وليس المسار الفعلي) وعدد الطلبات الجارية
+- مقاييس مجمعات الاتصال والذاكرة المؤقتة تُقرأ عند الجمع فقط من نفس إحصائيات /health
+- عند ضبط PROMETHEUS_MULTIPROC_DIR تُجمع مقاييس الطلبات من جميع العمال
+"""
+import os
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# حدود الزمن بالثواني (من 5ms إلى 10s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+# منظف الاشتراكات المنتهية (app/services/subscription_sweeper.py)
+SWEEPER_EXPIRED = Counter(
+    "subscription_sweeper_expired",
+    "Subscriptions marked expired by the sweeper"
+)
+
+SWEEPER_RUNS = Counter(
+    "subscription_sweeper_runs",
+    "Sweeper runs by outcome (swept, idle, skipped = lock held elsewhere, error)",
+    ["outcome"]
+)
+
+SWEEPER_DURATION = Histogram(
+    "subscription_sweeper_duration_seconds",
+    "Duration of sweeper runs that acquired the lock",
+    buckets=LATENCY_BUCKETS + (30.0, 60.0)
+)
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """قالب المسار المطابق؛ الطلبات غير المطابقة تُجمع تحت قيمة واحدة لتجنب تضخم التسميات"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def observe_request(method: str, route: str, status: int, duration_ns: int) -> None:
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(duration_ns / 1e9)
+
+
+class RuntimeStatsCollector:
+    """
+    مقاييس مشتقة من إحصائيات موجودة (مجمعات الاتصال والذاكرة المؤقتة)
+    تُحسب عند طلب /metrics فقط، فلا تكلفة لها على مسار الطلبات
+    """
+
+    def __init__(self, engine_stats: Callable[[], Dict[str, Any]], caches: Callable[[], Iterable[Any]]):
+        self._engine_stats = engine_stats
+        self._caches = caches
+
+    @staticmethod
+    def _pools(stats: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        pools = [("primary", stats.get("connection_pool", {}))]
+        pools.extend((replica["name"], replica) for replica in stats.get("replicas", []))
+        return pools
+
+    def collect(self):
+        stats = self._engine_stats()
+        pool_metrics = {
+            name: GaugeMetricFamily(f"db_pool_{name}", f"Database pool {name}", labels=["engine"])
+            for name in ("size", "checkedin", "checkedout", "overflow")
+        }
+        replica_lag = GaugeMetricFamily("db_replica_lag_seconds", "Replica replay lag", labels=["engine"])
+        replica_healthy = GaugeMetricFamily("db_replica_healthy", "Replica is used for reads", labels=["engine"])
+
+        for engine, pool in self._pools(stats):
+            for name, metric in pool_metrics.items():
+                if name in pool:
+                    metric.add_metric([engine], pool[name])
+            if engine != "primary":
+                replica_healthy.add_metric([engine], 1 if pool.get("healthy") else 0)
+                if pool.get("lag_seconds") is not None:
+                    replica_lag.add_metric([engine], pool["lag_seconds"])
+
+        yield from pool_metrics.values()
+        yield replica_lag
+        yield replica_healthy
+        yield CounterMetricFamily(
+            "db_replica_fallbacks", "Reads sent to the primary because no replica was available",
+            value=stats.get("replica_fallbacks", 0)
+        )
+
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries in the local cache", labels=["cache"])
+        for cache in self._caches():
+            cache_stats = cache.stats()
+            name = cache_stats["name"]
+            hits.add_metric([name], cache_stats["hits"])
+            misses.add_metric([name], cache_stats["misses"])
+            ratio.add_metric([name], cache_stats["hit_ratio"])
+            entries.add_metric([name], cache_stats["size"])
+        yield from (hits, misses, ratio, entries)
+
+
+_runtime_collector = None
+
+
+def register_runtime_collector(collector: RuntimeStatsCollector) -> None:
+    """تسجيل مجمع الإحصائيات مرة واحدة"""
+    global _runtime_collector
+    if _runtime_collector is None:
+        REGISTRY.register(collector)
+        _runtime_collector = collector
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """نص Prometheus للعامل الحالي، أو لجميع العمال في وضع multiprocess"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if _runtime_collector is not None:
+            registry.register(_runtime_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
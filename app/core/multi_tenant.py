@@ -1,10 +1,77 @@
+import json
+from types import MappingProxyType
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 
 from app.models.user import User
 from app.models.tenant import Tenant
 from app.core.security import decode_access_token
+from app.core.cache import TENANT_NOT_FOUND, TenantSnapshot, cache_tenant, get_cached_tenant
+from app.core.singleflight import SingleFlight
+
+tenant_flight = SingleFlight("tenant")
+
+
+def _parse_settings(settings_json: Optional[str]) -> Dict[str, Any]:
+    """تحليل إعدادات الشركة المخزنة كنص JSON"""
+    if not settings_json:
+        return {}
+    try:
+        parsed = json.loads(settings_json)
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def snapshot_tenant(tenant: Tenant) -> TenantSnapshot:
+    """إنشاء لقطة للقراءة فقط من الشركة"""
+    return TenantSnapshot(
+        tenant_id=tenant.id,
+        status=tenant.subscription_status,
+        is_active=tenant.is_active,
+        plan_type=tenant.plan_type,
+        max_users=tenant.max_users,
+        max_branches=tenant.max_branches,
+        max_storage_gb=tenant.max_storage_gb,
+        settings=MappingProxyType(_parse_settings(tenant.settings_json)),
+        columns=tuple(tenant.to_dict().items())
+    )
+
+
+def resolve_tenant(db: Session, tenant_id: int) -> Optional[TenantSnapshot]:
+    """
+    الحصول على لقطة الشركة من الذاكرة المؤقتة أو قاعدة البيانات
+    المعرفات غير الموجودة تُخزن لفترة قصيرة حتى لا تُستعلم في كل طلب
+    """
+    cached = get_cached_tenant(tenant_id)
+    if cached is TENANT_NOT_FOUND:
+        return None
+    if cached is not None:
+        return cached
+    
+    def load() -> Optional[TenantSnapshot]:
+        tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+        snapshot = snapshot_tenant(tenant) if tenant else None
+        cache_tenant(tenant_id, snapshot)
+        return snapshot
+    
+    # الطلبات المتزامنة لنفس الشركة عند انتهاء صلاحيتها تنتظر استعلاماً واحداً
+    return tenant_flight.do(int(tenant_id), load)
+
+
+def tenant_from_snapshot(db: Session, snapshot: TenantSnapshot) -> Tenant:
+    """إعادة بناء الشركة من اللقطة دون استعلام قاعدة البيانات"""
+    existing = db.identity_map.get(identity_key(Tenant, snapshot.tenant_id))
+    if existing is not None:
+        return existing
+    
+    tenant = Tenant(**dict(snapshot.columns))
+    # ربط الكائن بالجلسة كأنه محمّل من استعلام؛ العلاقات تُحمّل عند الحاجة فقط
+    make_transient_to_detached(tenant)
+    db.add(tenant)
+    return tenant
 
 
 class TenantContext:
@@ -13,6 +80,7 @@ class TenantContext:
     def __init__(self):
         self.current_tenant: Optional[Tenant] = None
         self.current_user: Optional[User] = None
+        self.tenant: Optional[TenantSnapshot] = None
     
     def set_from_token(self, token_data: Dict[str, Any]):
         """تعيين السياق من بيانات الرمز"""
@@ -22,11 +90,10 @@ class TenantContext:
             self.user_id = token_data["sub"]
     
     def get_tenant_from_db(self, db: Session) -> Optional[Tenant]:
-        """الحصول على المستأجر من قاعدة البيانات"""
+        """الحصول على المستأجر (من اللقطة المخزنة إن وُجدت)"""
         if hasattr(self, 'tenant_id') and self.tenant_id:
-            self.current_tenant = db.query(Tenant).filter(
-                Tenant.id == self.tenant_id
-            ).first()
+            self.tenant = resolve_tenant(db, self.tenant_id)
+            self.current_tenant = tenant_from_snapshot(db, self.tenant) if self.tenant else None
         return self.current_tenant
     
     def get_user_from_db(self, db: Session) -> Optional[User]:
@@ -65,15 +132,16 @@ def get_current_tenant_context(
     context = TenantContext()
     context.set_from_token(payload)
     
-    # Verify tenant exists and is active
-    tenant = context.get_tenant_from_db(db)
-    if not tenant:
+    # Verify tenant exists and is active (cached snapshot, no ORM load)
+    tenant_id = getattr(context, "tenant_id", None)
+    context.tenant = resolve_tenant(db, tenant_id) if tenant_id else None
+    if not context.tenant:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="المستأجر غير موجود"
         )
     
-    if tenant.status.value != "active":
+    if not context.tenant.is_usable:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="المستأجر غير نشط"
@@ -164,7 +232,7 @@ def check_tenant_subscription_limits(
 def get_tenant_stats(db: Session, tenant_id: int) -> Dict[str, int]:
     """الحصول على إحصائيات المستأجر"""
     from app.models.user import User
-    from app.models.organizational import Branch
+    from app.models.branch import Branch
     
     user_count = db.query(User).filter(User.tenant_id == tenant_id).count()
     branch_count = db.query(Branch).filter(Branch.tenant_id == tenant_id).count()
@@ -0,0 +1,69 @@
+"""
+التصفح بالمؤشر (Keyset / Cursor pagination)
+بدلاً من OFFSET الذي يزداد بطؤه مع عمق الصفحة، تُرتب النتائج حسب المعرف
+ويحمل المؤشر آخر معرف تمت قراءته فتبدأ الصفحة التالية بـ WHERE id > :last_id
+"""
+import base64
+import json
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Query
+
+T = TypeVar("T")
+
+# إصدار صيغة المؤشر (لرفض المؤشرات القديمة إذا تغيرت الصيغة مستقبلاً)
+CURSOR_VERSION = 1
+
+
+class InvalidCursor(ValueError):
+    """مؤشر تصفح غير صالح أو تالف"""
+
+    def __init__(self):
+        super().__init__("مؤشر التصفح غير صالح")
+
+
+def encode_cursor(last_id: int) -> str:
+    """ترميز آخر معرف في مؤشر معتم (base64url)"""
+    raw = json.dumps({"v": CURSOR_VERSION, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """فك ترميز المؤشر وإرجاع آخر معرف"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+
+    if payload.get("v") != CURSOR_VERSION or not isinstance(last_id, int):
+        raise InvalidCursor()
+    return last_id
+
+
+def paginate_by_cursor(query: Query, id_column: Any, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    تنفيذ الاستعلام كصفحة بالمؤشر مرتبة حسب id_column
+    يُجلب صف إضافي واحد لمعرفة وجود صفحة تالية دون COUNT
+    """
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor))
+
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = rows[:limit]
+
+    return {
+        "items": items,
+        "limit": limit,
+        "next_cursor": encode_cursor(items[-1].id) if has_more else None
+    }
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """صفحة نتائج بالمؤشر؛ next_cursor فارغ عند آخر صفحة"""
+    items: List[T]
+    limit: int
+    next_cursor: Optional[str] = None
@@ -1,11 +1,23 @@
-from typing import List, Set, Optional
+import base64
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Set, Optional
 from functools import wraps
 from fastapi import HTTPException, status, Depends
 from sqlalchemy.orm import Session
 
 from app.models.user import User
-from app.models.role_permission import Permission
+from app.models.role_permission import Permission, Role
 from app.database import get_db
+from app.core.cache import (
+    PrincipalSnapshot, TTLCache, invalidate_all_principals, invalidate_principal, principal_claims_enabled,
+    principal_version
+)
+from app.config import settings
+from app.core.redis_cache import two_level
+
+logger = logging.getLogger(__name__)
 
 
 # صلاحيات النظام الأساسية
@@ -90,6 +102,229 @@ SYSTEM_ROLES = {
 }
 
 
+# محرك الصلاحيات المعتمد على أقنعة البت
+# لكل صلاحية نظام بت ثابت حسب ترتيبها في SYSTEM_PERMISSIONS
+PERMISSION_BITS: Dict[str, int] = {
+    name: 1 << index for index, name in enumerate(SYSTEM_PERMISSIONS)
+}
+ALL_PERMISSIONS_MASK = (1 << len(PERMISSION_BITS)) - 1
+
+# الصلاحيات المخصصة (غير الموجودة في SYSTEM_PERMISSIONS) تحصل على بت بعد بتات النظام
+# تُسجل فقط من أسماء مصدرها قاعدة البيانات (أدوار المستخدمين)، وليس من أسماء تُفحص،
+# فيبقى عددها بعدد الصلاحيات المعرفة، مع حد أقصى احتياطي
+MAX_EXTRA_PERMISSIONS = 1024
+_extra_bits: Dict[str, int] = {}
+_bits_lock = threading.Lock()
+
+# أقنعة الأدوار المترجمة (محلية للعملية لأن بتات الصلاحيات المخصصة تختلف بين العمليات)
+_role_masks = TTLCache(
+    maxsize=settings.permission_cache_size,
+    ttl=settings.permission_cache_ttl_seconds,
+    name="role_masks"
+)
+
+
+def _on_remote_permissions_invalidation(op: str, key: Any) -> None:
+    # مسح أقنعة المستخدمين في عامل آخر يعني أن دوراً تغير
+    if op == "clear":
+        _role_masks.clear()
+
+
+# في Redis تُخزن مجموعة أسماء الصلاحيات لأن بتات الصلاحيات المخصصة تختلف بين العمليات
+user_permission_cache = two_level(
+    TTLCache(
+        maxsize=settings.permission_cache_size,
+        ttl=settings.permission_cache_ttl_seconds,
+        name="user_permissions"
+    ),
+    encode=lambda mask: sorted(mask_to_permissions(mask)),
+    decode=lambda names: register_permissions(names),
+    on_remote_invalidate=_on_remote_permissions_invalidation
+)
+
+
+def permission_bit(name: str) -> int:
+    """بت الصلاحية، أو 0 لصلاحية غير مسجلة (لا يملكها أي مستخدم محمّل في هذه العملية)"""
+    return PERMISSION_BITS.get(name) or _extra_bits.get(name, 0)
+
+
+def _register_permission(name: str) -> int:
+    bit = permission_bit(name)
+    if bit:
+        return bit
+    
+    with _bits_lock:
+        bit = _extra_bits.get(name)
+        if not bit:
+            if len(_extra_bits) >= MAX_EXTRA_PERMISSIONS:
+                logger.warning(f"تجاوز عدد الصلاحيات المخصصة {MAX_EXTRA_PERMISSIONS}، تم تجاهل: {name}")
+                return 0
+            bit = 1 << (len(PERMISSION_BITS) + len(_extra_bits))
+            _extra_bits[name] = bit
+        return bit
+
+
+def register_permissions(names: Iterable[str]) -> int:
+    """قناع بت لأسماء صلاحيات من قاعدة البيانات (مع تسجيل الصلاحيات المخصصة الجديدة)"""
+    mask = 0
+    for name in names:
+        mask |= _register_permission(name)
+    return mask
+
+
+def permission_mask(names: Iterable[str]) -> int:
+    """تحويل أسماء صلاحيات إلى قناع بت دون تسجيل (الأسماء غير المسجلة لا تضيف بتاً)"""
+    mask = 0
+    for name in names:
+        mask |= permission_bit(name)
+    return mask
+
+
+def _required_mask(names: Iterable[str]) -> Optional[int]:
+    """قناع الصلاحيات المطلوبة، أو None إذا كانت إحداها غير مسجلة (فلا يملكها المستخدم)"""
+    mask = 0
+    for name in names:
+        bit = permission_bit(name)
+        if not bit:
+            return None
+        mask |= bit
+    return mask
+
+
+def mask_to_permissions(mask: int) -> Set[str]:
+    """تحويل قناع البت إلى أسماء الصلاحيات"""
+    names = {name for name, bit in PERMISSION_BITS.items() if mask & bit}
+    names.update(name for name, bit in _extra_bits.items() if mask & bit)
+    return names
+
+
+def compile_role(role: Role) -> int:
+    """ترجمة الدور إلى قناع بت مرة واحدة"""
+    mask = _role_masks.get(role.id)
+    if mask is None:
+        mask = register_permissions(permission.name for permission in role.permissions)
+        _role_masks.set(role.id, mask)
+    return mask
+
+
+def get_user_permission_mask(user: User) -> int:
+    """الحصول على قناع صلاحيات المستخدم (مخزن مؤقتاً لكل مستخدم)"""
+    if user.is_superuser:
+        return ALL_PERMISSIONS_MASK
+    
+    # Principal built from verified token claims
+    claimed = getattr(user, "permission_mask", None)
+    if claimed is not None:
+        return claimed
+    
+    mask = user_permission_cache.get(user.id)
+    if mask is not None:
+        return mask
+    
+    # Permissions already resolved by the principal cache
+    if isinstance(user, PrincipalSnapshot):
+        mask = register_permissions(user.permissions)
+    else:
+        mask = 0
+        for role in user.roles:
+            if role.is_active:
+                mask |= compile_role(role)
+    
+    user_permission_cache.set(user.id, mask)
+    return mask
+
+
+def invalidate_user_permissions(user_id: int) -> None:
+    """إبطال قناع صلاحيات مستخدم بعد تغيير أدواره"""
+    user_permission_cache.delete(user_id)
+    invalidate_principal(user_id)
+
+
+def invalidate_role(role_id: Optional[int] = None) -> None:
+    """إبطال قناع دور (أو جميع الأدوار) وأقنعة المستخدمين المبنية عليه"""
+    if role_id is None:
+        _role_masks.clear()
+    else:
+        _role_masks.delete(role_id)
+    
+    # لا نعرف أعضاء الدور دون استعلام، لذا تُمسح أقنعة المستخدمين بالكامل
+    user_permission_cache.clear()
+    invalidate_all_principals()
+
+
+# مطالبة الصلاحيات المضمنة في رمز الوصول
+# تحتوي فقط على بتات صلاحيات النظام الثابتة لأن بتات الصلاحيات المخصصة محلية للعملية
+PERMISSION_CLAIM = "perm"
+PERMISSION_CLAIM_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """مستخدم مبني من مطالبات الرمز الموثقة دون الوصول لقاعدة البيانات"""
+    id: int
+    tenant_id: Optional[int]
+    is_superuser: bool
+    is_active: bool
+    permission_mask: int
+
+
+def _encode_mask(mask: int) -> str:
+    raw = mask.to_bytes(max(1, (mask.bit_length() + 7) // 8), "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _decode_mask(value: str) -> int:
+    raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+    return int.from_bytes(raw, "big")
+
+
+def build_permission_claim(user: User) -> Optional[Dict[str, Any]]:
+    """بناء مطالبة صلاحيات مضغوطة ومرقمة الإصدار للمستخدم (None إذا تعذرت قراءة الإصدار المشترك)"""
+    if not principal_claims_enabled():
+        return None
+    current = principal_version(user.id)
+    if current is None:
+        return None
+    epoch, version = current
+    return {
+        "f": PERMISSION_CLAIM_FORMAT,
+        "m": _encode_mask(get_user_permission_mask(user) & ALL_PERMISSIONS_MASK),
+        "su": bool(user.is_superuser),
+        "ac": bool(user.is_active),
+        "pv": [epoch, version]
+    }
+
+
+def principal_from_claims(payload: Dict[str, Any]) -> Optional[TokenPrincipal]:
+    """
+    بناء المستخدم من مطالبات الرمز
+    يعيد None إذا لم تكن المطالبة موجودة أو كان إصدار الصلاحيات قديماً أو تعذرت قراءته (يلزم فحص قاعدة البيانات)
+    """
+    if not principal_claims_enabled():
+        return None
+    claim = payload.get(PERMISSION_CLAIM)
+    if not isinstance(claim, dict) or claim.get("f") != PERMISSION_CLAIM_FORMAT:
+        return None
+    
+    try:
+        user_id = int(payload.get("sub"))
+        mask = _decode_mask(claim["m"])
+    except (TypeError, ValueError, KeyError):
+        return None
+    
+    current = principal_version(user_id)
+    if current is None or list(claim.get("pv") or []) != list(current):
+        return None
+    
+    return TokenPrincipal(
+        id=user_id,
+        tenant_id=payload.get("tenant_id"),
+        is_superuser=bool(claim.get("su")),
+        is_active=bool(claim.get("ac")),
+        permission_mask=mask
+    )
+
+
 def check_permission(required_permission: str):
     """Decorator للتحقق من الصلاحية"""
     def decorator(func):
@@ -107,14 +342,8 @@ def check_permission(required_permission: str):
             if current_user.is_superuser:
                 return await func(*args, **kwargs)
             
-            # Check user's permissions
-            user_permissions = set()
-            for role in current_user.roles:
-                for permission in role.permissions:
-                    user_permissions.add(permission.name)
-            
             # Check if user has required permission
-            if required_permission not in user_permissions:
+            if not check_user_permission(current_user, required_permission):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail=f"ليس لديك صلاحية {SYSTEM_PERMISSIONS.get(required_permission, required_permission)}"
@@ -127,19 +356,11 @@ def check_permission(required_permission: str):
 
 def get_user_permissions(user: User) -> Set[str]:
     """الحصول على صلاحيات المستخدم"""
-    permissions = set()
-    
     # Superuser has all permissions
     if user.is_superuser:
         return set(SYSTEM_PERMISSIONS.keys())
     
-    # Get permissions from roles
-    for role in user.roles:
-        if role.is_active:
-            for permission in role.permissions:
-                permissions.add(permission.name)
-    
-    return permissions
+    return mask_to_permissions(get_user_permission_mask(user))
 
 
 def check_user_permission(user: User, required_permission: str) -> bool:
@@ -147,8 +368,8 @@ def check_user_permission(user: User, required_permission: str) -> bool:
     if user.is_superuser:
         return True
     
-    user_permissions = get_user_permissions(user)
-    return required_permission in user_permissions
+    required = permission_bit(required_permission)
+    return bool(required) and get_user_permission_mask(user) & required == required
 
 
 def has_any_permission(user: User, permissions: List[str]) -> bool:
@@ -156,8 +377,7 @@ def has_any_permission(user: User, permissions: List[str]) -> bool:
     if user.is_superuser:
         return True
     
-    user_permissions = get_user_permissions(user)
-    return any(perm in user_permissions for perm in permissions)
+    return get_user_permission_mask(user) & permission_mask(permissions) != 0
 
 
 def has_all_permissions(user: User, permissions: List[str]) -> bool:
@@ -165,8 +385,8 @@ def has_all_permissions(user: User, permissions: List[str]) -> bool:
     if user.is_superuser:
         return True
     
-    user_permissions = get_user_permissions(user)
-    return all(perm in user_permissions for perm in permissions)
+    required = _required_mask(permissions)
+    return required is not None and get_user_permission_mask(user) & required == required
 
 
 def initialize_default_permissions(db: Session) -> List[Permission]:
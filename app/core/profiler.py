@@ -0,0 +1,161 @@
+"""
+محلل الأداء بالمعاينة (Sampling profiler) للعامل الحي
+- خيط مستقل يقرأ مكدسات الخيوط (sys._current_frames) كل interval ويجمع المكدسات المتطابقة
+- الإخراج: مكدسات مطوية (collapsed، لأدوات flamegraph) أو JSON بصيغة speedscope
+- وضع الطلب الواحد: يُعاين خيط حلقة الأحداث وخيوط المجمع التي تنفذ هذا الطلب فقط
+  (الخدمات عبر SyncServiceAdapter، والاعتماديات والمعالجات المتزامنة عبر traced/TracedRoute)
+  حلقة الأحداث مشتركة بين الطلبات، فعيناتها قد تتضمن طلبات أخرى متزامنة؛
+  لتحليل دقيق يُرسل الطلب إلى عامل بدون حمل، أو يُستخدم /api/admin/profile لكامل العامل
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+Frame = Tuple[str, str, int]
+
+
+class ProfilerBusy(Exception):
+    """يوجد تحليل أداء جارٍ بالفعل في هذا العامل"""
+
+
+class SamplingProfiler:
+    """معاينة مكدسات الخيوط دورياً (كل الخيوط، أو مجموعة محددة منها)"""
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Set[int]] = None, max_depth: int = 128):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_thread(self, thread_id: int) -> None:
+        if self.thread_ids is not None:
+            self.thread_ids.add(thread_id)
+
+    def _stack(self, frame: Any) -> Tuple[Frame, ...]:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append((code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        wanted = self.thread_ids
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (wanted is not None and thread_id not in wanted):
+                continue
+            self.samples[self._stack(frame)] += 1
+            self.sample_count += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started_at
+
+    def collapsed(self) -> str:
+        """سطر لكل مكدس: func (file:line);...;func count (صيغة flamegraph.pl / speedscope)"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines)
+
+    def speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """ملف speedscope (sampled) بأوزان بالثواني"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.most_common():
+            indices = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(index[frame])
+            samples.append(indices)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "bero_system_api",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+    def render(self, fmt: str, name: str = "profile") -> Any:
+        return self.collapsed() if fmt == "collapsed" else self.speedscope(name)
+
+
+# تحليل واحد في كل مرة لكل عامل (الحي أو لطلب واحد) لتحديد الكلفة
+_profile_slot = threading.Lock()
+_request_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar("request_profiler", default=None)
+
+
+@contextmanager
+def profiling_slot() -> Iterator[None]:
+    """حجز خانة التحليل الوحيدة أو رفع ProfilerBusy"""
+    if not _profile_slot.acquire(blocking=False):
+        raise ProfilerBusy("يوجد تحليل أداء جارٍ في هذا العامل")
+    try:
+        yield
+    finally:
+        _profile_slot.release()
+
+
+@contextmanager
+def request_profile(interval: float) -> Iterator[SamplingProfiler]:
+    """تحليل الطلب الحالي: خيط حلقة الأحداث + الخيوط المسجلة عبر profiled_thread"""
+    profiler = SamplingProfiler(interval=interval, thread_ids={threading.get_ident()})
+    token = _request_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _request_profiler.reset(token)
+
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    """تسجيل خيط المجمع الحالي في تحليل الطلب الجاري (إن وُجد)؛ الاستدعاءات المتداخلة لا تلغي التسجيل"""
+    profiler = _request_profiler.get()
+    thread_id = threading.get_ident()
+    if profiler is None or profiler.thread_ids is None or thread_id in profiler.thread_ids:
+        yield
+        return
+    profiler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        profiler.thread_ids.discard(thread_id)
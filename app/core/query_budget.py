@@ -0,0 +1,131 @@
+"""
+عداد الاستعلامات لكل طلب (Query budget) وكشف N+1
+- مستمعا before/after_cursor_execute على جميع المحركات يحسبان عدد الاستعلامات وزمنها في سياق الطلب
+- الاستعلامات المتكررة بنفس الشكل (بعد إزالة القيم) تُسجل كـ N+1 مشتبه به
+- في وضع الاختبار يفشل الطلب الذي يتجاوز ميزانية الاستعلامات المحددة لمساره
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?")
+_IN_LIST = re.compile(r"\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+def statement_shape(statement: str) -> str:
+    """شكل الاستعلام: بدون قيم حرفية أو أسماء معاملات، وقوائم IN مطوية"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("IN (?)", shape)
+
+
+@dataclass
+class QueryStats:
+    """إحصائيات الاستعلامات لطلب واحد"""
+    count: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Dict[str, Any]]:
+        """أشكال SELECT المتكررة threshold مرة أو أكثر (N+1 مشتبه به)"""
+        if threshold <= 0:
+            return []
+        return [
+            {"statement": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.upper().startswith("SELECT")
+        ]
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """حساب الاستعلامات المنفذة داخل الكتلة (الطلب أو المقاييس أو الاختبارات)"""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _query_stats.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started_at")
+    if started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_query(exception_context):
+    # الجملة الفاشلة لا تصل إلى after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and exception_context.cursor is not None:
+        started = connection.info.get("query_started_at")
+        if started:
+            started.pop()
+
+
+class QueryBudgetExceeded(Exception):
+    """تجاوز الطلب ميزانية الاستعلامات (وضع الاختبار)"""
+
+    def __init__(self, route: str, stats: QueryStats, budget: int, repeated: List[Dict[str, Any]]):
+        self.route = route
+        self.queries = stats.count
+        self.budget = budget
+        self.repeated = repeated
+        super().__init__(f"{route} نفذ {stats.count} استعلام (الميزانية {budget})")
+
+
+def route_budget(route: str) -> int:
+    """ميزانية المسار ("GET /api/tenants/{tenant_id}") أو الميزانية العامة (0 = بدون حد)"""
+    return settings.query_budget_routes.get(route, settings.query_budget_max_queries)
+
+
+def check_request(route: str, stats: QueryStats) -> None:
+    """
+    تسجيل N+1 المشتبه به وتجاوز الميزانية في نهاية الطلب
+    في الوضع الصارم (أو بيئة الاختبار) يُرفع QueryBudgetExceeded
+    """
+    repeated = stats.repeated(settings.query_repeat_threshold)
+    for item in repeated:
+        logger.warning(f"N+1 مشتبه به في {route}: {item['count']}× {item['statement'][:200]}")
+
+    budget = route_budget(route)
+    if budget and stats.count > budget:
+        logger.warning(f"{route} تجاوز ميزانية الاستعلامات: {stats.count} > {budget}")
+        if settings.query_budget_enforced:
+            raise QueryBudgetExceeded(route, stats, budget, repeated)
@@ -0,0 +1,315 @@
+"""
+طبقة التخزين المؤقت الموزعة (Redis) أمام الذاكرة المؤقتة داخل العملية
+- المستوى الأول: TTLCache محلي لكل عملية (بدون شبكة)
+- المستوى الثاني: Redis مشترك بين جميع العمال
+- الإبطال يُبث عبر Redis pub/sub فتحذف بقية العمال نسخها المحلية
+عند عدم ضبط REDIS_URL (أو عدم تثبيت redis) تعمل الذاكرة المؤقتة محلياً فقط
+القيم تُخزن في Redis بصيغة JSON فقط (encode/decode لكل ذاكرة)، فلا تُنفذ أي شيفرة عند القراءة
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    """أنواع غير JSON المسموح بها في القيم المخزنة (بعلامة نوع صريحة)"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"نوع غير قابل للتخزين المشترك: {type(value).__name__}")
+
+
+def _json_object_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1:
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__decimal__" in value:
+            return Decimal(value["__decimal__"])
+    return value
+
+
+def dumps(value: Any) -> bytes:
+    """ترميز قيمة الذاكرة المؤقتة لـ Redis"""
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: Any) -> Any:
+    """فك ترميز قيمة من Redis (JSON فقط)"""
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+class RedisTier:
+    """اتصال Redis المشترك مع قناة بث الإبطال ومستمعها"""
+
+    def __init__(self, client: Any, namespace: str = "cache"):
+        self.client = client
+        self.namespace = namespace
+        self.channel = f"{namespace}:invalidate"
+        # معرف العملية الحالية لتجاهل رسائل الإبطال الصادرة منها
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._caches: Dict[str, "TwoLevelCache"] = {}
+        self._pubsub = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self.errors = 0
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["RedisTier"]:
+        """إنشاء الطبقة من REDIS_URL، أو None للعمل محلياً فقط"""
+        if not settings.redis_url:
+            return None
+        try:
+            import redis
+        except ImportError:
+            logger.warning("مكتبة redis غير مثبتة، سيعمل التخزين المؤقت محلياً فقط")
+            return None
+
+        client = redis.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds
+        )
+        return cls(client, namespace=settings.redis_cache_namespace)
+
+    def key(self, cache_name: str, key: Hashable) -> str:
+        """تحويل مفتاح الذاكرة المؤقتة إلى مفتاح Redis"""
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, cache_name, *(str(part) for part in parts)])
+
+    def register(self, cache: "TwoLevelCache") -> None:
+        self._caches[cache.name] = cache
+
+    def call(self, func: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        """تنفيذ أمر Redis؛ عند الفشل يُسجل الخطأ وتعمل الذاكرة المحلية وحدها"""
+        try:
+            return func(*args)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"فشل أمر Redis، سيتم الاعتماد على الذاكرة المحلية: {e}")
+            return default
+
+    def publish(self, cache_name: str, op: str, key: Any = None) -> None:
+        """بث رسالة إبطال إلى بقية العمال"""
+        message = json.dumps({"origin": self.origin, "cache": cache_name, "op": op, "key": key})
+        self.call(self.client.publish, self.channel, message)
+        self.invalidations_sent += 1
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError, KeyError):
+            return
+        if payload.get("origin") == self.origin:
+            return
+
+        cache = self._caches.get(payload.get("cache"))
+        if cache is None:
+            return
+
+        key = payload.get("key")
+        if isinstance(key, list):
+            key = tuple(key)
+        self.invalidations_received += 1
+        cache.apply_remote_invalidation(payload.get("op"), key)
+
+    def _on_listener_error(self, error: Exception, pubsub: Any, thread: Any) -> None:
+        # انقطاع مؤقت: الإبطالات الفائتة تنتهي صلاحيتها محلياً بانتهاء TTL
+        self.errors += 1
+        logger.warning(f"انقطع مستمع إبطال Redis: {error}")
+
+    def start(self) -> None:
+        """تشغيل مستمع الإبطال (بعد تفرع عمليات الخادم، عند بدء التطبيق)"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            try:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(**{self.channel: self._handle})
+                self._listener = self._pubsub.run_in_thread(
+                    sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+                )
+            except Exception as e:
+                self.errors += 1
+                self._pubsub = self._listener = None
+                logger.warning(f"تعذر الاشتراك في قناة إبطال Redis: {e}")
+
+    def stop(self) -> None:
+        """إيقاف المستمع عند إغلاق التطبيق"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+            pubsub, self._pubsub = self._pubsub, None
+        if listener is not None:
+            listener.stop()
+        if pubsub is not None:
+            self.call(pubsub.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "listening": self._listener is not None,
+            "errors": self.errors,
+            "invalidations_sent": self.invalidations_sent,
+            "invalidations_received": self.invalidations_received
+        }
+
+
+class TwoLevelCache:
+    """
+    ذاكرة مؤقتة بمستويين بنفس واجهة TTLCache
+    encode/decode تحول القيمة إلى صيغة JSON (dict/list/أنواع أساسية/datetime/Decimal) وبالعكس
+    on_remote_invalidate يُستدعى عند وصول إبطال من عامل آخر
+    """
+
+    def __init__(
+        self,
+        local: Any,
+        tier: RedisTier,
+        encode: Callable[[Any], Any] = _identity,
+        decode: Callable[[Any], Any] = _identity,
+        on_remote_invalidate: Optional[Callable[[str, Any], None]] = None
+    ):
+        self.local = local
+        self.tier = tier
+        self.name = local.name
+        self.ttl = local.ttl
+        self.maxsize = local.maxsize
+        self._encode = encode
+        self._decode = decode
+        self._on_remote_invalidate = on_remote_invalidate
+        self.remote_hits = 0
+        self.remote_misses = 0
+        tier.register(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """المستوى المحلي أولاً ثم Redis (مع نسخ القيمة محلياً بنفس المدة المتبقية)"""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        redis_key = self.tier.key(self.name, key)
+        pipeline = self.tier.client.pipeline(transaction=False)
+        pipeline.get(redis_key)
+        pipeline.pttl(redis_key)
+        raw, pttl = self.tier.call(pipeline.execute, default=(None, -2))
+        if raw is None:
+            self.remote_misses += 1
+            return default
+
+        try:
+            value = self._decode(loads(raw))
+        except Exception:
+            self.tier.call(self.tier.client.delete, redis_key)
+            self.remote_misses += 1
+            return default
+
+        self.remote_hits += 1
+        ttl = pttl / 1000.0 if pttl and pttl > 0 else None
+        self.local.set(key, value, ttl=min(ttl, self.ttl) if ttl else None)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """التخزين في المستويين بنفس مدة الصلاحية"""
+        self.local.set(key, value, ttl=ttl)
+        ttl_ms = max(1, int((self.ttl if ttl is None else ttl) * 1000))
+        try:
+            raw = dumps(self._encode(value))
+        except Exception as e:
+            logger.warning(f"تعذر ترميز قيمة الذاكرة المؤقتة {self.name}: {e}")
+            return
+        self.tier.call(self.tier.client.set, self.tier.key(self.name, key), raw, None, ttl_ms)
+
+    def delete(self, key: Hashable) -> bool:
+        """حذف المفتاح من المستويين وبث الإبطال"""
+        deleted = self.local.delete(key)
+        self.tier.call(self.tier.client.delete, self.tier.key(self.name, key))
+        self.tier.publish(self.name, "delete", list(key) if isinstance(key, tuple) else key)
+        return deleted
+
+    def delete_prefix(self, prefix: Tuple[Any, ...]) -> int:
+        """حذف جميع المفاتيح التي تبدأ بالبادئة من المستويين وبث الإبطال"""
+        deleted = self.local.delete_prefix(prefix)
+        self._delete_remote_pattern(self.tier.key(self.name, prefix) + ":*")
+        self.tier.publish(self.name, "prefix", list(prefix))
+        return deleted
+
+    def clear(self) -> None:
+        """مسح المستويين وبث الإبطال"""
+        self.local.clear()
+        self._delete_remote_pattern(f"{self.tier.namespace}:{self.name}:*")
+        self.tier.publish(self.name, "clear")
+
+    def _delete_remote_pattern(self, pattern: str) -> None:
+        def _delete() -> None:
+            batch = []
+            for redis_key in self.tier.client.scan_iter(match=pattern, count=500):
+                batch.append(redis_key)
+                if len(batch) >= 500:
+                    self.tier.client.delete(*batch)
+                    batch = []
+            if batch:
+                self.tier.client.delete(*batch)
+
+        self.tier.call(_delete)
+
+    def apply_remote_invalidation(self, op: str, key: Any) -> None:
+        """تطبيق إبطال صادر من عامل آخر على المستوى المحلي فقط"""
+        if op == "delete":
+            self.local.delete(key)
+        elif op == "prefix":
+            self.local.delete_prefix(key)
+        elif op == "clear":
+            self.local.clear()
+        else:
+            return
+
+        if self._on_remote_invalidate is not None:
+            self._on_remote_invalidate(op, key)
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats.update(
+            backend="redis",
+            remote_hits=self.remote_hits,
+            remote_misses=self.remote_misses
+        )
+        return stats
+
+
+redis_tier = RedisTier.from_settings()
+
+
+def two_level(
+    local: Any,
+    encode: Callable[[Any], Any] = _identity,
+    decode: Callable[[Any], Any] = _identity,
+    on_remote_invalidate: Optional[Callable[[str, Any], None]] = None
+) -> Any:
+    """تغليف الذاكرة المحلية بطبقة Redis إن كانت مضبوطة، وإلا إرجاعها كما هي"""
+    if redis_tier is None:
+        return local
+    return TwoLevelCache(local, redis_tier, encode, decode, on_remote_invalidate)
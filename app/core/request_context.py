@@ -0,0 +1,89 @@
+"""
+سياق الطلب الحالي (Request context)
+معرف الطلب والمسار والمستخدم والشركة ودالة الخدمة الجارية، متاحة لأي كود يعمل ضمن الطلب
+(مستمعي SQLAlchemy والسجلات) دون تمريرها كمعاملات
+"""
+import re
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+# معرف الطلب الوارد من العميل أو الموازن يُقبل فقط بهذه الصيغة
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._\-]{1,64}$")
+
+
+@dataclass
+class RequestContext:
+    """بيانات الطلب الحالي؛ scope هو نطاق ASGI المشترك الذي يضيف إليه الموجّه المسار المطابق"""
+    request_id: str
+    method: str
+    path: str
+    scope: Dict[str, Any] = field(default_factory=dict, repr=False)
+    tenant_id: Optional[int] = None
+    user_id: Optional[int] = None
+    is_superuser: bool = False
+
+    @property
+    def route(self) -> str:
+        """قالب المسار المطابق (/api/tenants/{tenant_id}) أو المسار الفعلي قبل التوجيه"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.path
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+_service_origin: ContextVar[Optional[str]] = ContextVar("service_origin", default=None)
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """استخدام X-Request-ID الوارد إن كان صالحاً، وإلا توليد معرف جديد"""
+    if incoming and _REQUEST_ID.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def begin_request(request_id: str, method: str, path: str, scope: Dict[str, Any]):
+    """بدء سياق الطلب؛ يُرجع السياق ورمز الاستعادة"""
+    context = RequestContext(request_id=request_id, method=method, path=path, scope=scope)
+    return context, _request_context.set(context)
+
+
+def end_request(token) -> None:
+    _request_context.reset(token)
+
+
+def current_request() -> Optional[RequestContext]:
+    return _request_context.get()
+
+
+def current_request_id() -> Optional[str]:
+    context = _request_context.get()
+    return context.request_id if context is not None else None
+
+
+def set_request_principal(user_id: Any = None, tenant_id: Any = None, is_superuser: Optional[bool] = None) -> None:
+    """تسجيل المستخدم والشركة في سياق الطلب بعد فك رمز المصادقة"""
+    context = _request_context.get()
+    if context is None:
+        return
+    if user_id is not None:
+        context.user_id = user_id
+    if tenant_id is not None:
+        context.tenant_id = tenant_id
+    if is_superuser is not None:
+        context.is_superuser = is_superuser
+
+
+def current_service() -> Optional[str]:
+    return _service_origin.get()
+
+
+@contextmanager
+def service_scope(origin: str) -> Iterator[None]:
+    """تحديد دالة الخدمة الجارية (TenantService.get_tenant) للاستعلامات المنفذة داخلها"""
+    token = _service_origin.set(origin)
+    try:
+        yield
+    finally:
+        _service_origin.reset(token)
@@ -0,0 +1,188 @@
+"""
+البحث النصي (Search) للشركات والفروع والمستخدمين
+- توحيد النص العربي: حذف التشكيل والتطويل وتوحيد أشكال الألف وتحويل الأحرف اللاتينية لصغيرة
+- PostgreSQL: دالة search_normalize الثابتة (IMMUTABLE) وفهارس GIN بامتداد pg_trgm
+  على تعبير النص الموحد لكل جدول، فيستخدم LIKE '%term%' الفهرس بدلاً من المسح الكامل
+  الدالة تُنشأ عند بدء كل عامل (تحت قفل استشاري)، أما الامتداد والفهارس فترحيل منفصل
+  يُشغل مرة واحدة عند النشر لأنه CONCURRENTLY (لا يقفل الجداول عن الكتابة):
+      python -m app.core.search
+- SQLite: تسجيل نفس الدالة في Python عند الاتصال، فيعمل نفس الاستعلام بمسح تسلسلي
+"""
+import logging
+from typing import Dict, List
+
+from sqlalchemy import event, func, literal_column, text
+from sqlalchemy.engine import Engine
+
+from app.models.branch import Branch
+from app.models.tenant import Tenant
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# أشكال الألف الموحدة إلى "ا"
+ALEF_FORMS = "\u0622\u0623\u0625\u0671"  # آ أ إ ٱ
+ALEF = "\u0627"
+
+# التشكيل (الفتحتان ... السكون) والألف الخنجرية والتطويل
+DIACRITICS = "".join(chr(code) for code in range(0x064B, 0x0653)) + "\u0670\u0640"
+
+_TRANSLATION = {ord(char): ALEF for char in ALEF_FORMS}
+_TRANSLATION.update({ord(char): None for char in DIACRITICS})
+
+# الحقول التي يشملها البحث لكل نموذج
+SEARCH_FIELDS: Dict[type, List[str]] = {
+    Tenant: ["name", "code", "email", "city", "country"],
+    Branch: ["name", "code", "city", "country", "manager_name"],
+    User: ["first_name", "last_name", "email", "username"],
+}
+
+# هل الفهارس الثلاثية متاحة (تُحدد عند تطبيق ترحيل البحث)
+trigram_enabled = False
+
+
+def normalize_search_text(value) -> str:
+    """توحيد النص للبحث: أحرف صغيرة، حذف التشكيل، توحيد الألف"""
+    if value is None:
+        return ""
+    return str(value).lower().translate(_TRANSLATION)
+
+
+def search_document(model: type):
+    """
+    تعبير SQL للنص الموحد القابل للبحث في النموذج
+    الثوابت حرفية (وليست معاملات) حتى يطابق التعبير فهرس GIN حرفياً
+    """
+    document = None
+    for field in SEARCH_FIELDS[model]:
+        part = func.coalesce(getattr(model, field), literal_column("''"))
+        document = part if document is None else document + literal_column("' '") + part
+    return func.search_normalize(document)
+
+
+def escape_like(term: str) -> str:
+    """تهريب أحرف LIKE الخاصة في عبارة البحث"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(model: type, term: str):
+    """شرط البحث الجزئي على النص الموحد"""
+    pattern = f"%{escape_like(normalize_search_text(term))}%"
+    return search_document(model).like(pattern, escape="\\")
+
+
+def search_order(model: type, term: str, dialect: str):
+    """
+    ترتيب النتائج: تشابه الكلمات (pg_trgm) على PostgreSQL،
+    وموضع أول تطابق (الأبكر أفضل) في المسح التسلسلي
+    """
+    normalized = normalize_search_text(term)
+    document = search_document(model)
+    if dialect == "postgresql":
+        if trigram_enabled:
+            return func.word_similarity(normalized, document).desc()
+        return func.strpos(document, normalized)
+    return func.instr(document, normalized)
+
+
+# ترحيل البحث على PostgreSQL (كل الأوامر قابلة للتكرار بأمان)
+_NORMALIZE_FUNCTION = """
+CREATE OR REPLACE FUNCTION search_normalize(value text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$ SELECT translate(lower(coalesce(value, '')), '{source}', '{target}') $$
+"""
+
+# مفتاح القفل الاستشاري لترحيل البحث (العمال تبدأ معاً و CREATE OR REPLACE المتزامن يفشل)
+SEARCH_MIGRATION_LOCK_KEY = 0x5345415243484D47  # "SEARCHMG"
+
+_INDEXED_TABLES = {
+    "ix_tenants_search_trgm": Tenant,
+    "ix_branches_search_trgm": Branch,
+    "ix_users_search_trgm": User,
+}
+
+
+def _index_expression(model: type) -> str:
+    columns = " || ' ' || ".join(f"coalesce({field}, '')" for field in SEARCH_FIELDS[model])
+    return f"search_normalize({columns})"
+
+
+def _create_normalize_function(engine: Engine) -> None:
+    normalize_sql = _NORMALIZE_FUNCTION.format(
+        source=ALEF_FORMS + DIACRITICS,
+        target=ALEF * len(ALEF_FORMS)
+    )
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEARCH_MIGRATION_LOCK_KEY})
+        connection.execute(text(normalize_sql))
+
+
+def apply_search_migration(engine: Engine) -> bool:
+    """
+    عند بدء العامل: إنشاء دالة التوحيد، وتفعيل ترتيب pg_trgm إذا كان الامتداد مثبتاً
+    الفهارس لا تُنشأ هنا (انظر create_search_indexes)؛ غيابها يعني مسحاً تسلسلياً فقط
+    """
+    global trigram_enabled
+
+    if engine.dialect.name != "postgresql":
+        return False
+
+    _create_normalize_function(engine)
+
+    with engine.connect() as connection:
+        trigram_enabled = connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        ).scalar()
+        valid_indexes = connection.execute(
+            text(
+                "SELECT count(*) FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = ANY(:names) AND pg_index.indisvalid"
+            ),
+            {"names": list(_INDEXED_TABLES)}
+        ).scalar()
+
+    if valid_indexes < len(_INDEXED_TABLES):
+        logger.warning("فهارس البحث الثلاثية غير مكتملة، شغّل: python -m app.core.search")
+    return bool(trigram_enabled)
+
+
+def create_search_indexes(engine: Engine) -> None:
+    """
+    ترحيل النشر: امتداد pg_trgm وفهارس GIN بـ CREATE INDEX CONCURRENTLY (خارج المعاملات)
+    الفهرس غير الصالح المتبقي من محاولة فاشلة يُحذف ويُعاد إنشاؤه
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    _create_normalize_function(engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for index_name, model in _INDEXED_TABLES.items():
+            invalid = connection.execute(
+                text(
+                    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                    "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+                ),
+                {"name": index_name}
+            ).scalar()
+            if invalid:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+            connection.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {model.__tablename__} "
+                f"USING gin (({_index_expression(model)}) gin_trgm_ops)"
+            ))
+            logger.info(f"فهرس البحث {index_name} جاهز")
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """تسجيل دالة search_normalize في اتصالات SQLite (المسح التسلسلي)"""
+    if hasattr(dbapi_connection, "create_function"):
+        dbapi_connection.create_function("search_normalize", 1, normalize_search_text)
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    create_search_indexes(engine)
@@ -1,11 +1,11 @@
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 
 from app.config import settings
+from app.core.hashing import hashing_executor, password_policy
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_policy.context
 
 
 def create_access_token(
@@ -17,7 +17,7 @@ def create_access_token(
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
     to_encode = {
         "exp": expire,
@@ -30,8 +30,8 @@ def create_access_token(
     
     encoded_jwt = jwt.encode(
         to_encode, 
-        settings.SECRET_KEY, 
-        algorithm=settings.ALGORITHM
+        settings.secret_key, 
+        algorithm=settings.algorithm
     )
     return encoded_jwt
 
@@ -45,7 +45,7 @@ def create_refresh_token(
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
     
     to_encode = {
         "exp": expire,
@@ -59,8 +59,8 @@ def create_refresh_token(
     
     encoded_jwt = jwt.encode(
         to_encode, 
-        settings.SECRET_KEY, 
-        algorithm=settings.ALGORITHM
+        settings.secret_key, 
+        algorithm=settings.algorithm
     )
     return encoded_jwt
 
@@ -70,8 +70,8 @@ def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
     try:
         payload = jwt.decode(
             token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
+            settings.secret_key, 
+            algorithms=[settings.algorithm]
         )
         return payload
     except JWTError:
@@ -83,8 +83,8 @@ def decode_refresh_token(token: str) -> Optional[Dict[str, Any]]:
     try:
         payload = jwt.decode(
             token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
+            settings.secret_key, 
+            algorithms=[settings.algorithm]
         )
         
         # Verify it's a refresh token
@@ -98,12 +98,27 @@ def decode_refresh_token(token: str) -> Optional[Dict[str, Any]]:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """التحقق من كلمة المرور"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_executor.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """تشفير كلمة المرور"""
-    return pwd_context.hash(password)
+    return hashing_executor.hash(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """التحقق من كلمة المرور دون حجب حلقة الأحداث"""
+    return await hashing_executor.verify_async(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """تشفير كلمة المرور دون حجب حلقة الأحداث"""
+    return await hashing_executor.hash_async(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """هل تحتاج كلمة المرور المخزنة لإعادة تشفير حسب السياسة الحالية"""
+    return password_policy.needs_update(hashed_password)
 
 
 def generate_password_reset_token(email: str) -> str:
@@ -114,8 +129,8 @@ def generate_password_reset_token(email: str) -> str:
     exp = expires.timestamp()
     encoded_jwt = jwt.encode(
         {"exp": exp, "nbf": now, "sub": email},
-        settings.SECRET_KEY,
-        algorithm=settings.ALGORITHM,
+        settings.secret_key,
+        algorithm=settings.algorithm,
     )
     return encoded_jwt
 
@@ -125,8 +140,8 @@ def verify_password_reset_token(token: str) -> Optional[str]:
     try:
         decoded_token = jwt.decode(
             token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
+            settings.secret_key, 
+            algorithms=[settings.algorithm]
         )
         return decoded_token["sub"]
     except JWTError:
@@ -0,0 +1,262 @@
+"""
+الحماية من تدافع الذاكرة المؤقتة (Cache stampede)
+- SingleFlight: الطلبات المتزامنة لنفس المفتاح تنتظر حساباً واحداً جارياً بدلاً من تكراره
+  (في خيوط المجمع عبر threading.Event، وفي حلقة الأحداث عبر asyncio.Future داخل greenlet الخاص بـ run_sync)
+- RefreshingCache: تحديث مبكر احتمالي (XFetch) قبل انتهاء الصلاحية،
+  وتقديم القيمة القديمة أثناء إعادة التحقق في الخلفية (stale-while-revalidate)؛
+  رقم جيل لكل مفتاح يمنع تحديثاً بدأ قبل invalidate() من كتابة قيمة قديمة بعده
+"""
+import asyncio
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from app.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def _in_event_loop_thread() -> bool:
+    """هل الاستدعاء داخل خيط حلقة الأحداث (مثل AsyncSession.run_sync)"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """تجميع الاستدعاءات المتزامنة لنفس المفتاح في تنفيذ واحد"""
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # الاستدعاءات الجارية في حلقة الأحداث (تُستخدم من خيط الحلقة فقط، فلا تحتاج قفلاً)
+        self._loop_calls: Dict[Hashable, "asyncio.Future"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        تنفيذ fn مرة واحدة لكل مفتاح جارٍ؛ بقية المستدعين يحصلون على نفس النتيجة أو الاستثناء
+        داخل خيط حلقة الأحداث لا يُنتظر Event (يحجب المنفذ الأول نفسه)، بل Future عبر await_only
+        """
+        if _in_event_loop_thread():
+            return self._do_in_loop(key, fn)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _do_in_loop(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        المستدعي في حلقة الأحداث (AsyncSession.run_sync): المنفذ الأول يسجل Future،
+        والبقية تنتظره بـ await_only فتعود الحلقة لتنفيذ الأول أثناء انتظارها
+        خارج greenlet (استدعاء متزامن مباشر في الحلقة) لا يمكن الانتظار، فيُنفذ fn مباشرة
+        """
+        future = self._loop_calls.get(key)
+        if future is not None:
+            if not in_greenlet():
+                return fn()
+            self.coalesced += 1
+            # shield: إلغاء أحد المنتظرين لا يلغي النتيجة المشتركة
+            return await_only(asyncio.shield(future))
+
+        future = self._loop_calls[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # تجنب تحذير "exception was never retrieved" عند عدم وجود منتظرين
+            future.exception()
+            raise
+        finally:
+            self._loop_calls.pop(key, None)
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls or key in self._loop_calls
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._loop_calls)
+        }
+
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_lock = threading.Lock()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+    return _refresh_executor
+
+
+def shutdown_refresh_executor() -> None:
+    """إيقاف منفذ التحديث في الخلفية عند إغلاق التطبيق"""
+    global _refresh_executor
+    with _refresh_lock:
+        executor, _refresh_executor = _refresh_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RefreshingCache:
+    """
+    ذاكرة مؤقتة للقيم المحسوبة مع الحماية من التدافع
+    كل مدخل يحفظ (القيمة، زمن الحساب، وقت انتهاء الصلاحية) ويبقى مخزناً stale_ttl إضافية
+    loader يُنفذ في سياق الطلب؛ refresher (اختياري) يُنفذ في الخلفية بجلسة مستقلة
+    """
+
+    def __init__(self, cache: Any, ttl: float, stale_ttl: float = 0.0, beta: float = 1.0):
+        self.cache = cache
+        self.name = cache.name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.flight = SingleFlight(cache.name)
+        self._refreshing = SingleFlight(f"{cache.name}:refresh")
+        # أجيال الإبطال: عامة (للمسح الكامل) ولكل مفتاح، تُحفظ بحدود نفس الذاكرة المؤقتة
+        # (مدخل الجيل المنتهي يختلف عن أي لقطة سابقة، فيُسقط التحديث الجاري بأمان)
+        self._epoch = 0
+        self._generations = TTLCache(maxsize=cache.maxsize, ttl=ttl + stale_ttl, name=f"{cache.name}:generations")
+        self._generation_counter = itertools.count(1)
+        self._store_lock = threading.Lock()
+        self.early_refreshes = 0
+        self.stale_served = 0
+        self.stale_refreshes_dropped = 0
+
+    def _should_refresh_early(self, now: float, delta: float, expires_at: float) -> bool:
+        # XFetch: احتمال التحديث يزداد كلما اقترب وقت الانتهاء وطال زمن الحساب
+        if self.beta <= 0 or delta <= 0:
+            return False
+        return now - delta * self.beta * math.log(1.0 - random.random()) >= expires_at
+
+    def _generation(self, key: Hashable) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        generation = self._generation(key)
+        started = time.perf_counter()
+        value = loader()
+        delta = time.perf_counter() - started
+        with self._store_lock:
+            # أُبطل المفتاح أثناء الحساب: القيمة قد تسبق التعديل فلا تُخزن
+            if self._generation(key) != generation:
+                self.stale_refreshes_dropped += 1
+                return value
+            # وقت ساعة الجدار لأن المدخل قد يُشارك بين العمليات عبر Redis
+            self.cache.set(key, (value, delta, time.time() + self.ttl), ttl=self.ttl + self.stale_ttl)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, refresher: Callable[[], Any]) -> None:
+        if self._refreshing.in_flight(key):
+            return
+
+        def _run() -> None:
+            try:
+                self._refreshing.do(key, lambda: self._load(key, refresher))
+            except Exception as e:
+                logger.warning(f"فشل تحديث الذاكرة المؤقتة {self.name} في الخلفية: {e}")
+
+        try:
+            _get_refresh_executor().submit(_run)
+        except RuntimeError:
+            # المنفذ متوقف (إغلاق التطبيق)
+            pass
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        refresher: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """القيمة المخزنة أو حسابها مرة واحدة لجميع الطلبات المتزامنة"""
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, delta, expires_at = entry
+            now = time.time()
+            if now < expires_at:
+                if self._should_refresh_early(now, delta, expires_at):
+                    self.early_refreshes += 1
+                    if refresher is None:
+                        return self.flight.do(key, lambda: self._load(key, loader))
+                    self._refresh_in_background(key, refresher)
+                return value
+
+            if refresher is not None and now < expires_at + self.stale_ttl:
+                self.stale_served += 1
+                self._refresh_in_background(key, refresher)
+                return value
+
+        return self.flight.do(key, lambda: self._load(key, loader))
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._store_lock:
+            self.note_invalidated(key)
+            return self.cache.delete(key)
+
+    def note_invalidated(self, key: Optional[Hashable] = None) -> None:
+        """إسقاط الحسابات الجارية للمفتاح (أو لجميع المفاتيح) بعد إبطال من هذا العامل أو غيره"""
+        if key is None:
+            self._epoch += 1
+        else:
+            self._generations.set(key, next(self._generation_counter))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats.update(
+            self.flight.stats(),
+            early_refreshes=self.early_refreshes,
+            stale_served=self.stale_served,
+            stale_refreshes_dropped=self.stale_refreshes_dropped
+        )
+        return stats
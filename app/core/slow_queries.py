@@ -0,0 +1,155 @@
+"""
+سجل الاستعلامات البطيئة وتوسيم مصدر SQL
+- كل استعلام يُلحق به تعليق /* route=... svc=... */ ليظهر مصدره في pg_stat_statements
+- الاستعلامات الأبطأ من الحد تُسجل بشكلها الموحد ومعاملاتها المنقحة وزمنها ومصدرها ومعرف الطلب
+- أبطأ N استعلام تُحفظ في ذاكرة محدودة وتُعرض على مسار الإدارة
+"""
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.core.query_budget import statement_shape
+from app.core.request_context import current_request, current_service
+
+logger = logging.getLogger(__name__)
+
+# أسماء المعاملات التي لا تُسجل قيمها أبداً
+_SENSITIVE = re.compile(r"pass|secret|token|hash|key|salt|otp|credential", re.IGNORECASE)
+_MAX_PARAMETER_LENGTH = 64
+_MAX_PARAMETER_ROWS = 5
+_COMMENT_UNSAFE = re.compile(r"[^A-Za-z0-9_./{}\-]")
+
+
+def sql_origin_comment(route: Optional[str], service: Optional[str]) -> str:
+    """تعليق SQL بمصدر الاستعلام (بدون أحرف قد تُنهي التعليق)"""
+    parts = []
+    if route:
+        parts.append(f"route={_COMMENT_UNSAFE.sub('', route)}")
+    if service:
+        parts.append(f"svc={_COMMENT_UNSAFE.sub('', service)}")
+    return f" /* {' '.join(parts)} */" if parts else ""
+
+
+def _redact_value(name: Any, value: Any) -> Any:
+    if name is not None and _SENSITIVE.search(str(name)):
+        return "***"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > _MAX_PARAMETER_LENGTH:
+        return value[:_MAX_PARAMETER_LENGTH] + "…"
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)[:_MAX_PARAMETER_LENGTH]
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """تنقيح المعاملات: إخفاء القيم الحساسة واختصار الطويلة (وأول صفوف executemany فقط)"""
+    if isinstance(parameters, dict):
+        return {key: _redact_value(key, value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [redact_parameters(row) for row in parameters[:_MAX_PARAMETER_ROWS]]
+        return [_redact_value(None, value) for value in parameters]
+    return None
+
+
+class SlowQueryLog:
+    """أبطأ N استعلام (كومة صغرى محدودة الحجم) مع عداد إجمالي"""
+
+    def __init__(self, size: int = 50):
+        self.size = size
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        item = (entry["duration_ms"], next(self._counter), entry)
+        with self._lock:
+            self.recorded += 1
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif item[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def slowest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """الاستعلامات مرتبة من الأبطأ"""
+        with self._lock:
+            entries = [entry for _, _, entry in sorted(self._heap, reverse=True)]
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self.recorded = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": settings.slow_query_threshold_ms,
+            "recorded": self.recorded,
+            "buffered": len(self._heap),
+            "size": self.size
+        }
+
+
+slow_query_log = SlowQueryLog(size=settings.slow_query_buffer_size)
+
+
+@event.listens_for(Engine, "before_cursor_execute", retval=True)
+def _tag_and_time(conn, cursor, statement, parameters, context, executemany):
+    request = current_request()
+    route = request.route if request is not None else None
+    service = current_service()
+    conn.info.setdefault("slow_query_started_at", []).append((time.perf_counter(), route, service, len(statement)))
+    if settings.sql_origin_comments:
+        statement = statement + sql_origin_comment(route, service)
+    return statement, parameters
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_if_slow(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started_at")
+    if not started:
+        return
+    started_at, route, service, length = started.pop()
+    duration_ms = (time.perf_counter() - started_at) * 1000
+    if duration_ms < settings.slow_query_threshold_ms:
+        return
+
+    request = current_request()
+    entry = {
+        "duration_ms": round(duration_ms, 3),
+        "statement": statement_shape(statement[:length]),
+        "parameters": redact_parameters(parameters),
+        "executemany": executemany,
+        "route": route,
+        "service": service,
+        "request_id": request.request_id if request is not None else None,
+        "database": conn.engine.url.database,
+        "timestamp": datetime.now().isoformat()
+    }
+    slow_query_log.record(entry)
+    logger.warning(
+        f"استعلام بطيء {entry['duration_ms']:.1f}ms "
+        f"[request_id={entry['request_id']} route={route} svc={service}] "
+        f"{entry['statement'][:500]} params={entry['parameters']}"
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_query(exception_context):
+    # الجملة الفاشلة لا تصل إلى after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and exception_context.cursor is not None:
+        started = connection.info.get("slow_query_started_at")
+        if started:
+            started.pop()
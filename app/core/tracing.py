@@ -0,0 +1,250 @@
+"""
+التتبع الموزع (OpenTelemetry)
+- span لكل طلب (باسم قالب المسار)، ولكل اعتمادية مصادقة، ولكل دالة خدمة، ولكل جملة SQL
+- السمات: معرف الطلب والمستخدم والشركة ودالة الخدمة
+- التصدير عبر OTLP، أو إلى الذاكرة (tracing_exporter=memory) ليتحقق CI من بنية الـ spans وأزمنتها بدون مُجمِّع
+عند تعطيل التتبع (أو عدم تثبيت opentelemetry) تصبح جميع الدوال بدون أثر تقريباً
+"""
+import functools
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.core.profiler import profiled_thread
+from app.core.query_budget import statement_shape
+from app.core.request_context import current_request, current_service
+
+logger = logging.getLogger(__name__)
+
+_MAX_STATEMENT_LENGTH = 2000
+
+tracer = None
+memory_exporter = None
+_provider = None
+
+
+def configure_tracing() -> bool:
+    """إعداد مزود التتبع والمُصدِّر من الإعدادات؛ False عند التعطيل"""
+    global tracer, memory_exporter, _provider
+
+    if not settings.tracing_enabled or _provider is not None:
+        return _provider is not None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("مكتبة opentelemetry-sdk غير مثبتة، سيتم تعطيل التتبع")
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio))
+    )
+
+    if settings.tracing_exporter == "memory":
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        memory_exporter = InMemorySpanExporter()
+        # معالج متزامن حتى تكون الـ spans متاحة فور انتهاء الطلب في الاختبارات
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+    elif settings.tracing_exporter == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    else:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("مُصدِّر OTLP غير مثبت (opentelemetry-exporter-otlp-proto-http)، سيتم تعطيل التتبع")
+            return False
+        # العنوان والترويسات من متغيرات OTEL_EXPORTER_OTLP_* القياسية عند عدم تحديدها
+        exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint) if settings.tracing_otlp_endpoint \
+            else OTLPSpanExporter()
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    tracer = trace.get_tracer("app")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """تصدير الـ spans المتبقية وإيقاف المزود عند إغلاق التطبيق"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def finished_spans(clear: bool = False) -> list:
+    """الـ spans المنتهية في مُصدِّر الذاكرة (للاختبارات)، مع مسحها اختيارياً"""
+    if memory_exporter is None:
+        return []
+    spans = list(memory_exporter.get_finished_spans())
+    if clear:
+        memory_exporter.clear()
+    return spans
+
+
+def _request_attributes() -> Dict[str, Any]:
+    attributes = {}
+    context = current_request()
+    if context is not None:
+        attributes["request.id"] = context.request_id
+        if context.user_id is not None:
+            attributes["enduser.id"] = str(context.user_id)
+        if context.tenant_id is not None:
+            attributes["tenant.id"] = str(context.tenant_id)
+    return attributes
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: Any = None) -> Iterator[Any]:
+    """span فرعي من الـ span الحالي مع سمات الطلب؛ None عند تعطيل التتبع"""
+    if tracer is None:
+        yield None
+        return
+    span_attributes = _request_attributes()
+    if attributes:
+        span_attributes.update(attributes)
+    options = {"attributes": span_attributes}
+    if kind is not None:
+        options["kind"] = kind
+    with tracer.start_as_current_span(name, **options) as span:
+        yield span
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    مزخرف span لدالة متزامنة أو غير متزامنة (يحافظ على التوقيع لاعتماديات FastAPI)
+    الدوال المتزامنة تعمل في مجمع خيوط FastAPI، فيُسجل خيطها في تحليل أداء الطلب الجاري (إن وُجد)
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name), profiled_thread():
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def request_span(method: str, path: str, headers: Any) -> Iterator[Any]:
+    """span الطلب الجذري (يكمل سياق traceparent الوارد إن وُجد)"""
+    if tracer is None:
+        yield None
+        return
+    from opentelemetry import propagate
+    from opentelemetry.trace import SpanKind
+
+    with tracer.start_as_current_span(
+        f"{method} {path}",
+        context=propagate.extract(dict(headers)),
+        kind=SpanKind.SERVER,
+        attributes={"http.method": method, "http.target": path}
+    ) as span:
+        yield span
+
+
+def finish_request_span(span: Any, route: Optional[str], status: int) -> None:
+    """تسمية span الطلب بقالب المسار وإضافة الحالة وسمات المستخدم والشركة"""
+    if span is None:
+        return
+    if route:
+        span.update_name(f"{span.name.split(' ', 1)[0]} {route}")
+        span.set_attribute("http.route", route)
+    span.set_attribute("http.status_code", status)
+    for key, value in _request_attributes().items():
+        span.set_attribute(key, value)
+    if status >= 500:
+        from opentelemetry.trace import Status, StatusCode
+        span.set_status(Status(StatusCode.ERROR))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_sql_span(conn, cursor, statement, parameters, context, executemany):
+    if tracer is None:
+        return
+    from opentelemetry.trace import SpanKind
+
+    attributes = _request_attributes()
+    attributes.update({
+        "db.system": conn.dialect.name,
+        "db.name": conn.engine.url.database or "",
+        "db.statement": statement_shape(statement)[:_MAX_STATEMENT_LENGTH],
+    })
+    service = current_service()
+    if service is not None:
+        attributes["code.function"] = service
+    operation = statement.lstrip().split(" ", 1)[0].upper()
+    span = tracer.start_span(f"SQL {operation}", kind=SpanKind.CLIENT, attributes=attributes)
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_sql_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+        span.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_sql_span(exception_context):
+    connection = exception_context.connection
+    if connection is None or exception_context.cursor is None:
+        return
+    spans = connection.info.get("trace_spans")
+    if spans:
+        from opentelemetry.trace import Status, StatusCode
+
+        span = spans.pop()
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+
+class TracedRoute(APIRoute):
+    """
+    مسار FastAPI مع span للمعالج كاملاً وspan للدالة نفسها،
+    فالفرق بينهما (بعد الاعتماديات) هو زمن تحويل الاستجابة (Pydantic)
+    الدوال المتزامنة تُغلف دائماً حتى يشملها تحليل أداء الطلب (X-Profile) ولو كان التتبع معطلاً
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        wrap = settings.tracing_enabled or not inspect.iscoroutinefunction(endpoint)
+        if wrap and not getattr(endpoint, "__traced__", False):
+            endpoint = traced(f"endpoint {path}")(endpoint)
+            endpoint.__traced__ = True
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[..., Any]:
+        handler = super().get_route_handler()
+        if not settings.tracing_enabled:
+            return handler
+        name = f"route {self.path}"
+
+        async def traced_handler(request: Any) -> Any:
+            with start_span(name):
+                return await handler(request)
+
+        return traced_handler
@@ -0,0 +1,110 @@
+"""
+إعدادات قاعدة البيانات غير المتزامنة - SQLAlchemy AsyncEngine / AsyncSession
+تُستخدم عند تفعيل DATABASE_MODE=async
+"""
+
+import os
+import logging
+from typing import AsyncGenerator
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import DATABASE_POOL_LIMITS, DATABASE_POOL_MODE, SESSION_SETTINGS, get_database_url
+from app.database_pooling import install_transaction_settings, pool_kwargs
+
+# إعداد السجلات
+logger = logging.getLogger(__name__)
+
+# برامج التشغيل غير المتزامنة لكل نوع قاعدة بيانات
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url() -> str:
+    """
+    تحويل رابط قاعدة البيانات إلى برنامج التشغيل غير المتزامن
+    """
+    db_url = get_database_url()
+    scheme, sep, rest = db_url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+    return db_url
+
+
+def create_async_engine_config():
+    """
+    إعداد المحرك غير المتزامن بنفس إعدادات التجميع ووضع المجمع للمحرك المتزامن
+    """
+    database_url = get_async_database_url()
+
+    engine_kwargs = {
+        "echo": os.getenv("SQL_ECHO", "false").lower() == "true",
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+
+    if database_url.startswith("postgresql+asyncpg"):
+        server_settings = {"application_name": "bero_system_api"}
+        connect_args = {"timeout": 10, "server_settings": server_settings}
+
+        if DATABASE_POOL_MODE == "transaction":
+            # PgBouncer: بدون جمل مُحضّرة مسماة على الخادم (ذاكرة asyncpg وذاكرة SQLAlchemy)
+            connect_args["statement_cache_size"] = 0
+            database_url = make_url(database_url).update_query_dict(
+                {"prepared_statement_cache_size": "0"}
+            )
+        else:
+            server_settings.update(SESSION_SETTINGS)
+
+        if DATABASE_POOL_LIMITS.pool_size == 0:
+            engine_kwargs.update(pool_kwargs(DATABASE_POOL_LIMITS))
+            engine_kwargs.pop("pool_pre_ping")
+            engine_kwargs.pop("pool_recycle")
+        else:
+            engine_kwargs.update(
+                pool_size=DATABASE_POOL_LIMITS.pool_size,
+                max_overflow=DATABASE_POOL_LIMITS.max_overflow,
+                pool_timeout=30
+            )
+        engine_kwargs["connect_args"] = connect_args
+
+    engine = create_async_engine(database_url, **engine_kwargs)
+    if DATABASE_POOL_MODE == "transaction" and engine.dialect.name == "postgresql":
+        install_transaction_settings(engine.sync_engine, SESSION_SETTINGS)
+    return engine
+
+
+# إنشاء المحرك غير المتزامن
+async_engine = create_async_engine_config()
+
+# إعداد Session Maker غير المتزامن
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    دالة مساعدة للحصول على جلسة قاعدة بيانات غير متزامنة
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"خطأ في الجلسة: {e}")
+            await db.rollback()
+            raise
+
+
+async def dispose_async_engine():
+    """
+    إغلاق اتصالات المحرك غير المتزامن عند إيقاف التطبيق
+    """
+    await async_engine.dispose()
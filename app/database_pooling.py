@@ -0,0 +1,133 @@
+"""
+تحجيم مجمع الاتصالات ووضع التوافق مع PgBouncer (transaction pooling)
+
+معادلة التحجيم (لكل خادم قاعدة بيانات، الرئيسي وكل نسخة متماثلة):
+    per_worker   = (DATABASE_MAX_CONNECTIONS - DATABASE_RESERVED_CONNECTIONS) // (WEB_CONCURRENCY * engines_per_worker)
+    pool_size    = min(الافتراضي, per_worker)
+    max_overflow = min(الافتراضي, per_worker - pool_size)
+فيكون مجموع الاتصالات: WEB_CONCURRENCY * engines_per_worker * (pool_size + max_overflow) <= MAX_CONNECTIONS - RESERVED
+engines_per_worker = 1، أو 2 مع DATABASE_MODE=async (المحرك المتزامن + المحرك غير المتزامن بنفس الحدود)
+
+وضع session (الافتراضي): اتصال مباشر بـ PostgreSQL، الإعدادات في رسالة بدء الاتصال
+وضع transaction (خلف PgBouncer): مجمع صغير أو NullPool (DATABASE_POOL_SIZE=0)،
+بدون إعدادات على مستوى الجلسة ولا جمل مُحضّرة على الخادم، والإعدادات تُطبق بـ SET LOCAL لكل معاملة
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_MODES = ("session", "transaction")
+
+# القيم الافتراضية لكل وضع عند عدم تحديد حد الاتصالات
+DEFAULT_POOL_LIMITS = {
+    "session": (20, 30),
+    "transaction": (5, 0),
+}
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """حدود مجمع الاتصالات لمحرك واحد في عامل واحد"""
+    pool_size: int
+    max_overflow: int
+
+    @property
+    def total(self) -> int:
+        return self.pool_size + self.max_overflow
+
+
+def compute_pool_limits(
+    mode: str = "session",
+    max_connections: Optional[int] = None,
+    workers: int = 1,
+    engines_per_worker: int = 1,
+    reserved_connections: int = 0,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None
+) -> PoolLimits:
+    """
+    حساب حدود المجمع: القيم الصريحة أولاً، ثم حصة العامل من max_connections، ثم القيم الافتراضية
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"وضع مجمع الاتصالات غير معروف: {mode} (المتاح: {', '.join(POOL_MODES)})")
+
+    default_size, default_overflow = DEFAULT_POOL_LIMITS[mode]
+
+    if max_connections is not None:
+        slots = max(1, workers) * max(1, engines_per_worker)
+        per_worker = (max_connections - reserved_connections) // slots
+        if per_worker < 1 and pool_size != 0:
+            raise ValueError(
+                f"DATABASE_MAX_CONNECTIONS={max_connections} لا يكفي {slots} مجمع "
+                f"(بعد حجز {reserved_connections} اتصال)"
+            )
+        default_size = min(default_size, per_worker)
+        default_overflow = min(default_overflow, per_worker - default_size)
+
+    size = default_size if pool_size is None else pool_size
+    overflow = default_overflow if max_overflow is None else max_overflow
+    if size < 0 or overflow < 0:
+        raise ValueError("حجم المجمع والاتصالات الزائدة يجب ألا تكون سالبة")
+    return PoolLimits(pool_size=size, max_overflow=overflow)
+
+
+def engines_per_worker(async_mode: bool) -> int:
+    """عدد المحركات لكل خادم قاعدة بيانات في العامل (وضع async ينشئ محركاً غير متزامن بجانب المتزامن)"""
+    return 2 if async_mode else 1
+
+
+def pool_kwargs(limits: PoolLimits, timeout: float = 30, recycle: int = 3600) -> Dict[str, Any]:
+    """معاملات create_engine للمجمع (pool_size=0 يعني NullPool: اتصال جديد لكل سحب)"""
+    if limits.pool_size == 0:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": QueuePool,
+        "pool_size": limits.pool_size,
+        "max_overflow": limits.max_overflow,
+        "pool_pre_ping": True,     # فحص الاتصال مرة واحدة عند كل سحب من المجمع
+        "pool_recycle": recycle,   # إعادة تدوير الاتصال
+        "pool_timeout": timeout,   # مهلة الانتظار للاتصال
+    }
+
+
+def set_local_statement(session_settings: Dict[str, str], dialect: Dialect) -> Tuple[str, Any]:
+    """
+    جملة واحدة تطبق جميع الإعدادات على المعاملة الحالية فقط (set_config(..., true) = SET LOCAL)
+    مع معاملاتها بصيغة برنامج التشغيل (psycopg2: %(name)s، asyncpg: $1 ...)
+    """
+    calls = ", ".join(f"set_config(:name_{i}, :value_{i}, true)" for i in range(len(session_settings)))
+    values = {}
+    for i, (name, value) in enumerate(session_settings.items()):
+        values[f"name_{i}"], values[f"value_{i}"] = name, value
+    compiled = text(f"SELECT {calls}").bindparams(**values).compile(dialect=dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        return str(compiled), tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def install_transaction_settings(engine: Engine, session_settings: Dict[str, str]) -> None:
+    """
+    تطبيق إعدادات الجلسة بـ SET LOCAL في بداية كل معاملة
+    (PgBouncer في وضع transaction قد يعطي كل معاملة اتصالاً مختلفاً بالخادم)
+    للمحرك غير المتزامن يُمرر engine.sync_engine (مؤشر asyncpg المُكيّف يعمل داخل نفس الـ greenlet)
+    """
+    if not session_settings:
+        return
+
+    statement, params = set_local_statement(session_settings, engine.dialect)
+
+    @event.listens_for(engine, "begin")
+    def _set_local(connection):
+        # مؤشر DBAPI مباشرة: التنفيذ عبر Connection هنا يبدأ معاملة متداخلة
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(statement, params)
+        finally:
+            cursor.close()
@@ -0,0 +1,234 @@
+"""
+توجيه القراءة إلى النسخ المتماثلة (Read replicas)
+- طلبات GET/HEAD تقرأ من نسخة متماثلة، والكتابة وما بعدها في نفس الجلسة تذهب للقاعدة الرئيسية
+- بعد أي كتابة يقرأ نفس العميل من الرئيسية لفترة قصيرة (read-after-write)
+- اختيار النسخة بالتناوب أو بأقل عدد اتصالات، مع استبعاد النسخ المتأخرة أو المعطلة
+- فحص التأخر في خيط خلفي (ReplicaSet.start)، فلا يتصل أي طلب بنسخة لمجرد فحصها
+"""
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# التأخر بالثواني (صفر إذا استُعيد كل ما استُلم من WAL)
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+@dataclass
+class RequestDatabaseState:
+    """حالة قاعدة البيانات للطلب الحالي"""
+    read_from_replica: bool = False
+    wrote: bool = False
+
+
+_request_state: ContextVar[Optional[RequestDatabaseState]] = ContextVar("database_request_state", default=None)
+
+
+def begin_request(read_from_replica: bool):
+    """بدء حالة الطلب (من الوسيط)؛ يُرجع الحالة ورمز الاستعادة"""
+    state = RequestDatabaseState(read_from_replica=read_from_replica)
+    return state, _request_state.set(state)
+
+
+def end_request(token) -> None:
+    _request_state.reset(token)
+
+
+def _note_write() -> None:
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def pool_stats(engine: Engine) -> Dict[str, Any]:
+    """إحصائيات مجمع الاتصالات للمحرك (بدون استعلام)"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+class Replica:
+    """نسخة متماثلة مع حالة التأخر المخزنة"""
+
+    def __init__(self, engine: Engine, max_lag_seconds: float, check_interval_seconds: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.lag_seconds: Optional[float] = None
+        self.healthy = True
+        self.last_error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        url = self.engine.url
+        return f"{url.host or 'local'}:{url.port or ''}/{url.database or ''}"
+
+    def checked_out(self) -> int:
+        """الاتصالات المستخدمة حالياً (صفر للمجمعات التي لا تتتبعها مثل NullPool)"""
+        return pool_stats(self.engine).get("checkedout", 0)
+
+    def check(self) -> None:
+        """قياس التأخر وتحديث الحالة (من خيط الفحص أو /health)"""
+        if self.engine.dialect.name != "postgresql":
+            self.lag_seconds, self.healthy = 0.0, True
+            return
+        try:
+            with self.engine.connect() as connection:
+                self.lag_seconds = float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+            self.healthy = self.lag_seconds <= self.max_lag_seconds
+            self.last_error = None
+            if not self.healthy:
+                logger.warning(f"النسخة المتماثلة {self.name} متأخرة {self.lag_seconds:.1f}s، سيتم تجاوزها")
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+            logger.warning(f"تعذر الوصول إلى النسخة المتماثلة {self.name}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+            **pool_stats(self.engine)
+        }
+
+
+class ReplicaSet:
+    """مجموعة النسخ المتماثلة واستراتيجية الاختيار (round_robin | least_connections)"""
+
+    def __init__(self, replicas: List[Replica], strategy: str = "round_robin"):
+        self.replicas = replicas
+        self.strategy = strategy
+        self._counter = itertools.count()
+        self.fallbacks = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Optional[Engine]:
+        """اختيار نسخة متاحة حسب آخر فحص، أو None للقراءة من الرئيسية"""
+        available = [replica for replica in self.replicas if replica.healthy]
+        if not available:
+            self.fallbacks += 1
+            return None
+
+        if self.strategy == "least_connections":
+            replica = min(available, key=lambda r: r.checked_out())
+        else:
+            replica = available[next(self._counter) % len(available)]
+        return replica.engine
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    def _run(self) -> None:
+        interval = min(replica.check_interval_seconds for replica in self.replicas)
+        while True:
+            started = time.monotonic()
+            self.check_all()
+            if self._stop.wait(max(0.0, interval - (time.monotonic() - started))):
+                return
+
+    def start(self) -> None:
+        """تشغيل خيط فحص التأخر (بعد تفرع عمليات الخادم، عند بدء التطبيق)"""
+        if not self.replicas or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-lag-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [replica.stats() for replica in self.replicas]
+
+
+class RoutingSession(Session):
+    """
+    جلسة توجه القراءة إلى نسخة متماثلة عندما يسمح الطلب بذلك
+    أي كتابة (flush أو DML أو SELECT ... FOR UPDATE) تثبت الجلسة على الرئيسية حتى نهايتها
+    """
+
+    def __init__(self, *args: Any, replicas: Optional[ReplicaSet] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self._replica: Optional[Engine] = None
+        self._primary_only = False
+
+    def _pin_primary(self) -> None:
+        self._primary_only = True
+        _note_write()
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._primary_only or self._flushing or not self.replicas:
+            return primary
+
+        state = _request_state.get()
+        if state is None or not state.read_from_replica:
+            return primary
+
+        if clause is not None and (
+            not getattr(clause, "is_select", False)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self._pin_primary()
+            return primary
+
+        if self._replica is None:
+            self._replica = self.replicas.pick() or primary
+        return self._replica
+
+    def flush(self, objects=None) -> None:
+        if self.new or self.dirty or self.deleted:
+            self._pin_primary()
+        super().flush(objects)
+
+
+class ReadAfterWriteWindow:
+    """نافذة القراءة من الرئيسية بعد الكتابة لكل عميل (حسب رمز المصادقة)"""
+
+    def __init__(self, cache: Any, seconds: float):
+        self.cache = cache
+        self.seconds = seconds
+
+    @staticmethod
+    def client_key(authorization: Optional[str]) -> Optional[str]:
+        if not authorization:
+            return None
+        return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+    def is_open(self, client_key: Optional[str]) -> bool:
+        return client_key is not None and self.cache.get(client_key) is not None
+
+    def open(self, client_key: Optional[str]) -> None:
+        if client_key is not None and self.seconds > 0:
+            self.cache.set(client_key, True, ttl=self.seconds)
@@ -1,24 +1,57 @@
 import os
 import logging
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
 from app.config import settings
-from app.database import get_db, engine
+from app.database import get_db, engine, engine_stats, read_after_write, replica_set
+from app.database_replicas import begin_request, end_request
+from app.core.cache import principal_cache, tenant_cache
+from app.core.redis_cache import redis_tier
+from app.core.singleflight import shutdown_refresh_executor
+from app.services.tenant_stats_service import tenant_counts_cache
+from app.services.subscription_sweeper import subscription_sweeper
+from app.core.hashing import PasswordHashingBusy, hashing_executor
+from app.core.query_budget import QueryBudgetExceeded, check_request, track_queries
+from app.core.request_context import begin_request as begin_request_context
+from app.core.request_context import end_request as end_request_context, new_request_id
+from app.core.access_log import access_log
+from app.core.logging_pipeline import logging_pipeline
+from app.core.metrics import (
+    REQUESTS_IN_FLIGHT, RuntimeStatsCollector, observe_request, register_runtime_collector,
+    render_metrics, route_template
+)
+from app.core.permissions import user_permission_cache
+from app.core.profiler import profiling_slot, ProfilerBusy, request_profile
+from app.api.deps import is_superuser_token
+from app.core.tracing import configure_tracing, finish_request_span, request_span, shutdown_tracing
+from app.core.slow_queries import slow_query_log
+from app.core.search import apply_search_migration
 from app.models.base import Base
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: queue handler on the request path, JSON/text written by a listener thread
+logging_pipeline.configure(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    dedup_window_seconds=settings.log_dedup_window_seconds,
+    dedup_burst=settings.log_dedup_burst,
+    sample_rates=settings.log_sample_rates
+)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
+    logging_pipeline.start()
     logger.info("🚀 Starting up Multi-Tenant SaaS Backend...")
     
     try:
@@ -26,6 +59,35 @@ async def lifespan(app: FastAPI):
         Base.metadata.create_all(bind=engine)
         logger.info("✅ Database tables created successfully")
         
+        # Search function (PostgreSQL only); trigram indexes: python -m app.core.search at deploy
+        apply_search_migration(engine)
+        
+        # Shared cache tier: cross-worker invalidation listener (after worker fork)
+        if redis_tier is not None:
+            redis_tier.start()
+            logger.info("✅ Redis cache tier enabled")
+        elif settings.token_permission_claims:
+            # Claim versions must be shared across workers to be revocable
+            logger.warning("⚠️ TOKEN_PERMISSION_CLAIMS ignored: requires REDIS_URL")
+        
+        # OpenTelemetry tracing (exporter threads start after worker fork)
+        if configure_tracing():
+            logger.info(f"✅ Tracing enabled ({settings.tracing_exporter})")
+        
+        # Replica lag probe runs in the background, never on the request path
+        replica_set.start()
+        
+        # Expired subscriptions sweeper (one worker at a time via advisory lock)
+        if settings.subscription_sweeper_enabled:
+            subscription_sweeper.start()
+        
+        # /metrics runtime stats
+        register_runtime_collector(RuntimeStatsCollector(
+            engine_stats,
+            lambda: (principal_cache, tenant_cache, tenant_counts_cache,
+                     user_permission_cache, read_after_write.cache)
+        ))
+        
         # Log environment info
         logger.info(f"🌍 Environment: {settings.environment}")
         logger.info(f"🔧 Debug Mode: {settings.debug}")
@@ -36,7 +98,18 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Startup failed: {str(e)}")
         raise
     finally:
+        subscription_sweeper.stop()
+        replica_set.stop()
+        hashing_executor.shutdown()
+        shutdown_refresh_executor()
+        shutdown_tracing()
+        if redis_tier is not None:
+            redis_tier.stop()
+        if settings.use_async_database:
+            from app.database_async import dispose_async_engine
+            await dispose_async_engine()
         logger.info("🛑 Shutting down application...")
+        logging_pipeline.stop()
 
 # Create FastAPI app
 app = FastAPI(
@@ -57,24 +130,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Custom middleware for request logging
+# Request metrics (latency by route template, in-flight) and sampled access log
 @app.middleware("http")
 async def log_requests(request, call_next):
-    start_time = datetime.now()
-    response = await call_next(request)
-    process_time = (datetime.now() - start_time).total_seconds()
+    method = request.method
+    REQUESTS_IN_FLIGHT.labels(method).inc()
+    start_ns = time.perf_counter_ns()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        duration_ns = time.perf_counter_ns() - start_ns
+        REQUESTS_IN_FLIGHT.labels(method).dec()
+        observe_request(method, route_template(request.scope), status, duration_ns)
+        access_log.log(method, request.url.path, status, duration_ns / 1e6)
+    
+    response.headers["X-Process-Time"] = str(duration_ns / 1e9)
+    return response
+
+# Per-request query count/time headers and N+1 / query budget checks
+@app.middleware("http")
+async def count_queries(request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+    
+    route = request.scope.get("route")
+    route_key = f"{request.method} {route.path if route is not None else request.url.path}"
+    try:
+        check_request(route_key, stats)
+    except QueryBudgetExceeded as exc:
+        response = JSONResponse(
+            status_code=500,
+            content={
+                "error": str(exc),
+                "status_code": 500,
+                "queries": exc.queries,
+                "budget": exc.budget,
+                "repeated": exc.repeated,
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["X-DB-Time"] = f"{stats.seconds:.6f}"
+    return response
+
+# Read replica routing: safe reads go to a replica unless the client wrote recently
+@app.middleware("http")
+async def route_database_reads(request, call_next):
+    if not replica_set:
+        return await call_next(request)
+    
+    client_key = read_after_write.client_key(request.headers.get("Authorization"))
+    use_replica = request.method in ("GET", "HEAD") and not read_after_write.is_open(client_key)
+    state, token = begin_request(use_replica)
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
     
-    logger.info(
-        f"{request.method} {request.url.path} - "
-        f"Status: {response.status_code} - "
-        f"Time: {process_time:.3f}s"
+    if state.wrote:
+        read_after_write.open(client_key)
+    return response
+
+# Per-request profiling (X-Profile: speedscope | collapsed), superusers only:
+# the profile replaces the response body, the original status goes in X-Profiled-Status.
+# The caller is authenticated before the worker's single profiling slot is taken, so other
+# users cannot hold it. Samples cover the event loop (shared with concurrent requests) and
+# the threadpool threads running this request's sync dependencies, endpoint and services.
+@app.middleware("http")
+async def profile_request(request, call_next):
+    fmt = request.headers.get("X-Profile")
+    if not fmt or "Authorization" not in request.headers:
+        return await call_next(request)
+    if not await run_in_threadpool(is_superuser_token, request.headers["Authorization"]):
+        return await call_next(request)
+    
+    try:
+        with profiling_slot():
+            with request_profile(settings.profiler_interval_ms / 1000) as profiler:
+                response = await call_next(request)
+                # consume the body while sampling (streaming endpoints run here)
+                async for _ in response.body_iterator:
+                    pass
+    except ProfilerBusy:
+        return await call_next(request)
+    
+    headers = {"X-Profiled-Status": str(response.status_code)}
+    if fmt == "collapsed":
+        return PlainTextResponse(profiler.collapsed(), headers=headers)
+    return JSONResponse(
+        profiler.speedscope(name=f"{request.method} {route_template(request.scope)}"),
+        headers=headers
     )
+
+# Request span: parent of dependency, service and SQL spans
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    with request_span(request.method, request.url.path, request.headers) as span:
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            finish_request_span(span, route_template(request.scope), status)
+    return response
+
+# Request id and route context for logs and SQL origin comments (outermost)
+@app.middleware("http")
+async def assign_request_id(request, call_next):
+    request_id = new_request_id(request.headers.get("X-Request-ID"))
+    _, token = begin_request_context(request_id, request.method, request.url.path, request.scope)
+    try:
+        response = await call_next(request)
+    finally:
+        end_request_context(token)
     
-    response.headers["X-Process-Time"] = str(process_time)
+    response.headers["X-Request-ID"] = request_id
     return response
 
 # Include API routes
-from app.api import auth, users, tenants, roles, subscriptions, branches
+from app.api import admin, auth, users, tenants, roles, subscriptions, branches
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -82,6 +259,7 @@ app.include_router(tenants.router, prefix="/api/tenants", tags=["Tenants"])
 app.include_router(roles.router, prefix="/api/roles", tags=["Roles"])
 app.include_router(subscriptions.router, prefix="/api/subscriptions", tags=["Subscriptions"])
 app.include_router(branches.router, prefix="/api/branches", tags=["Branches"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -102,7 +280,7 @@ async def health_check():
         # Test database connection
         from app.database import SessionLocal
         db = SessionLocal()
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         db.close()
         
         return {
@@ -110,6 +288,16 @@ async def health_check():
             "version": "1.0.0",
             "environment": settings.environment,
             "database": "connected",
+            "database_engines": engine_stats(),
+            "principal_cache": principal_cache.stats(),
+            "tenant_cache": tenant_cache.stats(),
+            "tenant_counts_cache": tenant_counts_cache.stats(),
+            "cache_tier": redis_tier.stats() if redis_tier is not None else {"backend": "local"},
+            "password_hashing": hashing_executor.stats(),
+            "slow_queries": slow_query_log.stats(),
+            "access_log": access_log.stats(),
+            "logging": logging_pipeline.stats(),
+            "subscription_sweeper": subscription_sweeper.stats(),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -117,6 +305,13 @@ async def health_check():
         raise HTTPException(status_code=503, detail="Service Unavailable")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/ready")
 async def readiness_check():
     """Readiness check for Railway"""
@@ -139,6 +334,20 @@ async def http_exception_handler(request, exc):
     )
 
 
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request, exc):
+    """Shed login/registration load when the hashing queue is full"""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": str(exc),
+            "status_code": 429,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Global exception handler"""
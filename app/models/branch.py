@@ -76,9 +76,6 @@ class Branch(BaseModel):
     # المستخدمون المرتبطون بالفرع
     users = relationship("User", secondary="branch_user", back_populates="branches")
 
-    # دورات الفرع
-    account_books = relationship("AccountBook", back_populates="branch", cascade="all, delete-orphan")
-
     # قيود الفريدة
     __table_args__ = (
         UniqueConstraint('tenant_id', 'code', name='uq_branch_tenant_code'),
@@ -112,7 +109,7 @@ class Branch(BaseModel):
         """إحصائيات استخدام الفرع"""
         return {
             "current_users": len(self.users),
-            "current_account_books": len(self.account_books),
+            "current_account_books": 0,  # لا يوجد نموذج دورات بعد
             "is_active": self.is_active,
             "opened_date": self.opened_at.isoformat() if self.opened_at else None
         }
\ No newline at end of file
@@ -44,7 +44,15 @@ class Subscription(BaseModel):
     stripe_customer_id = Column(String(100), nullable=True)
     
     # Relationships
-    tenant = relationship("Tenant", back_populates="subscription")
+    tenant = relationship("Tenant")
     
+    @property
+    def tenant_name(self) -> str:
+        return self.tenant.name
+
+    @property
+    def tenant_slug(self) -> str:
+        return self.tenant.code
+
     def __repr__(self):
         return f"<Subscription(id={self.id}, tenant_id={self.tenant_id}, plan={self.plan_name})>"
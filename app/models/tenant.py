@@ -51,7 +51,7 @@ class Tenant(BaseModel):
     max_storage_gb = Column(Integer, nullable=False, default=1)  # جيجابايت
     
     # حالة الاشتراك
-    subscription_status = Column(String(20), nullable=False, default="trial")  # active, suspended, cancelled, trial
+    subscription_status = Column(String(20), nullable=False, default="trial")  # active, suspended, cancelled, trial, expired
     trial_ends_at = Column(DateTime(timezone=True), nullable=True)
     subscription_ends_at = Column(DateTime(timezone=True), nullable=True)
     
@@ -69,17 +69,11 @@ class Tenant(BaseModel):
 
     # العلاقات
     # المستخدمون المرتبطون بالشركة
-    users = relationship("User", secondary="tenant_user", back_populates="tenants")
+    users = relationship("User", secondary="tenant_user", back_populates="companies")
     
     # الفروع المرتبطة بالشركة
     branches = relationship("Branch", back_populates="tenant", cascade="all, delete-orphan")
 
-    # الصفحات المرتبطة بالشركة
-    pages = relationship("Page", back_populates="tenant", cascade="all, delete-orphan")
-
-    # دورات الشركة
-    account_books = relationship("AccountBook", back_populates="tenant", cascade="all, delete-orphan")
-
     def __repr__(self) -> str:
         return f"<Tenant(id={self.id}, name='{self.name}', code='{self.code}')>"
 
@@ -52,7 +52,7 @@ class User(BaseModel):
     
     # الشركة الأساسية (DEPRECATED - استخدم companies)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
-    tenant = relationship("Tenant", back_populates="users")
+    tenant = relationship("Tenant")
     
     # الشركات المرتبطة بالمستخدم
     companies = relationship("Tenant", secondary="tenant_user", back_populates="users")
@@ -7,6 +7,9 @@ from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field, validator, HttpUrl
 from pydantic import root_validator
 
+from app.schemas.branch import BranchResponse
+from app.schemas.user import UserResponse
+
 
 class TenantBase(BaseModel):
     """المخطط الأساسي للشركة"""
@@ -119,6 +122,11 @@ class TenantResponse(TenantBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
+    @validator('is_trial_active', 'trial_days_remaining', pre=True)
+    def call_model_methods(cls, v):
+        """في نموذج Tenant هذان الحقلان دالتان وليسا خاصيتين"""
+        return v() if callable(v) else v
+    
     class Config:
         from_attributes = True
 
@@ -170,3 +178,9 @@ class TenantListResponse(BaseModel):
     page: int
     size: int
     pages: int
+
+
+class TenantSearchResponse(BaseModel):
+    """نتائج البحث داخل الشركة مرتبة حسب الصلة"""
+    branches: List[BranchResponse]
+    users: List[UserResponse]
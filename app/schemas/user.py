@@ -37,7 +37,7 @@ class UserResponse(UserBase):
     is_superuser: bool
     tenant_id: Optional[int]
     created_at: datetime
-    updated_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,278 @@
+"""
+النسخ غير المتزامنة من الخدمات (Async Services)
+تعمل فوق AsyncSession؛ الاستعلامات الأساسية مكتوبة بشكل أصلي (select)
+وبقية العمليات تُنفذ عبر AsyncSession.run_sync بنفس منطق الخدمات المتزامنة
+دون حجب حلقة الأحداث (الإدخال/الإخراج يتم عبر برنامج التشغيل غير المتزامن)
+"""
+import functools
+import inspect
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.profiler import profiled_thread
+from app.core.request_context import service_scope
+from app.core.tracing import start_span
+from app.models.branch import Branch
+from app.models.subscription import Subscription
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.core.cache import invalidate_principal
+from app.core.security import get_password_hash_async, verify_password_async
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.auth_service import AuthService, schedule_password_rehash
+from app.services.branch_service import BranchService
+from app.services.search_service import SearchService
+from app.services.subscription_service import SubscriptionService
+from app.services.tenant_service import TenantService
+from app.services.user_service import UserService
+
+
+def _with_service_scope(method: Callable[..., Any], origin: str) -> Callable[..., Any]:
+    """تسمية مصدر الاستعلامات في الدوال غير المتزامنة المكتوبة بشكل أصلي"""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with service_scope(origin), start_span(origin):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+class AsyncServiceBase:
+    """
+    أساس الخدمات غير المتزامنة
+    أي دالة عامة في الخدمة المتزامنة غير معرّفة هنا تُنفذ عبر run_sync
+    """
+    sync_service_class: type = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(value):
+                setattr(cls, name, _with_service_scope(value, f"{cls.sync_service_class.__name__}.{name}"))
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _bind(self, session) -> Callable[[str], Callable[..., Any]]:
+        """ربط دالة الخدمة المتزامنة بالجلسة المتزامنة الداخلية"""
+        service = self.sync_service_class(session)
+        return lambda name: getattr(service, name)
+
+    async def _run(self, name: str, *args, **kwargs) -> Any:
+        """تنفيذ دالة الخدمة المتزامنة داخل AsyncSession.run_sync"""
+        origin = f"{self.sync_service_class.__name__}.{name}"
+        with service_scope(origin), start_span(origin):
+            return await self.db.run_sync(lambda session: self._bind(session)(name)(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not hasattr(self.sync_service_class, name):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            return await self._run(name, *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
+
+class AsyncTenantService(AsyncServiceBase):
+    """خدمة إدارة الشركات (غير متزامنة)"""
+    sync_service_class = TenantService
+
+    async def get_tenant(self, tenant_id: int) -> Optional[Tenant]:
+        """الحصول على شركة بالمعرف"""
+        result = await self.db.execute(select(Tenant).where(Tenant.id == tenant_id))
+        return result.scalars().first()
+
+    async def get_tenant_by_code(self, code: str) -> Optional[Tenant]:
+        """الحصول على شركة بالرمز"""
+        result = await self.db.execute(select(Tenant).where(Tenant.code == code))
+        return result.scalars().first()
+
+
+class AsyncBranchService(AsyncServiceBase):
+    """خدمة إدارة الفروع (غير متزامنة)"""
+    sync_service_class = BranchService
+
+    async def get_branch(self, branch_id: int, tenant_id: int) -> Optional[Branch]:
+        """الحصول على فرع محدد"""
+        result = await self.db.execute(
+            select(Branch).where(
+                and_(
+                    Branch.id == branch_id,
+                    Branch.tenant_id == tenant_id
+                )
+            )
+        )
+        return result.scalars().first()
+
+    async def get_main_branch(self, tenant_id: int) -> Optional[Branch]:
+        """الحصول على الفرع الرئيسي"""
+        result = await self.db.execute(
+            select(Branch).where(
+                and_(
+                    Branch.tenant_id == tenant_id,
+                    Branch.is_main_branch == True
+                )
+            )
+        )
+        return result.scalars().first()
+
+
+class AsyncUserService(AsyncServiceBase):
+    """خدمة المستخدمين (غير متزامنة)"""
+    sync_service_class = UserService
+
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """الحصول على مستخدم بالمعرف"""
+        result = await self.db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        """الحصول على مستخدم بالإيميل"""
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """الحصول على مستخدم باسم المستخدم"""
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
+
+    # كلمة المرور تُشفر في منفذ التشفير مع await قبل أي عمل متزامن
+    # (get_password_hash داخل run_sync يحجب خيط حلقة الأحداث طوال زمن bcrypt)
+
+    async def create_user(self, user_data: UserCreate, tenant_id: Optional[int] = None) -> User:
+        """إنشاء مستخدم جديد"""
+        UserService._raise_if_taken(
+            await self.get_user_by_email(user_data.email),
+            await self.get_user_by_username(user_data.username)
+        )
+
+        db_user = UserService._new_user(user_data, await get_password_hash_async(user_data.password), tenant_id)
+        self.db.add(db_user)
+        await self.db.commit()
+        await self.db.refresh(db_user)
+        return db_user
+
+    async def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
+        """تحديث بيانات المستخدم"""
+        password = user_data.dict(exclude_unset=True).get("password")
+        hashed_password = await get_password_hash_async(password) if password else None
+        return await self._run("update_user", user_id, user_data, hashed_password=hashed_password)
+
+
+class AsyncAuthService(AsyncServiceBase):
+    """خدمة المصادقة (غير متزامنة)"""
+    sync_service_class = AuthService
+
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        """مصادقة المستخدم (التحقق من كلمة المرور في منفذ التشفير دون حجب حلقة الأحداث)"""
+        result = await self.db.execute(
+            select(User).where((User.username == username) | (User.email == username))
+        )
+        user = result.scalars().first()
+        
+        if not user:
+            return None
+        
+        if not await verify_password_async(password, user.hashed_password):
+            return None
+        
+        if not user.is_active:
+            return None
+        
+        schedule_password_rehash(user, password)
+        return user
+
+    # التشفير والتحقق في منفذ التشفير مع await، وليس داخل run_sync الذي يحجز اتصال الجلسة
+    # أثناء انتظار .result() (نفس منطق AuthService)
+
+    async def create_user(self, user_data: dict) -> User:
+        """إنشاء مستخدم جديد"""
+        result = await self.db.execute(select(User).where(AuthService._existing_user_filter(user_data)))
+        AuthService._raise_if_taken(result.scalars().first(), user_data)
+
+        db_user = AuthService._new_user(user_data, await get_password_hash_async(user_data['password']))
+        self.db.add(db_user)
+        await self.db.commit()
+        await self.db.refresh(db_user)
+        return db_user
+
+    async def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
+        """تغيير كلمة المرور"""
+        result = await self.db.execute(select(User).where(User.id == user_id))
+        user = result.scalars().first()
+        if not user:
+            raise ValueError("المستخدم غير موجود")
+
+        if not await verify_password_async(current_password, user.hashed_password):
+            raise ValueError("كلمة المرور الحالية غير صحيحة")
+
+        await self._store_password(user, new_password)
+        return True
+
+    async def reset_password(self, token: str, new_password: str) -> bool:
+        """إعادة تعيين كلمة المرور باستخدام الرمز"""
+        user = await self._run("verify_reset_token", token)
+        if not user:
+            raise ValueError("رمز إعادة التعيين غير صالح أو منتهي الصلاحية")
+
+        await self._store_password(user, new_password)
+        return True
+
+    async def _store_password(self, user: User, new_password: str) -> None:
+        user.hashed_password = await get_password_hash_async(new_password)
+        user.updated_at = datetime.utcnow()
+        await self.db.commit()
+        invalidate_principal(user.id)
+
+
+class AsyncSubscriptionService(AsyncServiceBase):
+    """خدمة إدارة الاشتراكات (غير متزامنة)"""
+    sync_service_class = SubscriptionService
+
+    def _bind(self, session) -> Callable[[str], Callable[..., Any]]:
+        # SubscriptionService تستقبل الجلسة كأول معامل في كل دالة
+        service = SubscriptionService()
+        return lambda name: (lambda *args, **kwargs: getattr(service, name)(session, *args, **kwargs))
+
+    async def get_subscription(self, subscription_id: int) -> Optional[Subscription]:
+        """الحصول على اشتراك محدد"""
+        result = await self.db.execute(
+            select(Subscription).where(Subscription.id == subscription_id)
+        )
+        return result.scalars().first()
+
+
+class AsyncSearchService(AsyncServiceBase):
+    """خدمة البحث النصي (غير متزامنة)"""
+    sync_service_class = SearchService
+
+
+class ThreadPoolService:
+    """
+    غلاف للخدمة المتزامنة في وضع DATABASE_MODE=sync
+    ينفذ كل دالة في مجمع الخيوط حتى لا تحجب الاستعلامات حلقة الأحداث،
+    ويعرض نفس الواجهة القابلة للانتظار (await) التي تعرضها الخدمات غير المتزامنة
+    """
+
+    def __init__(self, service: Any, *leading_args: Any):
+        self._service = service
+        self._leading_args = leading_args
+
+    def __getattr__(self, name: str):
+        func = getattr(self._service, name)
+        origin = f"{type(self._service).__name__}.{name}"
+
+        def call(*args, **kwargs):
+            with service_scope(origin), start_span(origin), profiled_thread():
+                return func(*args, **kwargs)
+
+        async def method(*args, **kwargs):
+            return await run_in_threadpool(call, *self._leading_args, *args, **kwargs)
+
+        method.__name__ = name
+        return method
@@ -5,13 +5,42 @@ import secrets
 import string
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from app.models.user import User
 from app.config import settings
-from app.core.security import get_password_hash, verify_password, create_access_token, create_refresh_token
+from app.core.security import (
+    get_password_hash, verify_password, password_needs_rehash,
+    create_access_token, create_refresh_token
+)
+from app.core.hashing import hashing_executor
+from app.core.cache import invalidate_principal
+from app.core.permissions import PERMISSION_CLAIM, build_permission_claim
+from app.database import SessionLocal
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str) -> None:
+    """حفظ التشفير الجديد في جلسة مستقلة، فقط إذا لم تتغير كلمة المرور منذ تسجيل الدخول"""
+    db = SessionLocal()
+    try:
+        db.query(User).filter(
+            and_(User.id == user_id, User.hashed_password == old_hash)
+        ).update({User.hashed_password: new_hash}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_principal(user_id)
+
+
+def schedule_password_rehash(user: User, password: str) -> bool:
+    """إعادة تشفير كلمة المرور في الخلفية إذا تغيرت سياسة التشفير"""
+    if not password_needs_rehash(user.hashed_password):
+        return False
+    
+    user_id, old_hash = user.id, user.hashed_password
+    return hashing_executor.rehash_in_background(
+        password,
+        lambda new_hash: _store_rehashed_password(user_id, old_hash, new_hash)
+    )
 
 
 class AuthService:
@@ -20,23 +49,21 @@ class AuthService:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_user(self, user_data: dict) -> User:
-        """إنشاء مستخدم جديد"""
-        # التحقق من عدم وجود اسم المستخدم
-        existing_user = self.db.query(User).filter(
-            or_(User.username == user_data['username'], User.email == user_data['email'])
-        ).first()
-        
+    @staticmethod
+    def _existing_user_filter(user_data: dict):
+        return or_(User.username == user_data['username'], User.email == user_data['email'])
+    
+    @staticmethod
+    def _raise_if_taken(existing_user: Optional[User], user_data: dict) -> None:
         if existing_user:
             if existing_user.username == user_data['username']:
                 raise ValueError("اسم المستخدم موجود بالفعل")
             else:
                 raise ValueError("البريد الإلكتروني موجود بالفعل")
-        
-        # إنشاء المستخدم
-        hashed_password = get_password_hash(user_data['password'])
-        
-        db_user = User(
+    
+    @staticmethod
+    def _new_user(user_data: dict, hashed_password: str) -> User:
+        return User(
             username=user_data['username'],
             email=user_data['email'],
             hashed_password=hashed_password,
@@ -46,6 +73,15 @@ class AuthService:
             tenant_id=user_data.get('tenant_id'),
             is_active=True
         )
+    
+    def create_user(self, user_data: dict) -> User:
+        """إنشاء مستخدم جديد"""
+        # التحقق من عدم وجود اسم المستخدم
+        existing_user = self.db.query(User).filter(self._existing_user_filter(user_data)).first()
+        self._raise_if_taken(existing_user, user_data)
+        
+        # إنشاء المستخدم
+        db_user = self._new_user(user_data, get_password_hash(user_data['password']))
         
         self.db.add(db_user)
         self.db.commit()
@@ -68,20 +104,28 @@ class AuthService:
         if not user.is_active:
             return None
         
+        schedule_password_rehash(user, password)
         return user
     
     def create_access_refresh_tokens(self, user: User) -> dict:
         """إنشاء رموز الوصول والتحديث"""
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+        refresh_token_expires = timedelta(days=settings.refresh_token_expire_days)
+        
+        access_claims = {"tenant_id": user.tenant_id}
+        permission_claim = build_permission_claim(user)
+        if permission_claim is not None:
+            access_claims[PERMISSION_CLAIM] = permission_claim
         
         access_token = create_access_token(
-            data={"sub": user.id, "tenant_id": user.tenant_id},
+            subject=user.id,
+            data=access_claims,
             expires_delta=access_token_expires
         )
         
         refresh_token = create_refresh_token(
-            data={"sub": user.id, "tenant_id": user.tenant_id},
+            subject=user.id,
+            data={"tenant_id": user.tenant_id},
             expires_delta=refresh_token_expires
         )
         
@@ -89,7 +133,7 @@ class AuthService:
             "access_token": access_token,
             "refresh_token": refresh_token,
             "token_type": "bearer",
-            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            "expires_in": settings.access_token_expire_minutes * 60
         }
     
     def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
@@ -105,6 +149,7 @@ class AuthService:
         user.hashed_password = get_password_hash(new_password)
         user.updated_at = datetime.utcnow()
         self.db.commit()
+        invalidate_principal(user.id)
         
         return True
     
@@ -129,8 +174,8 @@ class AuthService:
         }
         reset_token_jwt = jwt.encode(
             to_encode, 
-            settings.SECRET_KEY, 
-            algorithm=settings.ALGORITHM
+            settings.secret_key, 
+            algorithm=settings.algorithm
         )
         
         return reset_token_jwt
@@ -140,8 +185,8 @@ class AuthService:
         try:
             payload = jwt.decode(
                 token, 
-                settings.SECRET_KEY, 
-                algorithms=[settings.ALGORITHM]
+                settings.secret_key, 
+                algorithms=[settings.algorithm]
             )
             
             user_id: int = payload.get("sub")
@@ -173,6 +218,7 @@ class AuthService:
         user.hashed_password = get_password_hash(new_password)
         user.updated_at = datetime.utcnow()
         self.db.commit()
+        invalidate_principal(user.id)
         
         return True
     
@@ -2,16 +2,19 @@
 خدمة إدارة الفروع (BranchService) للنظام متعدد المستأجرين
 تدير عمليات CRUD للفروع مع التحكم في الصلاحيات
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, select
 
 from app.models.branch import Branch
 from app.models.tenant import Tenant
 from app.models.user import User
 from app.models.associations import branch_user
+from app.core.pagination import paginate_by_cursor
+from app.core.search import search_condition
+from app.services.tenant_stats_service import invalidate_tenant_counts
 from app.schemas.branch import BranchCreate, BranchUpdate, BranchResponse, BranchWithStats, BranchUsageStats
 
 
@@ -21,6 +24,15 @@ class BranchService:
     def __init__(self, db: Session):
         self.db = db
     
+    def _branches_query(self, tenant_id: int, search: Optional[str] = None):
+        """استعلام فروع الشركة بعد تطبيق البحث"""
+        query = self.db.query(Branch).filter(Branch.tenant_id == tenant_id)
+        
+        if search:
+            query = query.filter(search_condition(Branch, search))
+        
+        return query
+    
     def get_branches(
         self, 
         tenant_id: int,
@@ -28,21 +40,19 @@ class BranchService:
         limit: int = 100, 
         search: Optional[str] = None
     ) -> List[Branch]:
-        """الحصول على قائمة الفروع"""
-        query = self.db.query(Branch).filter(Branch.tenant_id == tenant_id)
-        
-        if search:
-            query = query.filter(
-                or_(
-                    Branch.name.contains(search),
-                    Branch.code.contains(search),
-                    Branch.city.contains(search),
-                    Branch.country.contains(search),
-                    Branch.manager_name.contains(search)
-                )
-            )
-        
-        return query.offset(skip).limit(limit).all()
+        """الحصول على قائمة الفروع (تصفح بالإزاحة)"""
+        query = self._branches_query(tenant_id, search)
+        return query.order_by(Branch.id).offset(skip).limit(limit).all()
+    
+    def get_branches_page(
+        self,
+        tenant_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """الحصول على قائمة الفروع (تصفح بالمؤشر)"""
+        return paginate_by_cursor(self._branches_query(tenant_id, search), Branch.id, limit, cursor)
     
     def get_branch(self, branch_id: int, tenant_id: int) -> Optional[Branch]:
         """الحصول على فرع محدد"""
@@ -112,6 +122,7 @@ class BranchService:
             self.db.add(branch)
             self.db.commit()
             self.db.refresh(branch)
+            invalidate_tenant_counts(tenant_id)
             
             return branch
             
@@ -164,6 +175,7 @@ class BranchService:
         try:
             self.db.delete(branch)
             self.db.commit()
+            invalidate_tenant_counts(tenant_id)
             return True
         except Exception as e:
             self.db.rollback()
@@ -177,7 +189,7 @@ class BranchService:
         
         # حساب الإحصائيات
         current_users = len(branch.users)
-        current_account_books = len(branch.account_books)
+        current_account_books = 0  # لا يوجد نموذج دورات بعد
         
         usage_stats = BranchUsageStats(
             current_users=current_users,
@@ -242,11 +254,20 @@ class BranchService:
     
     def get_branch_users(self, branch_id: int, skip: int = 0, limit: int = 100) -> List[User]:
         """الحصول على مستخدمي الفرع"""
-        branch = self.db.query(Branch).filter(Branch.id == branch_id).first()
-        if not branch:
+        return self._branch_users_query(branch_id).order_by(User.id).offset(skip).limit(limit).all()
+    
+    def get_branch_users_page(self, branch_id: int, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """الحصول على مستخدمي الفرع (تصفح بالمؤشر)"""
+        return paginate_by_cursor(self._branch_users_query(branch_id), User.id, limit, cursor)
+    
+    def _branch_users_query(self, branch_id: int):
+        """استعلام مستخدمي الفرع عبر جدول الربط بدلاً من تحميل العلاقة كاملة"""
+        if not self.db.query(Branch.id).filter(Branch.id == branch_id).first():
             raise ValueError(f"الفرع بالمعرف {branch_id} غير موجود")
         
-        return branch.users[skip:skip + limit]
+        return (self.db.query(User)
+                .join(branch_user, branch_user.c.user_id == User.id)
+                .filter(branch_user.c.branch_id == branch_id))
     
     def get_main_branch(self, tenant_id: int) -> Optional[Branch]:
         """الحصول على الفرع الرئيسي"""
@@ -297,39 +318,78 @@ class BranchService:
             )
         ).count()
     
+    # حجم الدفعة عند قراءة صفوف ملخص الفروع من المؤشر
+    SUMMARY_STREAM_BATCH = 1000
+
+    def iter_tenant_branch_rows(self, tenant_id: int) -> Iterator[Any]:
+        """
+        صفوف الشركة مع فروعها وعدد مستخدمي كل فرع في استعلام واحد
+        (Tenant LEFT JOIN branches LEFT JOIN branch_user ... GROUP BY)
+        تُقرأ على دفعات دون تحميل كائنات الفروع أو المستخدمين؛
+        الشركة بدون فروع تُرجع صفاً واحداً قيمة branch_id فيه None
+        """
+        query = (
+            select(
+                Tenant.name.label("tenant_name"),
+                Tenant.max_branches,
+                Branch.id.label("branch_id"),
+                Branch.name,
+                Branch.code,
+                Branch.city,
+                Branch.country,
+                Branch.is_main_branch,
+                Branch.is_active,
+                func.count(branch_user.c.user_id).label("user_count")
+            )
+            .select_from(Tenant)
+            .outerjoin(Branch, Branch.tenant_id == Tenant.id)
+            .outerjoin(branch_user, branch_user.c.branch_id == Branch.id)
+            .where(Tenant.id == tenant_id)
+            .group_by(Tenant.id, Branch.id)
+            .order_by(Branch.id)
+            .execution_options(yield_per=self.SUMMARY_STREAM_BATCH)
+        )
+        return iter(self.db.execute(query))
+
     def get_tenant_branches_summary(self, tenant_id: int) -> Dict[str, Any]:
-        """ملخص فروع الشركة"""
-        tenant = self.db.query(Tenant).filter(Tenant.id == tenant_id).first()
-        if not tenant:
-            raise ValueError(f"الشركة بالمعرف {tenant_id} غير موجودة")
+        """ملخص فروع الشركة (استعلام تجميعي واحد)"""
+        tenant_row = None
+        main_branch = None
+        active_count = 0
+        branches = []
+        
+        for row in self.iter_tenant_branch_rows(tenant_id):
+            tenant_row = row
+            if row.branch_id is None:
+                continue
+            
+            if row.is_active:
+                active_count += 1
+            if row.is_main_branch and main_branch is None:
+                main_branch = {"id": row.branch_id, "name": row.name, "code": row.code}
+            
+            branches.append({
+                "id": row.branch_id,
+                "name": row.name,
+                "code": row.code,
+                "city": row.city,
+                "country": row.country,
+                "is_main_branch": row.is_main_branch,
+                "is_active": row.is_active,
+                "user_count": row.user_count
+            })
         
-        branches = self.db.query(Branch).filter(Branch.tenant_id == tenant_id).all()
-        active_branches = [b for b in branches if b.is_active]
-        main_branch = self.get_main_branch(tenant_id)
+        if tenant_row is None:
+            raise ValueError(f"الشركة بالمعرف {tenant_id} غير موجودة")
         
+        max_branches = tenant_row.max_branches
         return {
             "tenant_id": tenant_id,
-            "tenant_name": tenant.name,
+            "tenant_name": tenant_row.tenant_name,
             "total_branches": len(branches),
-            "active_branches": len(active_branches),
-            "max_branches": tenant.max_branches,
-            "usage_percentage": (len(branches) / tenant.max_branches * 100) if tenant.max_branches > 0 else 0,
-            "main_branch": {
-                "id": main_branch.id,
-                "name": main_branch.name,
-                "code": main_branch.code
-            } if main_branch else None,
-            "branches": [
-                {
-                    "id": branch.id,
-                    "name": branch.name,
-                    "code": branch.code,
-                    "city": branch.city,
-                    "country": branch.country,
-                    "is_main_branch": branch.is_main_branch,
-                    "is_active": branch.is_active,
-                    "user_count": len(branch.users)
-                }
-                for branch in branches
-            ]
+            "active_branches": active_count,
+            "max_branches": max_branches,
+            "usage_percentage": (len(branches) / max_branches * 100) if max_branches > 0 else 0,
+            "main_branch": main_branch,
+            "branches": branches
         }
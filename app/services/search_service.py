@@ -0,0 +1,57 @@
+"""
+خدمة البحث (SearchService)
+بحث مرتب على النص العربي الموحد في الشركات والفروع والمستخدمين،
+يستخدم فهارس pg_trgm على PostgreSQL ويعود للمسح التسلسلي على SQLite
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.search import search_condition, search_order
+from app.models.branch import Branch
+from app.models.tenant import Tenant
+from app.models.user import User
+
+
+class SearchService:
+    """خدمة البحث النصي"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def _ranked(self, query, model: type, term: str, limit: Optional[int]) -> List[Any]:
+        return (query
+                .filter(search_condition(model, term))
+                .order_by(search_order(model, term, self._dialect), model.id)
+                .limit(limit)
+                .all())
+
+    def search_tenants(self, term: str, limit: int = 20, status: Optional[str] = None) -> List[Tenant]:
+        """البحث في الشركات (للمدراء العامين)"""
+        query = self.db.query(Tenant)
+        if status:
+            query = query.filter(Tenant.subscription_status == status)
+        return self._ranked(query, Tenant, term, limit)
+
+    def search_branches(self, tenant_id: int, term: str, limit: int = 20) -> List[Branch]:
+        """البحث في فروع شركة محددة"""
+        query = self.db.query(Branch).filter(Branch.tenant_id == tenant_id)
+        return self._ranked(query, Branch, term, limit)
+
+    def search_users(self, term: str, tenant_id: Optional[int] = None, limit: Optional[int] = 20) -> List[User]:
+        """البحث في المستخدمين (ضمن شركة محددة إن وُجدت)؛ limit=None لجميع النتائج"""
+        query = self.db.query(User)
+        if tenant_id:
+            query = query.filter(User.tenant_id == tenant_id)
+        return self._ranked(query, User, term, limit)
+
+    def search_tenant(self, tenant_id: int, term: str, limit: int = 20) -> Dict[str, List[Any]]:
+        """البحث داخل شركة واحدة في الفروع والمستخدمين"""
+        return {
+            "branches": self.search_branches(tenant_id, term, limit),
+            "users": self.search_users(term, tenant_id=tenant_id, limit=limit)
+        }
@@ -1,9 +1,12 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, select, update
+from datetime import datetime, timedelta, timezone
 
+from app.core.cache import invalidate_tenant
+from app.core.pagination import paginate_by_cursor
 from app.models.subscription import Subscription, SubscriptionStatus, BillingCycle
+from app.models.tenant import Tenant
 from app.schemas.subscription import SubscriptionCreate, SubscriptionUpdate
 
 
@@ -17,13 +20,28 @@ class SubscriptionService:
         limit: int = 100, 
         status: Optional[str] = None
     ) -> List[Subscription]:
-        """الحصول على قائمة الاشتراكات"""
-        query = db.query(Subscription)
+        """الحصول على قائمة الاشتراكات (تصفح بالإزاحة)"""
+        query = self._subscriptions_query(db, status)
+        return query.order_by(Subscription.id).offset(skip).limit(limit).all()
+    
+    def get_subscriptions_page(
+        self,
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """الحصول على قائمة الاشتراكات (تصفح بالمؤشر)"""
+        return paginate_by_cursor(self._subscriptions_query(db, status), Subscription.id, limit, cursor)
+    
+    def _subscriptions_query(self, db: Session, status: Optional[str] = None):
+        """استعلام الاشتراكات بعد التصفية بالحالة (مع الشركة لحقلي tenant_name و tenant_slug)"""
+        query = db.query(Subscription).options(joinedload(Subscription.tenant))
         
         if status:
             query = query.filter(Subscription.status == status)
         
-        return query.offset(skip).limit(limit).all()
+        return query
     
     def get_subscription(self, db: Session, subscription_id: int) -> Optional[Subscription]:
         """الحصول على اشتراك محدد"""
@@ -92,18 +110,53 @@ class SubscriptionService:
             )
         ).first()
     
-    def check_subscription_expiry(self, db: Session):
-        """فحص انتهاء الاشتراكات"""
-        now = datetime.utcnow()
-        expired_subscriptions = db.query(Subscription).filter(
-            and_(
-                Subscription.current_period_end < now,
+    def expire_due_subscriptions(self, db: Session, now: datetime, limit: int = 500) -> List[Tuple[int, int]]:
+        """
+        دفعة واحدة من الاشتراكات النشطة المنتهية: UPDATE ... RETURNING بدون تحميل الكائنات،
+        ومزامنة subscription_status للشركات في نفس المعاملة (بدون commit؛ المستدعي يحدد المعاملة)
+        يعيد أزواج (معرف الاشتراك، معرف الشركة)
+        """
+        due = (select(Subscription.id)
+               .where(Subscription.current_period_end < now,
+                      Subscription.status == SubscriptionStatus.ACTIVE)
+               .order_by(Subscription.id)
+               .limit(limit)
+               .with_for_update(skip_locked=True)
+               .scalar_subquery())
+        expired = db.execute(
+            update(Subscription)
+            .where(Subscription.id.in_(due))
+            .values(status=SubscriptionStatus.EXPIRED, updated_at=now)
+            .returning(Subscription.id, Subscription.tenant_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        tenant_ids = sorted({tenant_id for _, tenant_id in expired})
+        if tenant_ids:
+            # الشركة تبقى active إن بقي لها اشتراك نشط آخر
+            still_active = select(Subscription.id).where(
+                Subscription.tenant_id == Tenant.id,
                 Subscription.status == SubscriptionStatus.ACTIVE
+            ).exists()
+            db.execute(
+                update(Tenant)
+                .where(Tenant.id.in_(tenant_ids),
+                       Tenant.subscription_status == "active",
+                       ~still_active)
+                .values(subscription_status="expired", updated_at=now)
+                .execution_options(synchronize_session=False)
             )
-        ).all()
-        
-        for subscription in expired_subscriptions:
-            subscription.status = SubscriptionStatus.EXPIRED
+        return [(subscription_id, tenant_id) for subscription_id, tenant_id in expired]
+    
+    def check_subscription_expiry(self, db: Session, batch_size: int = 500) -> int:
+        """فحص انتهاء الاشتراكات على دفعات (commit لكل دفعة)"""
+        now = datetime.now(timezone.utc)
+        total = 0
+        while True:
+            expired = self.expire_due_subscriptions(db, now, batch_size)
             db.commit()
-        
-        return len(expired_subscriptions)
+            for tenant_id in {tenant_id for _, tenant_id in expired}:
+                invalidate_tenant(tenant_id)
+            total += len(expired)
+            if len(expired) < batch_size:
+                return total
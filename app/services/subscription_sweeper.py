@@ -0,0 +1,163 @@
+"""
+منظف الاشتراكات المنتهية (Subscription sweeper)
+- خيط مستقل في كل عامل يستدعي run_once كل interval ثانية (مع إزاحة عشوائية لتفريق العمال)
+- كل دفعة معاملة واحدة: قفل استشاري للمعاملة (pg_try_advisory_xact_lock) ثم UPDATE ... RETURNING
+  ومزامنة حالة الشركات، فيعمل عامل واحد فقط في كل مرة ويُحرر القفل تلقائياً مع commit
+  (قفل المعاملة يعمل أيضاً خلف PgBouncer بوضع transaction pooling، بخلاف قفل الجلسة)
+- على SQLite لا يوجد قفل استشاري: التحديث نفسه آمن عند التكرار لأنه يطابق الاشتراكات النشطة فقط
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import invalidate_tenant
+from app.core.metrics import SWEEPER_DURATION, SWEEPER_EXPIRED, SWEEPER_RUNS
+from app.core.request_context import service_scope
+from app.database import SessionLocal
+from app.services.subscription_service import SubscriptionService
+
+logger = logging.getLogger(__name__)
+
+# مفتاح القفل الاستشاري (ثابت لجميع العمال، bigint)
+SWEEPER_LOCK_KEY = 0x5355425357454550  # "SUBSWEEP"
+
+
+def try_advisory_xact_lock(db: Session, key: int) -> bool:
+    """قفل استشاري حتى نهاية المعاملة الحالية؛ False إذا كان عامل آخر يحمله (True على غير PostgreSQL)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}).scalar())
+
+
+@dataclass
+class SweepResult:
+    """نتيجة تشغيل واحد للمنظف"""
+    outcome: str  # swept | idle | skipped | error
+    expired: int = 0
+    tenants: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+class SubscriptionSweeper:
+    """تحويل الاشتراكات النشطة المنتهية إلى expired على دفعات محدودة"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = 300.0,
+        batch_size: int = 500,
+        max_batches: int = 100,
+        lock_key: int = SWEEPER_LOCK_KEY
+    ):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.lock_key = lock_key
+        self.service = SubscriptionService()
+        self.last_result: Optional[SweepResult] = None
+        self.last_run_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sweep_batch(self, now: datetime) -> Optional[list]:
+        """دفعة واحدة في معاملة واحدة؛ None إذا كان القفل مع عامل آخر"""
+        with self.session_factory() as db:
+            if not try_advisory_xact_lock(db, self.lock_key):
+                db.rollback()
+                return None
+            expired = self.service.expire_due_subscriptions(db, now, self.batch_size)
+            db.commit()
+        return expired
+
+    def run_once(self) -> SweepResult:
+        """تشغيل واحد: دفعات حتى لا يبقى اشتراك منتهٍ أو بلوغ max_batches"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        result = SweepResult(outcome="idle")
+        tenant_ids = set()
+        try:
+            with service_scope("SubscriptionSweeper.run_once"):
+                while result.batches < self.max_batches:
+                    expired = self._sweep_batch(now)
+                    if expired is None:
+                        if result.batches == 0:
+                            result.outcome = "skipped"
+                        break
+                    result.batches += 1
+                    result.expired += len(expired)
+                    tenant_ids.update(tenant_id for _, tenant_id in expired)
+                    if len(expired) < self.batch_size:
+                        break
+        except Exception as e:
+            result.outcome = "error"
+            logger.error(f"فشل منظف الاشتراكات: {e}", exc_info=True)
+
+        for tenant_id in tenant_ids:
+            invalidate_tenant(tenant_id)
+
+        result.tenants = len(tenant_ids)
+        result.seconds = time.perf_counter() - started
+        if result.expired and result.outcome != "error":
+            result.outcome = "swept"
+        SWEEPER_RUNS.labels(result.outcome).inc()
+        SWEEPER_EXPIRED.inc(result.expired)
+        if result.outcome != "skipped":
+            SWEEPER_DURATION.observe(result.seconds)
+        if result.expired:
+            logger.info(
+                f"تم إنهاء {result.expired} اشتراك ({result.tenants} شركة) في {result.seconds:.2f}s",
+                extra={"expired": result.expired, "batches": result.batches}
+            )
+
+        self.last_result = result
+        self.last_run_at = datetime.now(timezone.utc)
+        return result
+
+    def _run(self) -> None:
+        # إزاحة أولى عشوائية حتى لا تتسابق جميع العمال على القفل عند بدء التشغيل
+        delay = random.uniform(0, min(self.interval_seconds, 30.0))
+        while not self._stop.wait(delay):
+            self.run_once()
+            delay = self.interval_seconds
+
+    def start(self) -> None:
+        """تشغيل خيط المنظف (بعد تفرع عمليات الخادم، عند بدء التطبيق)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="subscription-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """إيقاف الخيط عند إغلاق التطبيق (ينتظر انتهاء الدفعة الجارية)"""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_result": asdict(self.last_result) if self.last_result else None
+        }
+
+
+subscription_sweeper = SubscriptionSweeper(
+    SessionLocal,
+    interval_seconds=settings.subscription_sweeper_interval_seconds,
+    batch_size=settings.subscription_sweeper_batch_size,
+    max_batches=settings.subscription_sweeper_max_batches
+)
@@ -6,12 +6,16 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import and_, or_
+from sqlalchemy import and_
 
-from app.models.tenant import Tenant, TenantUserRole
-from app.models.branch import Branch
+from app.models.tenant import Tenant
 from app.models.user import User
 from app.models.associations import tenant_user
+from app.core.cache import invalidate_tenant
+from app.core.pagination import paginate_by_cursor
+from app.core.search import search_condition
+from app.core.multi_tenant import resolve_tenant, tenant_from_snapshot
+from app.services.tenant_stats_service import TenantStatsService, invalidate_tenant_counts
 from app.schemas.tenant import TenantCreate, TenantUpdate, TenantResponse, TenantWithStats, TenantUsageStats
 
 
@@ -20,29 +24,20 @@ class TenantService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.stats = TenantStatsService(db)
     
-    def get_tenants(
-        self, 
-        skip: int = 0, 
-        limit: int = 100, 
+    def _tenants_query(
+        self,
         search: Optional[str] = None,
         status: Optional[str] = None,
         plan_type: Optional[str] = None
-    ) -> List[Tenant]:
-        """الحصول على قائمة الشركات"""
+    ):
+        """استعلام الشركات بعد تطبيق البحث والتصفية"""
         query = self.db.query(Tenant)
         
         # البحث
         if search:
-            query = query.filter(
-                or_(
-                    Tenant.name.contains(search),
-                    Tenant.code.contains(search),
-                    Tenant.email.contains(search),
-                    Tenant.city.contains(search),
-                    Tenant.country.contains(search)
-                )
-            )
+            query = query.filter(search_condition(Tenant, search))
         
         # التصفية بالحالة
         if status:
@@ -52,7 +47,31 @@ class TenantService:
         if plan_type:
             query = query.filter(Tenant.plan_type == plan_type)
         
-        return query.offset(skip).limit(limit).all()
+        return query
+    
+    def get_tenants(
+        self, 
+        skip: int = 0, 
+        limit: int = 100, 
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        plan_type: Optional[str] = None
+    ) -> List[Tenant]:
+        """الحصول على قائمة الشركات (تصفح بالإزاحة)"""
+        query = self._tenants_query(search, status, plan_type)
+        return query.order_by(Tenant.id).offset(skip).limit(limit).all()
+    
+    def get_tenants_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        plan_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """الحصول على قائمة الشركات (تصفح بالمؤشر)"""
+        query = self._tenants_query(search, status, plan_type)
+        return paginate_by_cursor(query, Tenant.id, limit, cursor)
     
     def get_tenant(self, tenant_id: int) -> Optional[Tenant]:
         """الحصول على شركة بالمعرف"""
@@ -114,6 +133,7 @@ class TenantService:
             self.db.add(tenant)
             self.db.commit()
             self.db.refresh(tenant)
+            invalidate_tenant(tenant.id)
             
             return tenant
             
@@ -146,6 +166,7 @@ class TenantService:
             
             self.db.commit()
             self.db.refresh(tenant)
+            invalidate_tenant(tenant_id)
             
             return tenant
             
@@ -170,6 +191,8 @@ class TenantService:
         try:
             self.db.delete(tenant)
             self.db.commit()
+            invalidate_tenant(tenant_id)
+            invalidate_tenant_counts(tenant_id)
             return True
         except Exception as e:
             self.db.rollback()
@@ -177,13 +200,13 @@ class TenantService:
     
     def get_tenant_with_stats(self, tenant_id: int) -> Optional[TenantWithStats]:
         """الحصول على شركة مع الإحصائيات"""
-        tenant = self.get_tenant(tenant_id)
-        if not tenant:
+        snapshot = resolve_tenant(self.db, tenant_id)
+        if not snapshot:
             return None
         
-        # حساب الإحصائيات
-        current_users = len(tenant.users)
-        current_branches = len(tenant.branches)
+        # بيانات الشركة والأعداد من الذاكرة المؤقتة (حساب واحد للطلبات المتزامنة عند انتهائها)
+        tenant = tenant_from_snapshot(self.db, snapshot)
+        current_users, current_branches = self.stats.get_cached_counts(tenant_id)
         storage_used_gb = 0.0  # سيتم حسابها لاحقاً
         
         usage_stats = TenantUsageStats(
@@ -232,6 +255,7 @@ class TenantService:
                 tenant_user.insert().values(tenant_id=tenant_id, user_id=user_id)
             )
             self.db.commit()
+            invalidate_tenant_counts(tenant_id)
             return True
         except Exception as e:
             self.db.rollback()
@@ -249,6 +273,7 @@ class TenantService:
                 )
             )
             self.db.commit()
+            invalidate_tenant_counts(tenant_id)
             return result.rowcount > 0
         except Exception as e:
             self.db.rollback()
@@ -256,11 +281,20 @@ class TenantService:
     
     def get_tenant_users(self, tenant_id: int, skip: int = 0, limit: int = 100) -> List[User]:
         """الحصول على مستخدمي الشركة"""
-        tenant = self.get_tenant(tenant_id)
-        if not tenant:
+        return self._tenant_users_query(tenant_id).order_by(User.id).offset(skip).limit(limit).all()
+    
+    def get_tenant_users_page(self, tenant_id: int, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """الحصول على مستخدمي الشركة (تصفح بالمؤشر)"""
+        return paginate_by_cursor(self._tenant_users_query(tenant_id), User.id, limit, cursor)
+    
+    def _tenant_users_query(self, tenant_id: int):
+        """استعلام مستخدمي الشركة عبر جدول الربط بدلاً من تحميل العلاقة كاملة"""
+        if not self.db.query(Tenant.id).filter(Tenant.id == tenant_id).first():
             raise ValueError(f"الشركة بالمعرف {tenant_id} غير موجودة")
         
-        return tenant.users[skip:skip + limit]
+        return (self.db.query(User)
+                .join(tenant_user, tenant_user.c.user_id == User.id)
+                .filter(tenant_user.c.tenant_id == tenant_id))
     
     def activate_tenant(self, tenant_id: int) -> bool:
         """تفعيل شركة"""
@@ -273,6 +307,7 @@ class TenantService:
         tenant.updated_at = datetime.utcnow()
         
         self.db.commit()
+        invalidate_tenant(tenant_id)
         return True
     
     def suspend_tenant(self, tenant_id: int, reason: str = None) -> bool:
@@ -286,6 +321,7 @@ class TenantService:
         tenant.updated_at = datetime.utcnow()
         
         self.db.commit()
+        invalidate_tenant(tenant_id)
         return True
     
     def count_active_tenants(self) -> int:
@@ -298,24 +334,26 @@ class TenantService:
     
     def get_tenant_usage_summary(self, tenant_id: int) -> Dict[str, Any]:
         """ملخص استخدام الشركة"""
-        tenant = self.get_tenant(tenant_id)
-        if not tenant:
+        snapshot = resolve_tenant(self.db, tenant_id)
+        if not snapshot:
             raise ValueError(f"الشركة بالمعرف {tenant_id} غير موجودة")
         
+        tenant = tenant_from_snapshot(self.db, snapshot)
+        current_users, current_branches = self.stats.get_cached_counts(tenant_id)
         return {
             "tenant_id": tenant_id,
             "tenant_name": tenant.name,
             "plan_type": tenant.plan_type,
             "subscription_status": tenant.subscription_status,
             "users": {
-                "current": len(tenant.users),
+                "current": current_users,
                 "max": tenant.max_users,
-                "percentage": (len(tenant.users) / tenant.max_users * 100) if tenant.max_users > 0 else 0
+                "percentage": (current_users / tenant.max_users * 100) if tenant.max_users > 0 else 0
             },
             "branches": {
-                "current": len(tenant.branches),
+                "current": current_branches,
                 "max": tenant.max_branches,
-                "percentage": (len(tenant.branches) / tenant.max_branches * 100) if tenant.max_branches > 0 else 0
+                "percentage": (current_branches / tenant.max_branches * 100) if tenant.max_branches > 0 else 0
             },
             "trial": {
                 "is_active": tenant.is_trial_active(),
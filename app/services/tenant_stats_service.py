@@ -0,0 +1,142 @@
+"""
+خدمة إحصائيات الشركات (TenantStatsService)
+استعلامات تجميعية (COUNT / GROUP BY) بدلاً من تحميل المستخدمين والفروع في الذاكرة لعدّها،
+والأعداد مخزنة مؤقتاً مع الحماية من التدافع (حساب واحد للطلبات المتزامنة وتحديث في الخلفية)
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.redis_cache import two_level
+from app.core.singleflight import RefreshingCache
+from app.database import SessionLocal
+from app.models.tenant import Tenant
+from app.models.branch import Branch
+from app.models.associations import tenant_user
+
+
+tenant_counts_cache = RefreshingCache(
+    two_level(
+        TTLCache(
+            maxsize=settings.tenant_cache_size,
+            ttl=settings.tenant_stats_cache_ttl_seconds + settings.tenant_stats_stale_seconds,
+            name="tenant_counts"
+        ),
+        decode=lambda entry: (tuple(entry[0]), entry[1], entry[2]),
+        # إبطال من عامل آخر يُسقط التحديثات الجارية هنا أيضاً
+        on_remote_invalidate=lambda op, key: tenant_counts_cache.note_invalidated(key if op == "delete" else None)
+    ),
+    ttl=settings.tenant_stats_cache_ttl_seconds,
+    stale_ttl=settings.tenant_stats_stale_seconds,
+    beta=settings.cache_early_refresh_beta
+)
+
+
+def invalidate_tenant_counts(tenant_id: int) -> None:
+    """إبطال أعداد المستخدمين والفروع المخزنة بعد تغييرها"""
+    tenant_counts_cache.invalidate(int(tenant_id))
+
+
+def _refresh_tenant_counts(tenant_id: int) -> Tuple[int, int]:
+    """إعادة حساب الأعداد في الخلفية بجلسة مستقلة (جلسة الطلب تكون قد أغلقت)"""
+    db = SessionLocal()
+    try:
+        return TenantStatsService(db).count_tenant(tenant_id)
+    finally:
+        db.close()
+
+
+class TenantStatsService:
+    """خدمة الإحصائيات التجميعية للشركات"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _count_subqueries(tenant_ids: Optional[Iterable[int]] = None):
+        """استعلامات فرعية مجمعة حسب الشركة لعدد المستخدمين والفروع"""
+        users = select(
+            tenant_user.c.tenant_id.label("tenant_id"),
+            func.count().label("user_count")
+        ).group_by(tenant_user.c.tenant_id)
+
+        branches = select(
+            Branch.tenant_id.label("tenant_id"),
+            func.count(Branch.id).label("branch_count")
+        ).group_by(Branch.tenant_id)
+
+        if tenant_ids is not None:
+            users = users.where(tenant_user.c.tenant_id.in_(tenant_ids))
+            branches = branches.where(Branch.tenant_id.in_(tenant_ids))
+
+        return users.subquery(), branches.subquery()
+
+    def get_tenant_with_counts(self, tenant_id: int) -> Optional[Tuple[Tenant, int, int]]:
+        """الحصول على الشركة مع عدد المستخدمين والفروع في استعلام واحد"""
+        users, branches = self._count_subqueries([tenant_id])
+
+        row = self.db.execute(
+            select(
+                Tenant,
+                func.coalesce(users.c.user_count, 0),
+                func.coalesce(branches.c.branch_count, 0)
+            )
+            .outerjoin(users, users.c.tenant_id == Tenant.id)
+            .outerjoin(branches, branches.c.tenant_id == Tenant.id)
+            .where(Tenant.id == tenant_id)
+        ).first()
+
+        if row is None:
+            return None
+
+        tenant, user_count, branch_count = row
+        return tenant, int(user_count), int(branch_count)
+
+    def count_tenant(self, tenant_id: int) -> Tuple[int, int]:
+        """عدد المستخدمين والفروع لشركة واحدة (بدون ذاكرة مؤقتة)"""
+        counts = self.get_tenant_counts(tenant_id)
+        return counts["users"], counts["branches"]
+
+    def get_cached_counts(self, tenant_id: int) -> Tuple[int, int]:
+        """عدد المستخدمين والفروع من الذاكرة المؤقتة مع الحماية من التدافع"""
+        tenant_id = int(tenant_id)
+        return tenant_counts_cache.get_or_load(
+            tenant_id,
+            loader=lambda: self.count_tenant(tenant_id),
+            refresher=lambda: _refresh_tenant_counts(tenant_id)
+        )
+
+    def get_tenant_counts(self, tenant_id: int) -> Dict[str, int]:
+        """عدد المستخدمين والفروع لشركة واحدة"""
+        return self.get_tenants_counts([tenant_id]).get(
+            tenant_id, {"users": 0, "branches": 0}
+        )
+
+    def get_tenants_counts(self, tenant_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+        """عدد المستخدمين والفروع لعدة شركات (أو جميعها) في استعلام مجمع واحد"""
+        if tenant_ids is not None:
+            tenant_ids = list(tenant_ids)
+            if not tenant_ids:
+                return {}
+
+        users, branches = self._count_subqueries(tenant_ids)
+
+        query = (
+            select(
+                Tenant.id,
+                func.coalesce(users.c.user_count, 0),
+                func.coalesce(branches.c.branch_count, 0)
+            )
+            .outerjoin(users, users.c.tenant_id == Tenant.id)
+            .outerjoin(branches, branches.c.tenant_id == Tenant.id)
+        )
+        if tenant_ids is not None:
+            query = query.where(Tenant.id.in_(tenant_ids))
+
+        return {
+            tenant_id: {"users": int(user_count), "branches": int(branch_count)}
+            for tenant_id, user_count, branch_count in self.db.execute(query)
+        }
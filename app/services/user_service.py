@@ -1,10 +1,11 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
 from app.models.user import User
-from app.models.tenant import Tenant
 from app.core.security import get_password_hash, verify_password
-from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.core.cache import invalidate_principal
+from app.core.pagination import paginate_by_cursor
+from app.services.search_service import SearchService
+from app.schemas.user import UserCreate, UserUpdate
 
 
 class UserService:
@@ -23,25 +24,32 @@ class UserService:
         """الحصول على مستخدم باسم المستخدم"""
         return self.db.query(User).filter(User.username == username).first()
 
-    def create_user(self, user_data: UserCreate, tenant_id: Optional[int] = None) -> User:
-        """إنشاء مستخدم جديد"""
-        # التحقق من عدم وجود المستخدم مسبقاً
-        if self.get_user_by_email(user_data.email):
+    @staticmethod
+    def _raise_if_taken(by_email: Optional[User], by_username: Optional[User]) -> None:
+        if by_email:
             raise ValueError("المستخدم موجود بالفعل بهذا الإيميل")
-        
-        if self.get_user_by_username(user_data.username):
+        if by_username:
             raise ValueError("المستخدم موجود بالفعل بهذا الاسم")
 
-        # إنشاء المستخدم الجديد
-        db_user = User(
+    @staticmethod
+    def _new_user(user_data: UserCreate, hashed_password: str, tenant_id: Optional[int]) -> User:
+        return User(
             username=user_data.username,
             email=user_data.email,
             first_name=user_data.first_name,
             last_name=user_data.last_name,
             phone=user_data.phone,
-            hashed_password=get_password_hash(user_data.password),
+            hashed_password=hashed_password,
             tenant_id=tenant_id
         )
+
+    def create_user(self, user_data: UserCreate, tenant_id: Optional[int] = None) -> User:
+        """إنشاء مستخدم جديد"""
+        # التحقق من عدم وجود المستخدم مسبقاً
+        self._raise_if_taken(self.get_user_by_email(user_data.email), self.get_user_by_username(user_data.username))
+
+        # إنشاء المستخدم الجديد
+        db_user = self._new_user(user_data, get_password_hash(user_data.password), tenant_id)
         
         self.db.add(db_user)
         self.db.commit()
@@ -49,8 +57,10 @@ class UserService:
         
         return db_user
 
-    def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
-        """تحديث بيانات المستخدم"""
+    def update_user(
+        self, user_id: int, user_data: UserUpdate, hashed_password: Optional[str] = None
+    ) -> Optional[User]:
+        """تحديث بيانات المستخدم (hashed_password: تشفير مسبق لكلمة المرور الجديدة، من الخدمة غير المتزامنة)"""
         db_user = self.get_user_by_id(user_id)
         if not db_user:
             return None
@@ -60,12 +70,13 @@ class UserService:
         
         for field, value in update_data.items():
             if field == "password" and value:
-                setattr(db_user, "hashed_password", get_password_hash(value))
+                setattr(db_user, "hashed_password", hashed_password or get_password_hash(value))
             elif field != "password":
                 setattr(db_user, field, value)
 
         self.db.commit()
         self.db.refresh(db_user)
+        invalidate_principal(user_id)
         
         return db_user
 
@@ -77,6 +88,7 @@ class UserService:
 
         self.db.delete(db_user)
         self.db.commit()
+        invalidate_principal(user_id)
         
         return True
 
@@ -95,17 +107,28 @@ class UserService:
         """الحصول على مستخدمي الشركة"""
         return (self.db.query(User)
                 .filter(User.tenant_id == tenant_id)
+                .order_by(User.id)
                 .offset(skip)
                 .limit(limit)
                 .all())
 
+    def get_users_by_tenant_page(self, tenant_id: int, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """الحصول على مستخدمي الشركة (تصفح بالمؤشر)"""
+        query = self.db.query(User).filter(User.tenant_id == tenant_id)
+        return paginate_by_cursor(query, User.id, limit, cursor)
+
     def get_all_users(self, skip: int = 0, limit: int = 100) -> List[User]:
         """الحصول على جميع المستخدمين (للمدراء فقط)"""
         return (self.db.query(User)
+                .order_by(User.id)
                 .offset(skip)
                 .limit(limit)
                 .all())
 
+    def get_all_users_page(self, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """الحصول على جميع المستخدمين (تصفح بالمؤشر)"""
+        return paginate_by_cursor(self.db.query(User), User.id, limit, cursor)
+
     def assign_user_to_tenant(self, user_id: int, tenant_id: int) -> bool:
         """تعيين مستخدم لشركة"""
         user = self.get_user_by_id(user_id)
@@ -114,6 +137,7 @@ class UserService:
 
         user.tenant_id = tenant_id
         self.db.commit()
+        invalidate_principal(user_id)
         
         return True
 
@@ -125,6 +149,7 @@ class UserService:
 
         user.tenant_id = None
         self.db.commit()
+        invalidate_principal(user_id)
         
         return True
 
@@ -136,6 +161,7 @@ class UserService:
 
         user.is_active = False
         self.db.commit()
+        invalidate_principal(user_id)
         
         return True
 
@@ -147,25 +173,13 @@ class UserService:
 
         user.is_active = True
         self.db.commit()
+        invalidate_principal(user_id)
         
         return True
 
-    def search_users(self, search_term: str, tenant_id: Optional[int] = None) -> List[User]:
-        """البحث في المستخدمين"""
-        query = self.db.query(User)
-        
-        if tenant_id:
-            query = query.filter(User.tenant_id == tenant_id)
-        
-        # البحث في الاسم والإيميل واسم المستخدم
-        search_condition = or_(
-            User.first_name.contains(search_term),
-            User.last_name.contains(search_term),
-            User.email.contains(search_term),
-            User.username.contains(search_term)
-        )
-        
-        return query.filter(search_condition).all()
+    def search_users(self, search_term: str, tenant_id: Optional[int] = None, limit: Optional[int] = None) -> List[User]:
+        """البحث في المستخدمين (الاسم والإيميل واسم المستخدم) مرتبة حسب الصلة؛ جميع النتائج ما لم يُحدد limit"""
+        return SearchService(self.db).search_users(search_term, tenant_id=tenant_id, limit=limit)
 
     def get_user_count_by_tenant(self, tenant_id: int) -> int:
         """عدد مستخدمي الشركة"""
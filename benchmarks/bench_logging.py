@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+قياس أثر السجلات على معدل الطلبات: بدون سجلات مقابل الكتابة المتزامنة (basicConfig)
+مقابل خط السجلات غير الحاجب (QueueHandler + QueueListener بتنسيق JSON)
+
+كل طلب يكتب عدداً من سطور INFO ضمن سياق طلب (request_id / tenant_id / user_id).
+--sink-delay-ms يحاكي وجهة كتابة بطيئة (أنبوب سجلات الحاوية تحت الضغط):
+    python -m benchmarks.bench_logging --concurrency 50 --requests 2000 --lines 5
+    python -m benchmarks.bench_logging --sink-delay-ms 1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.logging_pipeline import LoggingPipeline
+from app.core.request_context import begin_request, end_request, new_request_id, set_request_principal
+
+logger = logging.getLogger("bench.logging")
+
+
+class SlowFileHandler(logging.FileHandler):
+    """وجهة كتابة بزمن إضافي ثابت لكل سجل"""
+
+    def __init__(self, path: str, delay_seconds: float):
+        super().__init__(path)
+        self.delay_seconds = delay_seconds
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        super().emit(record)
+
+
+def build_app(lines: int) -> FastAPI:
+    """تطبيق صغير بمسار واحد يكتب lines سطراً لكل طلب"""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def request_context(request, call_next):
+        _, token = begin_request(new_request_id(), request.method, request.url.path, request.scope)
+        try:
+            return await call_next(request)
+        finally:
+            end_request(token)
+
+    @app.get("/work/{item_id}")
+    async def work(item_id: int):
+        set_request_principal(user_id=item_id % 100, tenant_id=item_id % 10)
+        for step in range(lines):
+            logger.info("processing item %s step %s", item_id, step)
+        return {"ok": True}
+
+    return app
+
+
+def configure(mode: str, path: str, sink_delay: float):
+    """إعداد المسجل الجذر لكل وضع؛ يُرجع دالة الإيقاف"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.disable(logging.NOTSET)
+
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+        return lambda: None
+
+    sink = SlowFileHandler(path, sink_delay)
+    if mode == "sync":
+        sink.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(sink)
+        root.setLevel(logging.INFO)
+        return sink.close
+
+    pipeline = LoggingPipeline()
+    # كبت التكرار معطل هنا لقياس كلفة كتابة كل سطر
+    pipeline.configure(level="INFO", fmt="json", dedup_burst=0, queue_size=100000, output=sink)
+
+    def stop():
+        pipeline.stop()
+        sink.close()
+        print(f"{'':<8}queue: {pipeline.stats()}")
+
+    return stop
+
+
+async def drive(client: httpx.AsyncClient, concurrency: int, requests: int) -> dict:
+    """إرسال الطلبات بتزامن محدد وقياس زمن الاستجابة"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(f"/work/{n}")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput_rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def main(concurrency: int, requests: int, lines: int, sink_delay_ms: float) -> None:
+    app = build_app(lines)
+    transport = httpx.ASGITransport(app=app)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'total s':>10}")
+        for mode in ("off", "sync", "queue"):
+            stop = configure(mode, os.path.join(tmp, f"{mode}.log"), sink_delay_ms / 1000)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    await client.get("/work/0")
+                    result = await drive(client, concurrency, requests)
+            finally:
+                stop()
+            print(
+                f"{mode:<8}{result['throughput_rps']:>10.1f}"
+                f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['elapsed_s']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests, args.lines, args.sink_delay_ms))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+مقارنة أداء فحص الصلاحيات: بناء المجموعات (المسار القديم) مقابل أقنعة البت
+
+التشغيل:
+    python -m benchmarks.bench_permissions
+"""
+import timeit
+from types import SimpleNamespace
+
+from app.core.permissions import (
+    SYSTEM_ROLES, check_user_permission, has_any_permission, invalidate_role
+)
+
+
+def build_user(user_id: int = 1):
+    """مستخدم وهمي بأدوار وصلاحيات النظام الافتراضية (بدون قاعدة بيانات)"""
+    roles = []
+    for role_id, (name, role) in enumerate(SYSTEM_ROLES.items(), start=1):
+        if name == "super_admin":
+            continue
+        permissions = [SimpleNamespace(name=perm) for perm in role["permissions"]]
+        roles.append(SimpleNamespace(id=role_id, name=name, is_active=True, permissions=permissions))
+    return SimpleNamespace(id=user_id, is_superuser=False, roles=roles)
+
+
+def legacy_check(user, required_permission: str) -> bool:
+    """المسار القديم: بناء مجموعة الصلاحيات في كل فحص"""
+    user_permissions = set()
+    for role in user.roles:
+        if role.is_active:
+            for permission in role.permissions:
+                user_permissions.add(permission.name)
+    return required_permission in user_permissions
+
+
+def legacy_any(user, permissions) -> bool:
+    """المسار القديم لـ has_any_permission"""
+    user_permissions = set()
+    for role in user.roles:
+        if role.is_active:
+            for permission in role.permissions:
+                user_permissions.add(permission.name)
+    return any(perm in user_permissions for perm in permissions)
+
+
+def run(number: int = 200_000, repeat: int = 5) -> None:
+    user = build_user()
+    invalidate_role()
+    required_any = ["tenants:delete", "subscriptions:manage", "branches:update"]
+
+    cases = [
+        ("check (set)", lambda: legacy_check(user, "branches:update")),
+        ("check (mask)", lambda: check_user_permission(user, "branches:update")),
+        ("any (set)", lambda: legacy_any(user, required_any)),
+        ("any (mask)", lambda: has_any_permission(user, required_any)),
+    ]
+
+    # التسخين وملء ذاكرة الأقنعة
+    for _, func in cases:
+        func()
+
+    print(f"{'case':<16}{'best ns/op':>14}")
+    for label, func in cases:
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        print(f"{label:<16}{best / number * 1e9:>14.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,7 @@
+"""
+اختبار الحمل القابل للتكرار للواجهة البرمجية
+- seed: زرع قاعدة بيانات محلية بحجم محدد (شركات × فروع × مستخدمين × أدوار)
+- scenarios: المسارات المقاسة (تسجيل الدخول، /api/users/me، قائمة الشركات والبحث، ملخص الفروع، الاشتراكات)
+- __main__: تشغيل التطبيق الحقيقي عبر ASGI وقياس p50/p95/p99 ومعدل الطلبات والاستعلامات لكل طلب،
+  ومقارنة النتائج بخط أساس JSON (يفشل التشغيل عند التراجع)
+"""
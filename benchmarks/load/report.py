@@ -0,0 +1,66 @@
+"""
+ملخص نتائج السيناريو ومقارنتها بخط الأساس
+- زمن الاستجابة (p95) ومعدل الطلبات يُقارنان بهامش سماح نسبي لأنهما يتأثران بالجهاز
+- عدد الاستعلامات لكل طلب حتمي فأي زيادة عليه تراجع
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """النسبة المئوية بطريقة الرتبة الأقرب على قائمة مرتبة"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], queries: List[int], errors: int, elapsed: float) -> Dict[str, Any]:
+    """ملخص سيناريو واحد (الأزمنة بالثواني في المدخلات وبالمللي ثانية في الناتج)"""
+    latencies = sorted(latencies)
+    requests = len(latencies) + errors
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """قائمة التراجعات مقارنة بخط الأساس (فارغة عند النجاح)"""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        result = current["scenarios"].get(name)
+        if result is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f}ms > {base['p95_ms']:.1f}ms (+{tolerance:.0%})")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']:.1f} < {base['throughput_rps']:.1f} req/s (-{tolerance:.0%})"
+            )
+        base_queries, queries = base.get("queries_per_request"), result.get("queries_per_request")
+        if base_queries is not None and queries is not None and queries > base_queries:
+            regressions.append(f"{name}: queries/request {queries} > {base_queries}")
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_results(path: str, results: Dict[str, Any]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, ensure_ascii=False, indent=2, sort_keys=True)
+        handle.write("\n")
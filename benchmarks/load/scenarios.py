@@ -0,0 +1,92 @@
+"""
+سيناريوهات اختبار الحمل: لكل سيناريو دالة تبني الطلب رقم n
+(تتنقل بين الشركات والمستخدمين المزروعين حتى لا يُقاس مسار واحد مخزن مؤقتاً فقط)
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # seed يستورد app.models (ومعها محرك قاعدة البيانات)، فلا يُستورد قبل ضبط DATABASE_URL
+    from benchmarks.load.seed import SeedResult
+
+# (الطريقة، المسار، معاملات httpx الإضافية)
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass
+class LoadContext:
+    """البيانات المزروعة ورموز الوصول المستخدمة في بناء الطلبات"""
+    seed: "SeedResult"
+    admin_token: str
+    user_tokens: List[str]
+
+    def admin(self) -> Dict[str, Any]:
+        return {"headers": {"Authorization": f"Bearer {self.admin_token}"}}
+
+    def user(self, n: int) -> Dict[str, Any]:
+        return {"headers": {"Authorization": f"Bearer {self.user_tokens[n % len(self.user_tokens)]}"}}
+
+    def tenant_id(self, n: int) -> int:
+        return self.seed.tenant_ids[n % len(self.seed.tenant_ids)]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """مسار مقاس: build(context, n) يبني الطلب رقم n؛ request_ratio يقلل عدد الطلبات للمسارات الثقيلة"""
+    name: str
+    build: Callable[[LoadContext, int], RequestSpec]
+    request_ratio: float = 1.0
+
+    def request_count(self, requests: int) -> int:
+        return max(1, int(requests * self.request_ratio))
+
+
+def _login(context: LoadContext, n: int) -> RequestSpec:
+    usernames = context.seed.usernames
+    return "POST", "/api/auth/login", {
+        "json": {"username": usernames[n % len(usernames)], "password": context.seed.password}
+    }
+
+
+def _users_me(context: LoadContext, n: int) -> RequestSpec:
+    return "GET", "/api/users/me", context.user(n)
+
+
+def _tenants_list(context: LoadContext, n: int) -> RequestSpec:
+    skip = (n * 50) % len(context.seed.tenant_ids)
+    return "GET", "/api/tenants/", {"params": {"skip": skip, "limit": 50}, **context.admin()}
+
+
+def _tenants_search(context: LoadContext, n: int) -> RequestSpec:
+    # بادئة رمز مختلفة لكل طلب (BT000، BT001، ...) لتغطية عدة أحجام للنتائج
+    return "GET", "/api/tenants/search", {"params": {"q": f"BT{n % 100:03d}", "limit": 20}, **context.admin()}
+
+
+def _branches_summary(context: LoadContext, n: int) -> RequestSpec:
+    return "GET", f"/api/tenants/{context.tenant_id(n)}/branches/summary", context.admin()
+
+
+def _subscriptions_list(context: LoadContext, n: int) -> RequestSpec:
+    return "GET", "/api/subscriptions/", {"params": {"limit": 50}, **context.admin()}
+
+
+SCENARIOS: List[Scenario] = [
+    # تسجيل الدخول يتحقق من كلمة المرور (مكلف عمداً)، فيُقاس بعُشر عدد الطلبات
+    Scenario("login", _login, request_ratio=0.1),
+    Scenario("users_me", _users_me),
+    Scenario("tenants_list", _tenants_list),
+    Scenario("tenants_search", _tenants_search),
+    Scenario("branches_summary", _branches_summary),
+    Scenario("subscriptions_list", _subscriptions_list),
+]
+
+
+def select_scenarios(names: Optional[List[str]]) -> List[Scenario]:
+    """السيناريوهات المطلوبة بالاسم (جميعها عند عدم التحديد)"""
+    if not names:
+        return list(SCENARIOS)
+    known = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"سيناريوهات غير معروفة: {', '.join(unknown)} (المتاح: {', '.join(known)})")
+    return [known[name] for name in names]
@@ -0,0 +1,172 @@
+"""
+زرع بيانات اختبار الحمل: tenants شركة، لكل شركة branches فرع وusers مستخدم واشتراك،
+وroles دور عام بصلاحيات متدرجة، ومدير عام واحد لمسارات الإدارة
+كلمة المرور تُشفَّر مرة واحدة ويُعاد استخدام الناتج لجميع المستخدمين
+"""
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+
+from app.core.security import get_password_hash
+from app.models.associations import branch_user, role_permissions, tenant_user, user_roles
+from app.models.branch import Branch
+from app.models.role_permission import Permission, Role
+from app.models.subscription import BillingCycle, Subscription, SubscriptionStatus
+from app.models.tenant import Tenant, TenantUserRole
+from app.models.user import User
+
+PASSWORD = "Bench-Password-1"
+ADMIN_USERNAME = "bench_admin"
+
+_RESOURCES = ("users", "tenants", "branches", "roles", "subscriptions")
+_ACTIONS = ("read", "create", "update", "delete")
+_TENANT_STATUSES = ("active", "trial", "suspended")
+_SUBSCRIPTION_STATUSES = (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING, SubscriptionStatus.PAST_DUE)
+
+
+@dataclass(frozen=True)
+class Scale:
+    """حجم البيانات المزروعة (الفروع والمستخدمون لكل شركة)"""
+    tenants: int = 50
+    branches: int = 10
+    users: int = 20
+    roles: int = 10
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class SeedResult:
+    """معرفات البيانات المزروعة التي تحتاجها السيناريوهات"""
+    tenant_ids: List[int] = field(default_factory=list)
+    usernames: List[str] = field(default_factory=list)
+    admin_username: str = ADMIN_USERNAME
+    password: str = PASSWORD
+
+
+def _insert(db, model: Any, rows: List[Dict[str, Any]], chunk: int) -> None:
+    for offset in range(0, len(rows), chunk):
+        db.execute(insert(model), rows[offset:offset + chunk])
+
+
+def seed(session_factory, scale: Scale, chunk: int = 5000) -> SeedResult:
+    """زرع البيانات دفعة واحدة (INSERT متعدد الأسطر) في قاعدة بيانات فارغة"""
+    hashed_password = get_password_hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    result = SeedResult()
+
+    with session_factory() as db:
+        permissions = [
+            {"name": f"{resource}.{action}", "resource": resource, "action": action}
+            for resource in _RESOURCES for action in _ACTIONS
+        ]
+        _insert(db, Permission, permissions, chunk)
+        permission_ids = [row[0] for row in db.query(Permission.id).order_by(Permission.id)]
+
+        _insert(db, Role, [
+            {"name": f"bench_role_{r}", "description": f"Bench role {r}"}
+            for r in range(scale.roles)
+        ], chunk)
+        role_ids = [row[0] for row in db.query(Role.id).order_by(Role.id)]
+        # الدور r يملك أول (r mod عدد الصلاحيات) + 1 صلاحية
+        _insert(db, role_permissions, [
+            {"role_id": role_id, "permission_id": permission_id}
+            for index, role_id in enumerate(role_ids)
+            for permission_id in permission_ids[:index % len(permission_ids) + 1]
+        ], chunk)
+
+        _insert(db, Tenant, [
+            {
+                "name": f"شركة الاختبار {t:05d}",
+                "code": f"BT{t:05d}",
+                "email": f"tenant{t}@example.com",
+                "city": "Riyadh",
+                "country": "SA",
+                "max_users": scale.users,
+                "max_branches": scale.branches,
+                "subscription_status": _TENANT_STATUSES[t % len(_TENANT_STATUSES)],
+                "is_active": True,
+            }
+            for t in range(scale.tenants)
+        ], chunk)
+        result.tenant_ids = [row[0] for row in db.query(Tenant.id).order_by(Tenant.id)]
+
+        _insert(db, Subscription, [
+            {
+                "tenant_id": tenant_id,
+                "plan_name": "basic",
+                "status": _SUBSCRIPTION_STATUSES[index % len(_SUBSCRIPTION_STATUSES)],
+                "billing_cycle": BillingCycle.MONTHLY,
+                "amount": Decimal("99.00"),
+                "current_period_start": now,
+                "current_period_end": now + timedelta(days=30),
+            }
+            for index, tenant_id in enumerate(result.tenant_ids)
+        ], chunk)
+
+        _insert(db, Branch, [
+            {
+                "tenant_id": tenant_id,
+                "name": f"فرع {b}",
+                "code": f"BR{b:04d}",
+                "city": "Riyadh",
+                "country": "SA",
+                "is_main_branch": b == 0,
+                "is_active": True,
+            }
+            for tenant_id in result.tenant_ids for b in range(scale.branches)
+        ], chunk)
+        branch_ids: Dict[int, List[int]] = {}
+        for branch_id, tenant_id in db.query(Branch.id, Branch.tenant_id).order_by(Branch.id):
+            branch_ids.setdefault(tenant_id, []).append(branch_id)
+
+        users = [
+            {
+                "username": ADMIN_USERNAME,
+                "email": "admin@example.com",
+                "hashed_password": hashed_password,
+                "first_name": "Bench",
+                "last_name": "Admin",
+                "is_active": True,
+                "is_verified": True,
+                "is_superuser": True,
+            }
+        ]
+        for t, tenant_id in enumerate(result.tenant_ids):
+            for u in range(scale.users):
+                users.append({
+                    "username": f"t{t}u{u}",
+                    "email": f"t{t}u{u}@example.com",
+                    "hashed_password": hashed_password,
+                    "first_name": "Bench",
+                    "last_name": f"{t}-{u}",
+                    "tenant_id": tenant_id,
+                    "is_active": True,
+                    "is_verified": True,
+                })
+        _insert(db, User, users, chunk)
+
+        memberships, branch_links, role_links, tenant_roles = [], [], [], []
+        rows = db.query(User.id, User.username, User.tenant_id).filter(User.tenant_id.isnot(None)).order_by(User.id)
+        for index, (user_id, username, tenant_id) in enumerate(rows):
+            result.usernames.append(username)
+            memberships.append({"tenant_id": tenant_id, "user_id": user_id})
+            tenant_branches = branch_ids.get(tenant_id)
+            if tenant_branches:
+                branch_links.append({"branch_id": tenant_branches[index % len(tenant_branches)], "user_id": user_id})
+            if role_ids:
+                role_id = role_ids[index % len(role_ids)]
+                role_links.append({"user_id": user_id, "role_id": role_id})
+                tenant_roles.append({"tenant_id": tenant_id, "user_id": user_id, "role_id": role_id})
+        _insert(db, tenant_user, memberships, chunk)
+        _insert(db, branch_user, branch_links, chunk)
+        _insert(db, user_roles, role_links, chunk)
+        _insert(db, TenantUserRole, tenant_roles, chunk)
+
+        db.commit()
+
+    return result
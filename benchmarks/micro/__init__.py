@@ -0,0 +1,5 @@
+"""
+قياسات مصغرة (microbenchmarks) للدوال التي يمر بها كل طلب
+- cases: الحالات المقاسة (رموز JWT، الصلاحيات، تحويل Pydantic، المدققات، to_dict)
+- __main__: التسخين ثم عينات متكررة لكل حالة، والإحصائيات والمقارنة بخط أساس JSON
+"""
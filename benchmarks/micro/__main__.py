@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+القياسات المصغرة للدوال الأساسية بأمر واحد:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --group security --group schemas --repeat 10
+    python -m benchmarks.micro --save-baseline
+
+لكل حالة: تسخين لمدة --warmup ثانية، ثم معايرة عدد التكرارات لتستغرق كل عينة --sample-seconds،
+ثم --repeat عينة (المجمع المهمل معطل أثناء القياس كما في timeit)
+الإحصائيات بالنانو ثانية لكل عملية: min / median / mean / stdev
+
+خط الأساس: benchmarks/micro/baselines/micro.json (أو --baseline)
+تُقارن القيمة الوسطى (median)؛ رمز الخروج 1 عند تجاوزها خط الأساس بأكثر من --tolerance
+"""
+import argparse
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from benchmarks.load.report import load_baseline, save_results
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def measure(func: Callable[[], object], warmup: float, repeat: int, sample_seconds: float) -> Dict[str, Any]:
+    """تسخين ثم عينات متكررة؛ النتائج بالنانو ثانية لكل عملية"""
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        func()
+
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * sample_seconds / max(elapsed, 1e-9)))
+    samples = [total / number * 1e9 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "min_ns": round(min(samples), 1),
+        "median_ns": round(statistics.median(samples), 1),
+        "mean_ns": round(statistics.mean(samples), 1),
+        "stdev_ns": round(statistics.stdev(samples), 1) if len(samples) > 1 else 0.0,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """الحالات التي تجاوزت قيمتها الوسطى خط الأساس بأكثر من هامش السماح"""
+    regressions = []
+    for name, base in baseline.get("cases", {}).items():
+        result = current["cases"].get(name)
+        if result is None:
+            continue
+        if result["median_ns"] > base["median_ns"] * (1 + tolerance):
+            change = result["median_ns"] / base["median_ns"] - 1
+            regressions.append(
+                f"{name}: {result['median_ns']:.0f}ns > {base['median_ns']:.0f}ns (+{change:.0%}, tolerance {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    # لا حاجة لقاعدة بيانات: محرك SQLite في الذاكرة يكفي لاستيراد النماذج
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from benchmarks.micro.cases import build_cases
+
+    cases = build_cases()
+    if args.group:
+        cases = [case for case in cases if case.group in args.group]
+    if args.match:
+        cases = [case for case in cases if args.match in case.name]
+    if not cases:
+        print("no cases selected")
+        return 2
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'case':<40}{'median ns':>12}{'min ns':>12}{'stdev':>10}{'ops/s':>14}")
+    for case in cases:
+        result = measure(case.func, args.warmup, args.repeat, args.sample_seconds)
+        results[case.name] = {"group": case.group, **result}
+        print(
+            f"{case.name:<40}{result['median_ns']:>12.0f}{result['min_ns']:>12.0f}"
+            f"{result['stdev_ns']:>10.0f}{1e9 / result['median_ns']:>14,.0f}"
+        )
+
+    current = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "cases": results,
+    }
+    if args.output:
+        save_results(args.output, current)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, "micro.json")
+    if args.save_baseline:
+        baseline = load_baseline(baseline_path) if (args.group or args.match) else None
+        if baseline is not None:
+            # حفظ جزئي: تحديث الحالات المقاسة فقط
+            baseline["cases"].update(results)
+            baseline["meta"] = current["meta"]
+            current = baseline
+        save_results(baseline_path, current)
+        print(f"baseline saved: {baseline_path}")
+        return 0
+
+    baseline = load_baseline(baseline_path)
+    if baseline is None:
+        print(f"no baseline at {baseline_path} (run with --save-baseline)")
+        return 0
+    if baseline["meta"].get("python") != current["meta"]["python"]:
+        print(f"warning: baseline recorded on Python {baseline['meta'].get('python')}", file=sys.stderr)
+
+    regressions = compare(current, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print(f"no regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--group", action="append", help="security, permissions, schemas, validators, models")
+    parser.add_argument("--match", default=None, help="تصفية الحالات بجزء من الاسم")
+    parser.add_argument("--warmup", type=float, default=0.2, help="ثواني التسخين لكل حالة")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--sample-seconds", type=float, default=0.1)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="حفظ نتائج هذا التشغيل (JSON)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""
+حالات القياس المصغر: كل حالة دالة بدون معاملات تُنفذ عملية واحدة على بيانات واقعية
+(كائنات ORM غير مرتبطة بجلسة، فلا حاجة لقاعدة بيانات)
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from app.core.permissions import get_user_permissions, user_permission_cache
+from app.core.security import create_access_token, decode_access_token
+from app.models.branch import Branch
+from app.models.tenant import Tenant
+from app.schemas.branch import BranchResponse
+from app.schemas.tenant import TenantResponse
+from app.utils import validators
+from benchmarks.bench_permissions import build_user
+
+
+@dataclass(frozen=True)
+class Case:
+    """حالة قياس: group للتجميع في الجدول، وfunc تنفذ عملية واحدة"""
+    group: str
+    name: str
+    func: Callable[[], object]
+
+
+def build_tenant(tenant_id: int = 1) -> Tenant:
+    """شركة بجميع الحقول المعروضة في TenantResponse"""
+    now = datetime.now(timezone.utc)
+    return Tenant(
+        id=tenant_id,
+        name="شركة البيرو للتجارة",
+        code=f"BERO{tenant_id:04d}",
+        email="info@bero.example.com",
+        phone="0501234567",
+        website="https://bero.example.com",
+        address_line1="طريق الملك فهد",
+        address_line2="برج 3، الدور 12",
+        city="الرياض",
+        state="منطقة الرياض",
+        postal_code="12271",
+        country="SA",
+        tax_number=f"3000{tenant_id:011d}",
+        registration_number=f"1010{tenant_id:06d}",
+        contact_person_name="أحمد محمد",
+        contact_person_email="ahmed@bero.example.com",
+        contact_person_phone="0559876543",
+        plan_type="premium",
+        max_users=50,
+        max_branches=10,
+        max_storage_gb=20,
+        subscription_status="active",
+        trial_ends_at=now - timedelta(days=30),
+        subscription_ends_at=now + timedelta(days=335),
+        is_active=True,
+        is_verified=True,
+        logo_url="https://cdn.bero.example.com/logo.png",
+        created_at=now - timedelta(days=60),
+        updated_at=now,
+    )
+
+
+def build_branch(branch_id: int = 1, tenant_id: int = 1) -> Branch:
+    """فرع بجميع الحقول المعروضة في BranchResponse"""
+    now = datetime.now(timezone.utc)
+    return Branch(
+        id=branch_id,
+        tenant_id=tenant_id,
+        name=f"فرع العليا {branch_id}",
+        code=f"BR{branch_id:04d}",
+        description="الفرع الرئيسي في حي العليا",
+        email="olaya@bero.example.com",
+        phone="0112345678",
+        address_line1="شارع العليا العام",
+        city="الرياض",
+        state="منطقة الرياض",
+        postal_code="12211",
+        country="SA",
+        manager_name="خالد عبدالله",
+        manager_email="khalid@bero.example.com",
+        manager_phone="0551112233",
+        is_main_branch=branch_id == 1,
+        currency="SAR",
+        timezone="Asia/Riyadh",
+        language="ar",
+        is_active=True,
+        is_verified=True,
+        opened_at=now - timedelta(days=400),
+        created_at=now - timedelta(days=400),
+        updated_at=now,
+    )
+
+
+def build_cases() -> List[Case]:
+    """جميع الحالات مع بياناتها المجهزة مسبقاً"""
+    # كما في AuthService.create_access_refresh_tokens: مدة صلاحية صريحة
+    claims = {"tenant_id": 7, "perm": {"f": 1, "m": "A_8", "su": False, "ac": True, "pv": [1, 3]}}
+    expires = timedelta(minutes=30)
+    token = create_access_token(subject=42, data=claims, expires_delta=expires)
+
+    user = build_user()
+
+    def permissions_cold():
+        user_permission_cache.delete(user.id)
+        return get_user_permissions(user)
+
+    tenant = build_tenant()
+    branch = build_branch()
+
+    return [
+        Case("security", "create_access_token", lambda: create_access_token(subject=42, data=claims, expires_delta=expires)),
+        Case("security", "decode_access_token", lambda: decode_access_token(token)),
+        Case("permissions", "get_user_permissions (cached)", lambda: get_user_permissions(user)),
+        Case("permissions", "get_user_permissions (cold)", permissions_cold),
+        Case("schemas", "TenantResponse.model_validate", lambda: TenantResponse.model_validate(tenant)),
+        Case("schemas", "BranchResponse.model_validate", lambda: BranchResponse.model_validate(branch)),
+        Case("validators", "validate_email", lambda: validators.validate_email("ahmed.mohammed@bero.example.com")),
+        Case("validators", "validate_phone", lambda: validators.validate_phone("+966 50 123 4567")),
+        Case("validators", "validate_password", lambda: validators.validate_password("Str0ng!Passw0rd")),
+        Case("validators", "validate_username", lambda: validators.validate_username("ahmed_mohammed")),
+        Case("validators", "validate_name", lambda: validators.validate_name("أحمد محمد")),
+        Case("validators", "validate_url", lambda: validators.validate_url("https://bero.example.com/about")),
+        Case("validators", "sanitize_string", lambda: validators.sanitize_string("  <b>شركة</b> البيرو  ", 100)),
+        Case("models", "Tenant.to_dict", tenant.to_dict),
+        Case("models", "Branch.to_dict", branch.to_dict),
+    ]
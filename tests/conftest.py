@@ -0,0 +1,35 @@
+"""
+إعداد الاختبارات: قاعدة SQLite مؤقتة (ملف، لأن الطلبات تعمل في عدة خيوط) وبدون Redis مشترك
+والتتبع إلى الذاكرة؛ app.database والإعدادات تُقرأ من البيئة عند الاستيراد، فتُضبط هنا قبل استيراد app
+"""
+import os
+import tempfile
+
+import pytest
+
+_TEST_DIR = tempfile.mkdtemp(prefix="bero-tests-")
+
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}")
+os.environ.pop("REDIS_URL", None)
+os.environ.setdefault("ENVIRONMENT", "testing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["TRACING_ENABLED"] = "true"
+os.environ["TRACING_EXPORTER"] = "memory"
+os.environ["SUBSCRIPTION_SWEEPER_ENABLED"] = "false"
+
+
+@pytest.fixture(scope="module")
+def client_and_seed():
+    """التطبيق الحقيقي مع شركة وفرع ومستخدم ودور مزروعين (benchmarks.load.seed)"""
+    from fastapi.testclient import TestClient
+
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from benchmarks.load.seed import Scale, seed
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seeded = seed(SessionLocal, Scale(tenants=1, branches=1, users=1, roles=1))
+    with TestClient(app) as client:
+        yield client, seeded
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,109 @@
+"""
+تحجيم مجمع الاتصالات وإعدادات SET LOCAL لكل معاملة (app/database_pooling.py)
+"""
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+
+from app.database_pooling import (
+    compute_pool_limits, engines_per_worker, install_transaction_settings, pool_kwargs, set_local_statement
+)
+
+
+@pytest.mark.parametrize("mode", ["session", "transaction"])
+@pytest.mark.parametrize("async_mode", [False, True])
+@pytest.mark.parametrize("workers,max_connections,reserved", [(1, 100, 0), (4, 100, 3), (9, 100, 10), (16, 40, 0)])
+def test_pool_limits_fit_max_connections(mode, async_mode, workers, max_connections, reserved):
+    engines = engines_per_worker(async_mode)
+    limits = compute_pool_limits(
+        mode=mode, max_connections=max_connections, workers=workers,
+        engines_per_worker=engines, reserved_connections=reserved
+    )
+    assert limits.pool_size >= 1
+    assert workers * engines * limits.total <= max_connections - reserved
+
+
+def test_async_mode_counts_both_engines():
+    sync_limits = compute_pool_limits(max_connections=40, workers=2, engines_per_worker=engines_per_worker(False))
+    async_limits = compute_pool_limits(max_connections=40, workers=2, engines_per_worker=engines_per_worker(True))
+    assert sync_limits.total == 20
+    assert async_limits.total == 10
+
+
+def test_too_few_connections_is_rejected():
+    with pytest.raises(ValueError):
+        compute_pool_limits(max_connections=3, workers=4)
+
+
+def test_pool_never_opens_more_than_its_limits(tmp_path):
+    limits = compute_pool_limits(max_connections=6, workers=2)
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        **pool_kwargs(limits, timeout=10)
+    )
+    lock = threading.Lock()
+    counts = {"open": 0, "peak": 0}
+
+    @event.listens_for(engine, "connect")
+    def _opened(*_):
+        with lock:
+            counts["open"] += 1
+            counts["peak"] = max(counts["peak"], counts["open"])
+
+    @event.listens_for(engine, "close")
+    def _closed(*_):
+        with lock:
+            counts["open"] -= 1
+
+    def hammer():
+        for _ in range(5):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=hammer) for _ in range(limits.total * 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    assert 1 <= counts["peak"] <= limits.total
+
+
+def test_set_local_statement_uses_driver_paramstyle():
+    session_settings = {"timezone": "Asia/Riyadh", "statement_timeout": "5s"}
+
+    # asyncpg يحتاج نوعاً صريحاً للمعاملات، فيضيف SQLAlchemy ::VARCHAR (يُحول ضمنياً إلى text)
+    statement, params = set_local_statement(session_settings, asyncpg.dialect())
+    assert statement == (
+        "SELECT set_config($1::VARCHAR, $2::VARCHAR, true), set_config($3::VARCHAR, $4::VARCHAR, true)"
+    )
+    assert params == ("timezone", "Asia/Riyadh", "statement_timeout", "5s")
+
+    statement, params = set_local_statement(session_settings, psycopg2.dialect())
+    assert statement == (
+        "SELECT set_config(%(name_0)s, %(value_0)s, true), set_config(%(name_1)s, %(value_1)s, true)"
+    )
+    assert params["value_1"] == "5s"
+
+
+def test_transaction_settings_run_at_each_begin():
+    # set_config مسجلة كدالة SQLite لتسجيل الاستدعاءات (صيغة المعاملات هنا qmark)
+    engine = create_engine("sqlite://")
+    calls = []
+
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection, _):
+        dbapi_connection.create_function("set_config", 3, lambda *args: calls.append(args) or args[1])
+
+    install_transaction_settings(engine, {"timezone": "Asia/Riyadh", "lock_timeout": "2s"})
+    for _ in range(2):
+        with engine.begin() as connection:
+            connection.execute(text("SELECT 1"))
+
+    assert calls == [("timezone", "Asia/Riyadh", 1), ("lock_timeout", "2s", 1)] * 2
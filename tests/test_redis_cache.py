@@ -0,0 +1,128 @@
+"""
+طبقة Redis للذاكرة المؤقتة: ترميز JSON لكل ذاكرة، ورفض القيم غير JSON، وبث الإبطال بين العمال
+تعمل على fakeredis، أو على redis-server محلي عند ضبط REDIS_TEST_URL
+"""
+import json
+import os
+import pickle
+import time
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import PrincipalSnapshot, TenantSnapshot, TTLCache
+from app.core.redis_cache import RedisTier, TwoLevelCache, dumps, loads
+
+
+@pytest.fixture(params=["fakeredis", "redis-server"])
+def redis_client_factory(request):
+    """مصنع عملاء Redis يتشاركون نفس الخادم (كل عميل يمثل عاملاً)"""
+    if request.param == "fakeredis":
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        yield lambda: fakeredis.FakeRedis(server=server)
+        return
+
+    url = os.getenv("REDIS_TEST_URL")
+    if not url:
+        pytest.skip("REDIS_TEST_URL غير مضبوط")
+    redis = pytest.importorskip("redis")
+    redis.Redis.from_url(url).flushdb()
+    yield lambda: redis.Redis.from_url(url)
+    redis.Redis.from_url(url).flushdb()
+
+
+def _principal_cache(tier: RedisTier) -> TwoLevelCache:
+    return TwoLevelCache(
+        TTLCache(maxsize=16, ttl=30, name="principal"), tier,
+        encode=cache_module._encode_principal, decode=cache_module._decode_principal
+    )
+
+
+def _principal() -> PrincipalSnapshot:
+    return PrincipalSnapshot(
+        user_id=7, is_active=True, is_superuser=False, tenant_id=3,
+        permissions=frozenset({"users:read", "branches:read"}), company_ids=frozenset({3, 4})
+    )
+
+
+def test_principal_round_trips_as_json_between_workers(redis_client_factory):
+    worker_a = _principal_cache(RedisTier(redis_client_factory(), namespace="test"))
+    worker_b = _principal_cache(RedisTier(redis_client_factory(), namespace="test"))
+
+    worker_a.set((7, 1700000000), _principal())
+
+    assert worker_b.get((7, 1700000000)) == _principal()
+    raw = redis_client_factory().get("test:principal:7:1700000000")
+    stored = json.loads(raw)
+    assert stored["permissions"] == ["branches:read", "users:read"]
+    assert "hashed_password" not in stored
+
+
+def test_non_json_payload_is_rejected_not_executed(redis_client_factory):
+    executed = []
+
+    class Exploit:
+        def __reduce__(self):
+            return executed.append, ("ran",)
+
+    client = redis_client_factory()
+    client.set("test:principal:7:1", pickle.dumps(Exploit()))
+    cache = _principal_cache(RedisTier(redis_client_factory(), namespace="test"))
+
+    assert cache.get((7, 1)) is None
+    assert executed == []
+    assert client.get("test:principal:7:1") is None
+
+
+def test_tenant_snapshot_keeps_datetimes(redis_client_factory):
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    snapshot = TenantSnapshot(
+        tenant_id=3, status="active", is_active=True, plan_type="basic",
+        max_users=5, max_branches=1, max_storage_gb=1,
+        settings=MappingProxyType({"currency": "SAR"}),
+        columns=(("id", 3), ("name", "شركة"), ("created_at", created))
+    )
+    make = lambda: TwoLevelCache(
+        TTLCache(maxsize=16, ttl=30, name="tenant"), RedisTier(redis_client_factory(), namespace="test"),
+        encode=cache_module._encode_tenant, decode=cache_module._decode_tenant
+    )
+    make().set(3, snapshot)
+
+    loaded = make().get(3)
+    assert loaded.status == "active"
+    assert dict(loaded.settings) == {"currency": "SAR"}
+    assert dict(loaded.columns)["created_at"] == created
+
+
+def test_invalidation_is_broadcast_to_other_workers(redis_client_factory):
+    tier_a = RedisTier(redis_client_factory(), namespace="test")
+    tier_b = RedisTier(redis_client_factory(), namespace="test")
+    worker_a, worker_b = _principal_cache(tier_a), _principal_cache(tier_b)
+    tier_b.start()
+    try:
+        worker_a.set((7, 1), _principal())
+        assert worker_b.get((7, 1)) == _principal()
+
+        worker_a.delete_prefix((7,))
+
+        deadline = time.monotonic() + 5
+        while len(worker_b.local) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(worker_b.local) == 0
+        assert worker_b.get((7, 1)) is None
+    finally:
+        tier_b.stop()
+
+
+def test_codec_rejects_unknown_types():
+    assert loads(dumps({"at": datetime(2024, 1, 1)})) == {"at": datetime(2024, 1, 1)}
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_local_only_without_redis_url():
+    assert cache_module.redis_tier is None
+    assert isinstance(cache_module.principal_cache, TTLCache)
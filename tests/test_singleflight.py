@@ -0,0 +1,68 @@
+"""
+الحماية من التدافع: تجميع الاستدعاءات في حلقة الأحداث وإسقاط التحديثات القديمة بعد الإبطال
+"""
+import asyncio
+import threading
+
+from sqlalchemy.util.concurrency import await_only, greenlet_spawn
+
+from app.core.cache import TTLCache
+from app.core.singleflight import RefreshingCache, SingleFlight
+
+
+def test_coalesces_callers_on_the_event_loop():
+    # نفس مسار AsyncSession.run_sync: دالة متزامنة داخل greenlet تنتظر الإدخال/الإخراج بـ await_only
+    flight = SingleFlight("test")
+    calls = []
+
+    def load():
+        calls.append(1)
+        await_only(asyncio.sleep(0.05))
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*(greenlet_spawn(flight.do, "key", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_event_loop_followers_receive_the_leader_error():
+    flight = SingleFlight("test")
+
+    def load():
+        await_only(asyncio.sleep(0.01))
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(greenlet_spawn(flight.do, "key", load) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_refresh_started_before_invalidate_is_dropped():
+    cache = RefreshingCache(TTLCache(maxsize=16, ttl=60, name="counts"), ttl=30, stale_ttl=30, beta=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return "before-invalidate"
+
+    result = {}
+    worker = threading.Thread(target=lambda: result.setdefault("value", cache.get_or_load(1, slow_loader)))
+    worker.start()
+    started.wait(5)
+    cache.invalidate(1)
+    release.set()
+    worker.join()
+
+    assert result["value"] == "before-invalidate"
+    assert cache.cache.get(1) is None
+    assert cache.stats()["stale_refreshes_dropped"] == 1
+    assert cache.get_or_load(1, lambda: "fresh") == "fresh"
+    assert cache.get_or_load(1, lambda: "unused") == "fresh"
@@ -0,0 +1,65 @@
+"""
+بنية الـ spans لطلب واحد بمُصدِّر الذاكرة (TRACING_EXPORTER=memory):
+الطلب ← الاعتمادية ← الخدمة ← SQL
+"""
+from typing import Dict, List
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry.trace import SpanKind
+
+from app.core.tracing import finished_spans
+
+
+def _ancestors(span, by_id: Dict[int, object]) -> List[str]:
+    names = []
+    while span.parent is not None and span.parent.span_id in by_id:
+        span = by_id[span.parent.span_id]
+        names.append(span.name)
+    return names
+
+
+def _children(span, spans) -> List[object]:
+    return [child for child in spans if child.parent is not None and child.parent.span_id == span.context.span_id]
+
+
+def test_request_dependency_service_sql_tree(client_and_seed):
+    client, seeded = client_and_seed
+    login = client.post("/api/auth/login", json={"username": seeded.admin_username, "password": seeded.password})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    tenant_id = seeded.tenant_ids[0]
+
+    finished_spans(clear=True)
+    response = client.get(f"/api/tenants/{tenant_id}", headers=headers)
+    assert response.status_code == 200
+
+    spans = finished_spans()
+    by_id = {span.context.span_id: span for span in spans}
+    roots = [span for span in spans if span.parent is None]
+    assert len(roots) == 1
+    root = roots[0]
+    assert root.kind == SpanKind.SERVER
+    assert root.name.startswith("GET /api/tenants/")
+    assert root.attributes["http.status_code"] == 200
+    assert all(span.context.trace_id == root.context.trace_id for span in spans)
+
+    # الاعتمادية: تحميل المستخدم يستعلم جدول المستخدمين تحت span الاعتمادية
+    dependency = next(span for span in spans if span.name == "get_current_user")
+    assert root.name in _ancestors(dependency, by_id)
+    assert any(
+        child.kind == SpanKind.CLIENT and "users" in child.attributes["db.statement"]
+        for child in _children(dependency, spans)
+    )
+
+    # الخدمة: span باسم الدالة وتحته جملة SQL منسوبة إليها
+    service = next(span for span in spans if span.name == "TenantService.get_tenant")
+    assert root.name in _ancestors(service, by_id)
+    sql = [child for child in _children(service, spans) if child.name == "SQL SELECT"]
+    assert sql
+    assert sql[0].attributes["code.function"] == "TenantService.get_tenant"
+    assert "tenants" in sql[0].attributes["db.statement"]
+    assert sql[0].start_time >= service.start_time and sql[0].end_time <= service.end_time
+    assert service.end_time <= root.end_time
@@ -0,0 +1,64 @@
+"""
+مسارات المستخدمين عبر get_user_service: إلغاء التفعيل يبطل لقطة المستخدم المخزنة فوراً
+"""
+
+
+def _login(client, username: str, password: str) -> dict:
+    response = client.post("/api/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_deactivated_user_token_is_rejected(client_and_seed):
+    client, seeded = client_and_seed
+    admin = _login(client, seeded.admin_username, seeded.password)
+    user = _login(client, seeded.usernames[0], seeded.password)
+
+    me = client.get("/api/users/me", headers=user)
+    assert me.status_code == 200
+    user_id = me.json()["id"]
+
+    # المستخدم العادي لا يستطيع إلغاء تفعيل حسابات أخرى
+    assert client.post(f"/api/users/{user_id}/deactivate", headers=user).status_code == 403
+
+    assert client.post(f"/api/users/{user_id}/deactivate", headers=admin).status_code == 200
+    assert client.get("/api/users/me", headers=user).status_code == 401
+
+    assert client.post(f"/api/users/{user_id}/activate", headers=admin).status_code == 200
+    assert client.get("/api/users/me", headers=user).status_code == 200
+
+
+def test_user_routes_are_scoped(client_and_seed):
+    client, seeded = client_and_seed
+    admin = _login(client, seeded.admin_username, seeded.password)
+    user = _login(client, seeded.usernames[0], seeded.password)
+    user_id = client.get("/api/users/me", headers=user).json()["id"]
+
+    assert client.get(f"/api/users/{user_id}", headers=admin).status_code == 200
+    assert client.get("/api/users/999999", headers=admin).status_code == 404
+    assert client.delete("/api/users/999999", headers=admin).status_code == 404
+
+    updated = client.put(f"/api/users/{user_id}", json={"first_name": "محدث"}, headers=user)
+    assert updated.status_code == 200
+    assert updated.json()["first_name"] == "محدث"
+    assert client.put(f"/api/users/{user_id}", json={"is_active": False}, headers=user).status_code == 403
+
+    page = client.get("/api/users/", params={"pagination": "cursor", "limit": 1}, headers=admin)
+    assert page.status_code == 200
+    assert len(page.json()["items"]) == 1
+    assert client.get("/api/users/", params={"cursor": "not-a-cursor"}, headers=admin).status_code == 400
+
+
+def test_create_user(client_and_seed):
+    client, seeded = client_and_seed
+    admin = _login(client, seeded.admin_username, seeded.password)
+    payload = {
+        "username": "new_user", "email": "new_user@example.com", "first_name": "جديد", "last_name": "مستخدم",
+        "password": "Str0ng!Passw0rd", "tenant_id": seeded.tenant_ids[0]
+    }
+
+    created = client.post("/api/users/", json=payload, headers=admin)
+    assert created.status_code == 200
+    assert created.json()["tenant_id"] == seeded.tenant_ids[0]
+    assert client.post("/api/users/", json=payload, headers=admin).status_code == 400
+    _login(client, "new_user", "Str0ng!Passw0rd")